@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""
+Background precomputation of dashboard aggregates.
+
+A single worker thread per process recomputes the totals, monthly profit/loss,
+category/crop summaries and recent activity after every committed write
+(debounced, so a burst of writes costs one recompute) and publishes them as a
+read-only snapshot. app.py and pages/dashboard.py only read the snapshot.
+A failed recompute is logged and keeps the previous snapshot; get_status
+reports when the last one succeeded and the last error.
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from data_manager import (
+    get_expense_data,
+    get_input_data,
+    get_output_data,
+    calculate_profit_loss,
+    get_data_version,
+    summarize_outputs_by_crop,
+    register_write_listener
+)
+from perf import timed
+
+# Dashboard period options and how many days back each one reaches
+DASHBOARD_PERIODS = {
+    "Last 30 days": 30,
+    "Last 90 days": 90,
+    "Last 6 months": 180,
+    "Last year": 365,
+    "All time": None
+}
+
+RECENT_ROWS = 5
+
+logger = logging.getLogger(__name__)
+
+
+def _recent(df):
+    """Newest rows first, as shown in the recent activity tabs."""
+    if df.empty:
+        return df
+    return df.sort_values('date', ascending=False).head(RECENT_ROWS)
+
+
+def _period_aggregates(expense_df, input_df, output_df):
+    """Metrics, monthly profit/loss and recent rows for one date window."""
+    total_expenses = expense_df['amount'].sum() if not expense_df.empty else 0
+    total_sales = output_df['sales_amount'].sum() if not output_df.empty else 0
+    return {
+        'total_expenses': total_expenses,
+        'total_sales': total_sales,
+        'net_profit': total_sales - total_expenses,
+        'profit_loss': calculate_profit_loss(expense_df, output_df),
+        'recent_expenses': _recent(expense_df),
+        'recent_inputs': _recent(input_df),
+        'recent_outputs': _recent(output_df)
+    }
+
+
+@timed()
+def compute_dashboard_snapshot():
+    """Compute every aggregate the landing page and dashboard display."""
+    version = get_data_version()
+    now = datetime.now()
+
+    expense_df = get_expense_data()
+    input_df = get_input_data()
+    output_df = get_output_data()
+
+    expense_dates = pd.to_datetime(expense_df['date'])
+    input_dates = pd.to_datetime(input_df['date'])
+    output_dates = pd.to_datetime(output_df['date'])
+
+    periods = {}
+    for period, days in DASHBOARD_PERIODS.items():
+        if days is None:
+            periods[period] = _period_aggregates(expense_df, input_df, output_df)
+        else:
+            start_date = now - timedelta(days=days)
+            periods[period] = _period_aggregates(
+                expense_df[expense_dates >= start_date],
+                input_df[input_dates >= start_date],
+                output_df[output_dates >= start_date]
+            )
+
+    # Previous calendar month
+    first_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    last_month_start = (first_of_month - timedelta(days=1)).replace(day=1)
+    last_month_expense = expense_df.loc[
+        (expense_dates >= last_month_start) & (expense_dates < first_of_month), 'amount'
+    ].sum() if not expense_df.empty else 0
+
+    if not expense_df.empty:
+        expense_summary = expense_df.groupby('category')['amount'].agg(['sum', 'count']).reset_index()
+        expense_summary.rename(columns={'sum': 'total_amount', 'count': 'transaction_count'}, inplace=True)
+        expense_summary.sort_values('total_amount', ascending=False, inplace=True)
+    else:
+        expense_summary = pd.DataFrame()
+
+    output_summary = summarize_outputs_by_crop(output_df)
+
+    return {
+        'version': version,
+        'computed_at': now,
+        'last_month_expense': last_month_expense,
+        'expense_summary': expense_summary,
+        'output_summary': output_summary,
+        'periods': periods
+    }
+
+
+class AggregateWorker:
+    """Debounced background thread that keeps the dashboard snapshot current."""
+
+    def __init__(self, debounce_seconds=0.5):
+        self.debounce_seconds = debounce_seconds
+        self._snapshot = None
+        self._dirty = threading.Event()
+        self._published = threading.Condition()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.last_success = None
+        self.last_error = None
+        self.last_error_at = None
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='dashboard-aggregates', daemon=True)
+                self._thread.start()
+
+    def request_refresh(self):
+        """Mark the snapshot stale; the worker recomputes once writes go quiet."""
+        self._dirty.set()
+
+    def _run(self):
+        while True:
+            self._dirty.wait()
+            # Debounce: keep waiting while writes are still arriving
+            while True:
+                self._dirty.clear()
+                time.sleep(self.debounce_seconds)
+                if not self._dirty.is_set():
+                    break
+            try:
+                snapshot = compute_dashboard_snapshot()
+            except Exception as exc:
+                logger.exception("Dashboard aggregates refresh failed")
+                self.last_error, self.last_error_at = repr(exc), datetime.now()
+                continue
+            with self._published:
+                self._snapshot = snapshot
+                self.last_success = snapshot['computed_at']
+                self._published.notify_all()
+
+    def status(self):
+        """When the snapshot was last computed, and the last refresh error with its time."""
+        return {'last_success': self.last_success, 'last_error': self.last_error,
+                'last_error_at': self.last_error_at}
+
+    def _is_current(self, snapshot):
+        return (snapshot is not None
+                and snapshot['version'] == get_data_version()
+                and snapshot['computed_at'].date() == datetime.now().date())
+
+    def get_snapshot(self, max_wait=2.0):
+        """Return the latest snapshot.
+
+        If the data changed since it was computed (e.g. written by another
+        process) a refresh is requested and we wait up to max_wait seconds for
+        it, falling back to the stale snapshot. The very first call computes
+        synchronously.
+        """
+        self.start()
+        snapshot = self._snapshot
+        if snapshot is None:
+            snapshot = compute_dashboard_snapshot()
+            with self._published:
+                if self._snapshot is None:
+                    self._snapshot = snapshot
+                    self.last_success = snapshot['computed_at']
+            return snapshot
+
+        if self._is_current(snapshot):
+            return snapshot
+
+        self.request_refresh()
+        deadline = time.monotonic() + max_wait
+        with self._published:
+            while not self._is_current(self._snapshot):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._published.wait(remaining)
+            return self._snapshot
+
+
+_worker = AggregateWorker()
+
+
+def _on_write(file_type, action, records, versions):
+    _worker.request_refresh()
+
+
+register_write_listener(_on_write)
+
+
+def get_dashboard_snapshot():
+    """Return the precomputed dashboard aggregates for this process."""
+    return _worker.get_snapshot()
+
+
+def get_status():
+    """Return the background worker's last_success, last_error and last_error_at."""
+    return _worker.status()
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""
+Rolling-window and year-over-year analytics from monthly rollups.
+
+Each record type keeps a month x category rollup (crop type for outputs).
+It is built once from the raw rows and then updated in place from each
+write, so the comparisons below only touch the small rollup table, not
+years of raw records.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+from data_manager import (
+    get_expense_data,
+    get_output_data,
+    get_data_version,
+    load_at_version,
+    register_write_listener,
+    CATEGORY_COLUMNS,
+    AMOUNT_COLUMNS
+)
+from perf import timed
+
+ROLLING_WINDOWS = (3, 6, 12)
+
+LOADERS = {
+    'expenses': get_expense_data,
+    'outputs': get_output_data
+}
+
+_rollups = {}
+_lock = threading.Lock()
+
+
+def _month_start(dates):
+    """Timestamp of the first day of each date's month."""
+    return pd.to_datetime(dates).dt.to_period('M').dt.to_timestamp()
+
+
+def _rollup_rows(file_type, df):
+    """Sum a frame of raw rows into a (month, category) series."""
+    category_column = CATEGORY_COLUMNS[file_type]
+    amount_column = AMOUNT_COLUMNS[file_type]
+    if df.empty:
+        return pd.Series(dtype=float, index=pd.MultiIndex.from_arrays([[], []], names=['month', 'category']))
+    keys = [_month_start(df['date']).rename('month'), df[category_column].rename('category')]
+    return df[amount_column].astype(float).groupby(keys).sum()
+
+
+def _build_rollup(file_type):
+    category_column = CATEGORY_COLUMNS[file_type]
+    amount_column = AMOUNT_COLUMNS[file_type]
+    version, df = load_at_version([file_type], lambda: LOADERS[file_type](
+        columns=['date', category_column, amount_column]))
+    return {'version': version, 'series': _rollup_rows(file_type, df)}
+
+
+def _on_write(file_type, action, records, versions):
+    """Fold committed writes into the rollup instead of rescanning the file."""
+    if file_type not in LOADERS:
+        return
+    before, after = versions
+    with _lock:
+        rollup = _rollups.get(file_type)
+        if rollup is None:
+            return
+        if rollup['version'] != before:
+            # Missed another write, rebuild on next use
+            del _rollups[file_type]
+            return
+        delta = _rollup_rows(file_type, records)
+        if action == 'delete':
+            delta = -delta
+        series = rollup['series'].add(delta, fill_value=0)
+        rollup['series'] = series[series.abs() > 1e-9]
+        rollup['version'] = after
+
+
+register_write_listener(_on_write)
+
+
+@timed()
+def get_monthly_rollup(file_type):
+    """Month x category totals for 'expenses' or 'outputs' as a wide table.
+
+    Months are a complete monthly index (missing months are zero) so that
+    rolling windows and year offsets are simple row shifts.
+    """
+    with _lock:
+        rollup = _rollups.get(file_type)
+        if rollup is None or rollup['version'] != get_data_version([file_type]):
+            # First use, or the file was changed by another process
+            rollup = _build_rollup(file_type)
+            _rollups[file_type] = rollup
+        series = rollup['series']
+
+    if series.empty:
+        return pd.DataFrame()
+
+    wide = series.unstack('category', fill_value=0.0).sort_index()
+    months = pd.date_range(wide.index.min(), wide.index.max(), freq='MS')
+    return wide.reindex(months, fill_value=0.0).rename_axis('month')
+
+
+def rolling_totals(file_type, windows=ROLLING_WINDOWS):
+    """Monthly total and trailing-window sums (e.g. rolling 3/6/12 months)."""
+    wide = get_monthly_rollup(file_type)
+    if wide.empty:
+        return pd.DataFrame()
+
+    result = pd.DataFrame({'total': wide.sum(axis=1)})
+    for window in windows:
+        result[f'rolling_{window}m'] = result['total'].rolling(window, min_periods=1).sum()
+    return result.reset_index()
+
+
+def rolling_profit(windows=ROLLING_WINDOWS):
+    """Monthly sales, expenses and profit with trailing-window profit sums."""
+    expenses = get_monthly_rollup('expenses')
+    sales = get_monthly_rollup('outputs')
+    combined = pd.DataFrame({
+        'total_expenses': expenses.sum(axis=1) if not expenses.empty else pd.Series(dtype=float),
+        'total_sales': sales.sum(axis=1) if not sales.empty else pd.Series(dtype=float)
+    })
+    if combined.empty:
+        return pd.DataFrame()
+
+    months = pd.date_range(combined.index.min(), combined.index.max(), freq='MS')
+    combined = combined.reindex(months, fill_value=0.0).fillna(0.0).rename_axis('month')
+    combined['profit_loss'] = combined['total_sales'] - combined['total_expenses']
+    for window in windows:
+        rolled = combined[['total_sales', 'profit_loss']].rolling(window, min_periods=1).sum()
+        combined[f'profit_{window}m'] = rolled['profit_loss']
+        combined[f'margin_{window}m'] = profit_margin(rolled['profit_loss'], rolled['total_sales'])
+    return combined.reset_index()
+
+
+def profit_margin(profit, sales):
+    """Vectorised profit margin in percent, zero where there were no sales."""
+    profit = np.asarray(profit, dtype=float)
+    sales = np.asarray(sales, dtype=float)
+    return np.divide(profit * 100, sales, out=np.zeros_like(profit), where=sales > 0)
+
+
+def _percent_change(current, previous):
+    return np.divide((current - previous) * 100, np.abs(previous),
+                     out=np.full(len(current), np.nan), where=previous != 0)
+
+
+def ytd_comparison(file_type, as_of=None):
+    """Year-to-date total per category against the same span of the prior year."""
+    wide = get_monthly_rollup(file_type)
+    if wide.empty:
+        return pd.DataFrame()
+
+    as_of = pd.Timestamp(as_of) if as_of is not None else pd.Timestamp.now()
+    month = as_of.to_period('M').to_timestamp()
+    year_start = month.replace(month=1)
+    prior_start = year_start - pd.DateOffset(years=1)
+    prior_month = month - pd.DateOffset(years=1)
+
+    ytd = wide.loc[(wide.index >= year_start) & (wide.index <= month)].sum()
+    prior_ytd = wide.loc[(wide.index >= prior_start) & (wide.index <= prior_month)].sum()
+
+    result = pd.DataFrame({'ytd': ytd, 'prior_ytd': prior_ytd})
+    result['change'] = result['ytd'] - result['prior_ytd']
+    result['change_pct'] = _percent_change(result['ytd'].to_numpy(), result['prior_ytd'].to_numpy())
+    result = result[(result['ytd'] != 0) | (result['prior_ytd'] != 0)]
+    return result.rename_axis(CATEGORY_COLUMNS[file_type]).sort_values('ytd', ascending=False).reset_index()
+
+
+def same_month_last_year(file_type, month=None):
+    """Each category's total for a month against the same month a year earlier.
+
+    Defaults to the latest month with data.
+    """
+    wide = get_monthly_rollup(file_type)
+    if wide.empty:
+        return pd.DataFrame()
+
+    month = pd.Timestamp(month).to_period('M').to_timestamp() if month is not None else wide.index.max()
+    last_year = month - pd.DateOffset(years=1)
+    zeros = pd.Series(0.0, index=wide.columns)
+
+    result = pd.DataFrame({
+        'this_year': wide.loc[month] if month in wide.index else zeros,
+        'last_year': wide.loc[last_year] if last_year in wide.index else zeros
+    })
+    result['change'] = result['this_year'] - result['last_year']
+    result['change_pct'] = _percent_change(result['this_year'].to_numpy(), result['last_year'].to_numpy())
+    result = result[(result['this_year'] != 0) | (result['last_year'] != 0)]
+    return result.rename_axis(CATEGORY_COLUMNS[file_type]).sort_values('this_year', ascending=False).reset_index()
+
+
+def year_over_year_by_month(file_type):
+    """Every month's total per category next to the same month a year earlier.
+
+    A 12-row shift of the complete monthly table, so it covers the whole
+    history in one vectorised step.
+    """
+    wide = get_monthly_rollup(file_type)
+    if wide.empty:
+        return pd.DataFrame()
+
+    current = wide.stack().rename('this_year')
+    previous = wide.shift(12).stack().rename('last_year')
+    result = pd.concat([current, previous], axis=1).dropna(subset=['last_year'])
+    result['change'] = result['this_year'] - result['last_year']
+    result['change_pct'] = _percent_change(result['this_year'].to_numpy(), result['last_year'].to_numpy())
+    return result.rename_axis(['month', CATEGORY_COLUMNS[file_type]]).reset_index()
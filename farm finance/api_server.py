@@ -0,0 +1,362 @@
+# -*- coding: utf-8 -*-
+"""
+Lightweight asyncio HTTP/JSON service over data_manager for field data entry.
+
+Run from the "farm finance" directory:
+
+    python api_server.py --host 0.0.0.0 --port 8600
+
+Endpoints:
+    GET    /health
+    GET    /summary/expenses        expenses grouped by category
+    GET    /summary/outputs         outputs grouped by crop type
+    GET    /summary/profit-loss     monthly profit/loss
+    POST   /inputs                  one record (object) or many (array)
+    POST   /expenses                one record (object) or many (array)
+    POST   /outputs                 one record (object) or many (array)
+    POST   /batch                   {"inputs": [...], "expenses": [...], "outputs": [...]}
+    DELETE /<inputs|expenses|outputs>/<id>
+
+File I/O runs in worker threads so the event loop never blocks. All writes go
+through a single writer task which group-commits submissions that arrive
+together, so many phones posting at once cost one CSV rewrite per table
+instead of one per request.
+
+Records may carry optional plot and crop_cycle tags, plus a crop_type tag on
+inputs and expenses, for the plot and crop cycle breakdowns.
+
+Submissions are checked with validation.validate_frame. If any record is
+invalid nothing is saved; the 400 response lists each problem with its
+record index under "errors".
+
+POST responses list the new IDs in record order. A record whose content matches
+an existing row (or an earlier record in the same submission) is not saved and
+its ID is null, so re-sent or re-imported batches do not create duplicates.
+"""
+import argparse
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from data_manager import (
+    get_expense_data,
+    get_output_data,
+    add_input_records,
+    add_expense_records,
+    add_output_records,
+    delete_record,
+    calculate_profit_loss,
+    get_expense_summary_by_category,
+    get_output_summary_by_crop
+)
+from validation import parse_dates, validate_frame
+
+MAX_BODY_BYTES = 1024 * 1024
+
+ADD_FUNCTIONS = {
+    'inputs': add_input_records,
+    'expenses': add_expense_records,
+    'outputs': add_output_records
+}
+
+STATUS_TEXT = {
+    200: 'OK',
+    201: 'Created',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    413: 'Payload Too Large',
+    500: 'Internal Server Error'
+}
+
+
+class RequestError(Exception):
+    """An error that should be reported to the client with an HTTP status."""
+
+    def __init__(self, status, message, errors=None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.errors = errors
+
+
+def validate_records(file_type, records):
+    """Validate submitted records as one frame and normalise their dates."""
+    if not isinstance(records, list):
+        records = [records]
+
+    for index, record in enumerate(records):
+        if not isinstance(record, dict):
+            raise RequestError(400, f"{file_type}[{index}]: record must be an object")
+    if not records:
+        return records
+
+    frame = pd.DataFrame(records)
+    errors = validate_frame(file_type, frame)
+    if not errors.empty:
+        raise RequestError(400, f"{file_type}: {errors['row'].nunique()} invalid records",
+                           errors=frame_to_json(errors.rename(columns={'row': 'record'})))
+
+    dates = parse_dates(frame['date']).dt.strftime('%Y-%m-%d')
+    for record, date in zip(records, dates):
+        record['date'] = date
+    return records
+
+
+def frame_to_json(df):
+    """Convert a DataFrame to a list of JSON-safe dicts."""
+    if df.empty:
+        return []
+    return json.loads(df.to_json(orient='records', date_format='iso'))
+
+
+def profit_loss_summary():
+    """Monthly profit/loss for the whole dataset."""
+    return calculate_profit_loss(
+        get_expense_data(columns=['date', 'amount']),
+        get_output_data(columns=['date', 'sales_amount'])
+    )
+
+
+class DataService:
+    """Runs data_manager calls off the event loop with group-committed writes."""
+
+    def __init__(self, read_workers=4):
+        self.read_executor = ThreadPoolExecutor(max_workers=read_workers, thread_name_prefix='api-read')
+        # CSV writes rewrite the whole file, so they must never run concurrently
+        self.write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='api-write')
+        self.write_queue = asyncio.Queue()
+        self.writer_task = None
+
+    def start(self):
+        self.writer_task = asyncio.create_task(self._writer())
+
+    async def stop(self):
+        if self.writer_task:
+            self.writer_task.cancel()
+        self.read_executor.shutdown(wait=False)
+        self.write_executor.shutdown(wait=True)
+
+    async def read(self, func):
+        """Run a read-only data_manager function in the read pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.read_executor, func)
+
+    async def add(self, file_type, records):
+        """Queue records for the writer and wait for their new IDs."""
+        future = asyncio.get_running_loop().create_future()
+        await self.write_queue.put(('add', file_type, records, future))
+        return await future
+
+    async def delete(self, file_type, record_id):
+        """Queue a delete for the writer and wait for the result."""
+        future = asyncio.get_running_loop().create_future()
+        await self.write_queue.put(('delete', file_type, record_id, future))
+        return await future
+
+    async def _writer(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = [await self.write_queue.get()]
+            # Group-commit everything that queued up while the last write ran
+            while not self.write_queue.empty():
+                pending.append(self.write_queue.get_nowait())
+
+            for group in self._group_operations(pending):
+                operation, file_type = group[0][0], group[0][1]
+                try:
+                    if operation == 'add':
+                        await self._commit_adds(file_type, group)
+                    else:
+                        item = group[0]
+                        result = await loop.run_in_executor(
+                            self.write_executor, delete_record, file_type, item[2]
+                        )
+                        self._resolve(item[3], result)
+                except Exception as exc:
+                    for item in group:
+                        if not item[3].done():
+                            item[3].set_exception(exc)
+
+    async def _commit_adds(self, file_type, group):
+        """Add a group's records in one write, or request by request if that fails.
+
+        One request's bad record then fails only that request, not every
+        request committed alongside it.
+        """
+        loop = asyncio.get_running_loop()
+        records = [record for item in group for record in item[2]]
+        try:
+            new_ids = await loop.run_in_executor(self.write_executor, ADD_FUNCTIONS[file_type], records)
+        except Exception:
+            if len(group) == 1:
+                raise
+            for item in group:
+                try:
+                    self._resolve(item[3], await loop.run_in_executor(
+                        self.write_executor, ADD_FUNCTIONS[file_type], item[2]
+                    ))
+                except Exception as exc:
+                    if not item[3].done():
+                        item[3].set_exception(exc)
+            return
+
+        offset = 0
+        for item in group:
+            count = len(item[2])
+            self._resolve(item[3], new_ids[offset:offset + count])
+            offset += count
+
+    @staticmethod
+    def _group_operations(pending):
+        """Merge consecutive adds to the same table, keeping deletes in order."""
+        groups = []
+        for item in pending:
+            if (item[0] == 'add' and groups and groups[-1][0][0] == 'add'
+                    and groups[-1][0][1] == item[1]):
+                groups[-1].append(item)
+            else:
+                groups.append([item])
+        return groups
+
+    @staticmethod
+    def _resolve(future, value):
+        if not future.done():
+            future.set_result(value)
+
+
+async def handle_request(service, method, path, body):
+    """Route a request and return (status, payload)."""
+    parts = [part for part in path.split('?', 1)[0].split('/') if part]
+
+    if method == 'GET':
+        if parts == ['health']:
+            return 200, {'status': 'ok'}
+        if parts == ['summary', 'expenses']:
+            return 200, frame_to_json(await service.read(get_expense_summary_by_category))
+        if parts == ['summary', 'outputs']:
+            return 200, frame_to_json(await service.read(get_output_summary_by_crop))
+        if parts == ['summary', 'profit-loss']:
+            return 200, frame_to_json(await service.read(profit_loss_summary))
+        raise RequestError(404, 'Not found')
+
+    if method == 'POST':
+        try:
+            payload = json.loads(body or b'null')
+        except ValueError:
+            raise RequestError(400, 'Body must be valid JSON')
+
+        if len(parts) == 1 and parts[0] in ADD_FUNCTIONS:
+            records = validate_records(parts[0], payload)
+            new_ids = await service.add(parts[0], records)
+            return 201, {parts[0]: new_ids}
+
+        if parts == ['batch']:
+            if not isinstance(payload, dict) or not set(payload) <= set(ADD_FUNCTIONS):
+                raise RequestError(400, 'Batch must be an object keyed by inputs, expenses and/or outputs')
+            batches = {file_type: validate_records(file_type, records)
+                       for file_type, records in payload.items()}
+            results = await asyncio.gather(*[
+                service.add(file_type, records) for file_type, records in batches.items()
+            ])
+            return 201, dict(zip(batches.keys(), results))
+        raise RequestError(404, 'Not found')
+
+    if method == 'DELETE':
+        if len(parts) == 2 and parts[0] in ADD_FUNCTIONS:
+            try:
+                record_id = int(parts[1])
+            except ValueError:
+                raise RequestError(400, 'Record ID must be an integer')
+            await service.delete(parts[0], record_id)
+            return 200, {'deleted': record_id}
+        raise RequestError(404, 'Not found')
+
+    raise RequestError(405, 'Method not allowed')
+
+
+async def handle_connection(service, reader, writer):
+    """Serve HTTP/1.1 requests on one connection, honouring keep-alive."""
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            try:
+                method, path, version = request_line.decode('latin-1').split()
+            except ValueError:
+                break
+
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+
+            keep_alive = (headers.get('connection', '').lower() != 'close'
+                          and version.upper() == 'HTTP/1.1')
+            try:
+                try:
+                    length = int(headers.get('content-length', 0))
+                except ValueError:
+                    length = -1
+                if length < 0 or length > MAX_BODY_BYTES:
+                    # The body is left unread, so the connection can't be reused
+                    keep_alive = False
+                if length < 0:
+                    raise RequestError(400, 'Content-Length must be a non-negative integer')
+                if length > MAX_BODY_BYTES:
+                    raise RequestError(413, 'Request body too large')
+                body = await reader.readexactly(length) if length else b''
+                status, payload = await handle_request(service, method.upper(), path, body)
+            except RequestError as exc:
+                status, payload = exc.status, {'error': exc.message}
+                if exc.errors:
+                    payload['errors'] = exc.errors
+            except Exception as exc:
+                status, payload = 500, {'error': str(exc)}
+
+            data = json.dumps(payload).encode('utf-8')
+            writer.write(
+                f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(data)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + data
+            )
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host='127.0.0.1', port=8600):
+    """Start the API server and run until cancelled."""
+    service = DataService()
+    service.start()
+    server = await asyncio.start_server(
+        lambda reader, writer: handle_connection(service, reader, writer), host, port
+    )
+    print(f"Farm finance API listening on http://{host}:{port}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Farm finance JSON API for field data entry")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8600)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
@@ -6,13 +6,16 @@ Created on Sun Apr 13 16:11:46 2025
 """
 import streamlit as st
 import os
-import pandas as pd
-from datetime import datetime
 import plotly.express as px
+from perf import PageTimer
+from utils import get_data_dir
+from data_manager import get_record_store
+from record_store import POLL_SECONDS
+from report_scheduler import start_scheduler
 
 # Make sure the data directory exists
-if not os.path.exists('data'):
-    os.makedirs('data')
+if not os.path.exists(get_data_dir()):
+    os.makedirs(get_data_dir())
 
 # Set page config
 st.set_page_config(
@@ -22,6 +25,28 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Hidden performance diagnostics panel, opened with ?diagnostics=1
+if st.query_params.get("diagnostics") == "1":
+    from perf import render_performance_panel
+    render_performance_panel()
+    st.stop()
+
+page_timer = PageTimer('app')
+
+# Pre-generate the standard period reports in the background
+start_scheduler()
+
+# Rerun when any session (or another process) changes the data
+@st.fragment(run_every=POLL_SECONDS)
+def watch_for_changes():
+    changes = get_record_store().refresh()
+    seen = st.session_state.setdefault('home_seen_changes', changes)
+    if changes != seen:
+        st.session_state['home_seen_changes'] = changes
+        st.rerun()
+
+watch_for_changes()
+
 # App title and description
 st.title("🚜 Farm Management System")
 st.markdown("""
@@ -35,67 +60,68 @@ This application helps you manage your farm operations by tracking:
 # Main dashboard content
 st.header("Farm Dashboard")
 
-# Load data
-from data_manager import get_expense_data, get_input_data, get_output_data, calculate_profit_loss
+# Load precomputed aggregates
+from aggregates import get_dashboard_snapshot
 
-expense_df = get_expense_data()
-input_df = get_input_data()
-output_df = get_output_data()
-
-# Calculate profit/loss
-profit_loss_df = calculate_profit_loss(expense_df, output_df)
+snapshot = get_dashboard_snapshot()
+all_time = snapshot['periods']['All time']
+profit_loss_df = all_time['profit_loss']
+page_timer.lap('load_snapshot')
 
 # Display summary metrics
 col1, col2, col3, col4 = st.columns(4)
 
 with col1:
-    total_expenses = expense_df['amount'].sum() if not expense_df.empty else 0
+    total_expenses = all_time['total_expenses']
     st.metric(label="Total Expenses", value=f"₦{total_expenses:,.2f}")
 
 with col2:
-    total_sales = output_df['sales_amount'].sum() if not output_df.empty else 0
+    total_sales = all_time['total_sales']
     st.metric(label="Total Sales", value=f"₦{total_sales:,.2f}")
 
 with col3:
-    net_profit = total_sales - total_expenses
+    net_profit = all_time['net_profit']
     st.metric(label="Net Profit/Loss", 
               value=f"₦{net_profit:,.2f}", 
               delta=f"{net_profit/total_expenses*100:.1f}%" if total_expenses > 0 else "N/A")
 
 with col4:
-    last_month = datetime.now().month - 1 if datetime.now().month > 1 else 12
-    last_month_expense = expense_df[pd.to_datetime(expense_df['date']).dt.month == last_month]['amount'].sum() if not expense_df.empty else 0
+    last_month_expense = snapshot['last_month_expense']
     st.metric(label="Last Month Expenses", value=f"₦{last_month_expense:,.2f}")
 
+page_timer.lap('metrics')
+
 # Recent activities
 st.subheader("Recent Activities")
 tab1, tab2, tab3 = st.tabs(["Recent Expenses", "Recent Inputs", "Recent Outputs"])
 
 with tab1:
-    if not expense_df.empty:
-        st.dataframe(expense_df.sort_values('date', ascending=False).head(5))
+    if not all_time['recent_expenses'].empty:
+        st.dataframe(all_time['recent_expenses'])
     else:
         st.info("No expense data available. Add some expenses to see them here.")
 
 with tab2:
-    if not input_df.empty:
-        st.dataframe(input_df.sort_values('date', ascending=False).head(5))
+    if not all_time['recent_inputs'].empty:
+        st.dataframe(all_time['recent_inputs'])
     else:
         st.info("No input data available. Add some inputs to see them here.")
 
 with tab3:
-    if not output_df.empty:
-        st.dataframe(output_df.sort_values('date', ascending=False).head(5))
+    if not all_time['recent_outputs'].empty:
+        st.dataframe(all_time['recent_outputs'])
     else:
         st.info("No output data available. Add some outputs to see them here.")
 
+page_timer.lap('recent_activities')
+
 # Charts
 st.subheader("Financial Overview")
 
 # Expense breakdown chart
-if not expense_df.empty:
-    expense_by_category = expense_df.groupby('category')['amount'].sum().reset_index()
-    fig = px.pie(expense_by_category, values='amount', names='category', 
+expense_by_category = snapshot['expense_summary']
+if not expense_by_category.empty:
+    fig = px.pie(expense_by_category, values='total_amount', names='category', 
                 title='Expense Breakdown by Category',
                 color_discrete_sequence=px.colors.qualitative.Pastel)
     st.plotly_chart(fig, use_container_width=True)
@@ -113,6 +139,8 @@ if not profit_loss_df.empty:
 else:
     st.info("Add expense and sales data to see monthly financial performance chart.")
 
+page_timer.lap('charts')
+
 # Navigation info
 st.sidebar.title("Navigation")
 st.sidebar.info("""
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+Budget-vs-actual per expense category by month or season.
+
+Budgets are stored in data/budgets.csv as (category, period, amount) where
+period is either a month ("2025-04") or a season from utils.get_seasons
+("Rainy Season 2025"). Season budgets are spread evenly over their months,
+giving a category x month budget table that lines up with the expense
+rollup from analytics, so variance is plain aligned-index arithmetic.
+"""
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+import journal
+from analytics import get_monthly_rollup
+from journal import atomic_write_csv
+from utils import get_data_dir, get_seasons
+
+BUDGET_FILE = os.path.join(get_data_dir(), 'budgets.csv')
+BUDGET_COLUMNS = ['category', 'period', 'amount']
+
+_cache = {}
+_lock = threading.Lock()
+
+
+def get_budget_data():
+    """Load budget data from CSV file."""
+    try:
+        return pd.read_csv(BUDGET_FILE)
+    except (pd.errors.EmptyDataError, FileNotFoundError):
+        return pd.DataFrame(columns=BUDGET_COLUMNS)
+
+
+def set_budget(category, period, amount):
+    """Create or replace the budget for a category and period."""
+    # The journal lock keeps other processes out of the read-modify-write
+    with journal.lock:
+        df = get_budget_data()
+        df = df[~((df['category'] == category) & (df['period'] == period))]
+        new_record = pd.DataFrame([{'category': category, 'period': period, 'amount': float(amount)}])
+        df = pd.concat([df, new_record], ignore_index=True) if not df.empty else new_record
+        atomic_write_csv(df, BUDGET_FILE)
+    return True
+
+
+def delete_budget(category, period):
+    """Remove the budget for a category and period."""
+    with journal.lock:
+        df = get_budget_data()
+        df = df[~((df['category'] == category) & (df['period'] == period))]
+        atomic_write_csv(df, BUDGET_FILE)
+    return True
+
+
+def season_months(season, year):
+    """Month-start timestamps covered by a season starting in year."""
+    months = get_seasons()[season]
+    first = months[0]
+    return pd.DatetimeIndex([
+        pd.Timestamp(year=year if month >= first else year + 1, month=month, day=1)
+        for month in months
+    ])
+
+
+def season_label(date):
+    """Season period label ("Dry Season 2025") containing date."""
+    date = pd.Timestamp(date)
+    for season, months in get_seasons().items():
+        if date.month in months:
+            year = date.year if date.month >= months[0] else date.year - 1
+            return f"{season} {year}"
+    return None
+
+
+def period_months(period):
+    """Month-start timestamps covered by a month or season period label."""
+    for season in get_seasons():
+        if period.startswith(season + ' '):
+            return season_months(season, int(period[len(season) + 1:]))
+    return pd.DatetimeIndex([pd.Period(period, freq='M').to_timestamp()])
+
+
+def _budget_version():
+    try:
+        stat = os.stat(BUDGET_FILE)
+        return stat.st_mtime_ns, stat.st_size
+    except FileNotFoundError:
+        return 0, 0
+
+
+def get_monthly_budget_table():
+    """Month x category budget table, cached until budgets.csv changes."""
+    version = _budget_version()
+    with _lock:
+        if _cache.get('version') == version:
+            return _cache['table']
+
+    budgets = get_budget_data()
+    if budgets.empty:
+        table = pd.DataFrame()
+    else:
+        # Expand each budget row to its months, splitting season amounts evenly
+        months = [period_months(str(period)) for period in budgets['period']]
+        counts = np.array([len(m) for m in months])
+        expanded = pd.DataFrame({
+            'month': np.concatenate([m.values for m in months]),
+            'category': np.repeat(budgets['category'].to_numpy(), counts),
+            'amount': np.repeat(budgets['amount'].astype(float).to_numpy() / counts, counts)
+        })
+        table = expanded.pivot_table(index='month', columns='category', values='amount',
+                                     aggfunc='sum', fill_value=0.0)
+
+    with _lock:
+        _cache['version'] = version
+        _cache['table'] = table
+    return table
+
+
+def budget_vs_actual(months, today=None):
+    """Actual, budget, variance and burn-rate projection per category over months.
+
+    months is a DatetimeIndex of month starts (see period_months). The burn
+    rate projects the actual spend to the end of the period from the share
+    of the period already elapsed.
+    """
+    actual = get_monthly_rollup('expenses')
+    budget = get_monthly_budget_table()
+    if actual.empty and budget.empty:
+        return pd.DataFrame()
+
+    # Align both tables on the same months and categories, then sum the period
+    actual, budget = actual.align(budget, join='outer', fill_value=0.0)
+    actual = actual.reindex(months, fill_value=0.0).sum()
+    budget = budget.reindex(months, fill_value=0.0).sum()
+
+    result = pd.DataFrame({'actual': actual, 'budget': budget}).rename_axis('category')
+    result = result[(result['actual'] != 0) | (result['budget'] != 0)]
+    if result.empty:
+        return pd.DataFrame()
+
+    today = pd.Timestamp(today) if today is not None else pd.Timestamp.now()
+    period_start = months.min()
+    period_end = months.max() + pd.offsets.MonthEnd(0)
+    total_days = (period_end - period_start).days + 1
+    elapsed_days = min(max((today.normalize() - period_start).days + 1, 0), total_days)
+    elapsed_share = elapsed_days / total_days
+
+    actual_values = result['actual'].to_numpy()
+    budget_values = result['budget'].to_numpy()
+    result['variance'] = actual_values - budget_values
+    result['variance_pct'] = np.divide(result['variance'].to_numpy() * 100, budget_values,
+                                       out=np.full(len(result), np.nan), where=budget_values != 0)
+    result['budget_used_pct'] = np.divide(actual_values * 100, budget_values,
+                                          out=np.full(len(result), np.nan), where=budget_values != 0)
+    result['projected'] = actual_values / elapsed_share if elapsed_share > 0 else actual_values
+    result['projected_variance'] = result['projected'] - budget_values
+    result['period_elapsed_pct'] = elapsed_share * 100
+
+    return result.sort_values('variance', ascending=False).reset_index()
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+Pre-aggregated cube of costs and sales by month, plot, crop cycle, crop and category.
+
+Each cell holds the cost, sales and record count of one month x plot x crop
+cycle x crop x category combination. Costs come from expenses (inputs are
+already mirrored there) and sales from outputs, whose category is "Sales".
+Untagged records fall under "Unassigned". The cube is built in one grouped
+pass per file and then kept current by a write listener that aggregates
+only the added or deleted rows into it, so local writes never rescan the
+tables (a write by another process is noticed and the file rebuilt).
+Slices, drill-downs and roll-ups are group-bys over the cells, of which
+there are far fewer than records.
+"""
+import threading
+
+import pandas as pd
+
+from data_manager import get_data_version, load_at_version, load_table, register_write_listener
+from perf import timed
+
+DIMENSIONS = ['month', 'plot', 'crop_cycle', 'crop_type', 'category']
+MEASURES = ['cost', 'sales', 'records']
+CUBE_FILES = ['expenses', 'outputs']
+
+# Dashboard drill-down order, from the whole farm to single months
+DRILL_PATH = ['plot', 'crop_cycle', 'crop_type', 'category', 'month']
+
+UNASSIGNED = 'Unassigned'
+SALES_CATEGORY = 'Sales'
+
+# Cells per file, each with the file version they were built from
+_cells = {}
+_lock = threading.Lock()
+
+
+def _facts(file_type, df):
+    """One row of dimensions and measures per expense or output record."""
+    index = df.index
+    if file_type == 'expenses':
+        category = df['category']
+        cost = pd.to_numeric(df['amount'], errors='coerce')
+        sales = pd.Series(0.0, index=index)
+    else:
+        category = pd.Series(SALES_CATEGORY, index=index)
+        cost = pd.Series(0.0, index=index)
+        sales = pd.to_numeric(df['sales_amount'], errors='coerce')
+
+    dates = pd.to_datetime(df['date'].astype(str), errors='coerce', format='ISO8601')
+    facts = pd.DataFrame({
+        'month': dates.dt.strftime('%Y-%m'),
+        'plot': df['plot'] if 'plot' in df else None,
+        'crop_cycle': df['crop_cycle'] if 'crop_cycle' in df else None,
+        'crop_type': df['crop_type'] if 'crop_type' in df else None,
+        'category': category,
+        'cost': cost.fillna(0.0),
+        'sales': sales.fillna(0.0),
+        'records': 1
+    }, index=index)
+    for dimension in DIMENSIONS:
+        values = facts[dimension].astype(object).where(facts[dimension].notna(), '')
+        facts[dimension] = values.astype(str).str.strip().replace('', UNASSIGNED)
+    return facts
+
+
+def _aggregate(facts):
+    return facts.groupby(DIMENSIONS)[MEASURES].sum()
+
+
+def _file_cells(file_type):
+    """Cells of one file, rebuilt only if the file changed outside this process."""
+    version = get_data_version([file_type])
+    with _lock:
+        entry = _cells.get(file_type)
+        if entry is not None and entry['version'] == version:
+            return entry['cells']
+
+    version, df = load_at_version([file_type], lambda: load_table(file_type))
+    cells = _aggregate(_facts(file_type, df))
+    with _lock:
+        _cells[file_type] = {'version': version, 'cells': cells}
+    return cells
+
+
+def _update_cells(file_type, action, records, versions):
+    """Write listener adding or subtracting the written rows' aggregates."""
+    if file_type not in CUBE_FILES:
+        return
+    before, after = versions
+    with _lock:
+        entry = _cells.get(file_type)
+        if entry is None or records.empty:
+            return
+        if entry['version'] != before:
+            # Missed another write, rebuild on next use
+            del _cells[file_type]
+            return
+        delta = _aggregate(_facts(file_type, records))
+        if action == 'delete':
+            delta = -delta
+        cells = entry['cells'].add(delta, fill_value=0).astype({'records': 'int64'})
+        entry['cells'] = cells[cells['records'] > 0]
+        entry['version'] = after
+
+
+register_write_listener(_update_cells)
+
+
+def get_cube():
+    """Return every cell as a DataFrame with DIMENSIONS columns and MEASURES.
+
+    The cells are shared with other callers and must not be modified.
+    """
+    cells = pd.concat([_file_cells(file_type) for file_type in CUBE_FILES])
+    return cells.reset_index()
+
+
+@timed()
+def slice_cube(by, filters=None, start_month=None, end_month=None):
+    """Roll the cube up to the by dimensions within a slice.
+
+    filters maps dimensions to a value or a list of values, and start_month /
+    end_month ('YYYY-MM', inclusive) bound the months. Returns one row per
+    combination of the by dimensions with cost, sales, profit and records,
+    highest cost first.
+    """
+    cells = get_cube()
+    mask = pd.Series(True, index=cells.index)
+    for dimension, values in (filters or {}).items():
+        values = values if isinstance(values, (list, tuple, set)) else [values]
+        mask &= cells[dimension].isin(list(values))
+    if start_month is not None:
+        mask &= cells['month'] >= start_month
+    if end_month is not None:
+        mask &= cells['month'] <= end_month
+    cells = cells[mask]
+
+    by = list(by)
+    if by:
+        result = cells.groupby(by)[MEASURES].sum().reset_index()
+    else:
+        result = cells[MEASURES].sum().to_frame().T
+    result['profit'] = result['sales'] - result['cost']
+    sort = ['month'] if by == ['month'] else ['cost', 'sales']
+    return result.sort_values(sort, ascending=by == ['month']).reset_index(drop=True)
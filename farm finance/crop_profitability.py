@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+Per-crop costs, sales and margin by allocating farm costs to crops.
+
+Costs are the expenses (inputs are already mirrored there). An expense tagged
+with a crop is charged to that crop directly; untagged, shared costs are
+spread over the crops by a rule:
+- 'revenue': in proportion to each crop's sales over the period,
+- 'area': in proportion to the area under each crop, given by the caller,
+- 'direct': not spread, kept under "Unallocated".
+Each month's shared cost is spread with the period's shares, so a month
+without sales still carries its costs.
+
+Expenses and outputs are grouped to month x crop in one pass each and cached
+until either file changes; allocating, filtering and totalling only touch
+that small table.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+from analytics import profit_margin
+from data_manager import get_data_version, get_expense_data, get_output_data, get_output_summary_by_crop
+from perf import timed
+
+ALLOCATION_RULES = ['revenue', 'area', 'direct']
+UNALLOCATED = 'Unallocated'
+
+_cache = {}
+_lock = threading.Lock()
+
+
+def _month_start(dates):
+    return pd.to_datetime(dates.astype(str), errors='coerce', format='ISO8601').dt.to_period('M').dt.to_timestamp()
+
+
+def _group_months():
+    """Month x crop table of direct cost, sales and normalized quantity."""
+    expenses = get_expense_data(columns=['date', 'amount', 'crop_type'])
+    crop = expenses['crop_type'].astype(object).where(expenses['crop_type'].notna(), '')
+    crop = crop.astype(str).str.strip().replace('', UNALLOCATED)
+    costs = pd.to_numeric(expenses['amount'], errors='coerce').fillna(0.0).groupby(
+        [_month_start(expenses['date']).rename('month'), crop.rename('crop')]).sum().rename('cost')
+
+    outputs = get_output_data(columns=['date', 'crop_type', 'sales_amount', 'normalized_quantity'])
+    keys = [_month_start(outputs['date']).rename('month'), outputs['crop_type'].astype(str).rename('crop')]
+    sales = pd.DataFrame({
+        'sales': pd.to_numeric(outputs['sales_amount'], errors='coerce').fillna(0.0),
+        'quantity': pd.to_numeric(outputs['normalized_quantity'], errors='coerce').fillna(0.0)
+    }).groupby(keys).sum()
+
+    table = pd.concat([costs, sales], axis=1).fillna(0.0)
+    return table.reset_index()
+
+
+def _get_months():
+    version = get_data_version(['expenses', 'outputs'])
+    with _lock:
+        if _cache.get('version') == version:
+            return _cache['table']
+
+    table = _group_months()
+    with _lock:
+        _cache.update(version=version, table=table)
+    return table
+
+
+def _shares(crops, rule, areas):
+    """Share of the shared costs per crop, empty when nothing can be allocated."""
+    if rule == 'revenue':
+        basis = crops.groupby('crop')['sales'].sum()
+    elif rule == 'area':
+        basis = pd.Series(areas or {}, dtype=float)
+    else:
+        return pd.Series(dtype=float)
+    basis = basis[basis > 0]
+    return basis / basis.sum() if not basis.empty else basis
+
+
+@timed()
+def crop_margins(start=None, end=None, rule='revenue', areas=None):
+    """Return cost, sales and margin per month and crop.
+
+    start/end bound the months (whole months containing them). rule is one
+    of ALLOCATION_RULES and areas maps crop to area for the 'area' rule.
+    Columns: month, crop, direct_cost, allocated_cost, total_cost, sales,
+    quantity (kg, or liters for oils), margin and margin_pct. Shared costs
+    that could not be allocated stay under the crop "Unallocated".
+    """
+    if rule not in ALLOCATION_RULES:
+        raise ValueError(f"Unknown allocation rule '{rule}', expected one of {ALLOCATION_RULES}")
+
+    table = _get_months()
+    if start is not None:
+        table = table[table['month'] >= pd.Timestamp(start).to_period('M').to_timestamp()]
+    if end is not None:
+        table = table[table['month'] <= pd.Timestamp(end).to_period('M').to_timestamp()]
+
+    is_shared = table['crop'] == UNALLOCATED
+    crops = table[~is_shared].set_index(['month', 'crop'])
+    shared = table[is_shared].set_index('month')['cost']
+    shares = _shares(crops.reset_index(), rule, areas)
+
+    result = crops.rename(columns={'cost': 'direct_cost'})
+    if not shares.empty and not shared.empty:
+        # Each month's shared cost times each crop's share
+        allocated = pd.DataFrame(np.outer(shared.to_numpy(), shares.to_numpy()),
+                                 index=shared.index, columns=shares.index.rename('crop')).stack()
+        result = result.join(allocated.rename('allocated_cost'), how='outer')
+    else:
+        unallocated = shared.to_frame('allocated_cost')
+        unallocated['crop'] = UNALLOCATED
+        result = pd.concat([result, unallocated.set_index('crop', append=True)])
+
+    result = result.reindex(columns=['direct_cost', 'allocated_cost', 'sales', 'quantity']).fillna(0.0)
+    result['total_cost'] = result['direct_cost'] + result['allocated_cost']
+    result['margin'] = result['sales'] - result['total_cost']
+    result['margin_pct'] = profit_margin(result['margin'], result['sales'])
+    result = result.reset_index().sort_values(['month', 'crop']).reset_index(drop=True)
+    return result[['month', 'crop', 'direct_cost', 'allocated_cost', 'total_cost', 'sales',
+                   'quantity', 'margin', 'margin_pct']]
+
+
+def crop_summary(start=None, end=None, rule='revenue', areas=None):
+    """Totals of crop_margins per crop, most profitable first.
+
+    Joined with get_output_summary_by_crop for the unit and the all-time
+    average price per kg/liter, next to the period's cost per kg/liter
+    (the break-even price).
+    """
+    margins = crop_margins(start, end, rule, areas)
+    if margins.empty:
+        return pd.DataFrame()
+
+    summary = margins.groupby('crop')[['direct_cost', 'allocated_cost', 'total_cost', 'sales',
+                                       'quantity', 'margin']].sum()
+    summary['margin_pct'] = profit_margin(summary['margin'], summary['sales'])
+    summary['cost_per_unit'] = np.divide(summary['total_cost'], summary['quantity'],
+                                         out=np.full(len(summary), np.nan), where=summary['quantity'] > 0)
+
+    prices = get_output_summary_by_crop()
+    if not prices.empty:
+        prices = prices.set_index('crop_type')[['normalized_unit', 'price_per_unit']]
+        summary = summary.join(prices.rename(columns={'normalized_unit': 'unit', 'price_per_unit': 'avg_price'}))
+    else:
+        summary['unit'] = None
+        summary['avg_price'] = np.nan
+    return summary.rename_axis('crop').reset_index().sort_values('margin', ascending=False).reset_index(drop=True)
@@ -6,166 +6,890 @@ Created on Sun Apr 13 16:13:44 2025
 """
 import pandas as pd
 import os
-from utils import ensure_data_files_exist, generate_id, get_month_year_from_date
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from utils import (
+    ensure_data_files_exist,
+    generate_id,
+    generate_gid,
+    get_data_dir,
+    get_month_year_from_date,
+    get_file_headers,
+    get_unit_conversion_table
+)
+from perf import timed
+import journal
+from journal import atomic_write_csv
+from record_store import RecordStore
+from validation import check_records
 
 # Ensure data files exist
 ensure_data_files_exist()
 
-def get_input_data():
-    """Load input data from CSV file."""
+DATA_FILES = {
+    'inputs': os.path.join(get_data_dir(), 'inputs.csv'),
+    'expenses': os.path.join(get_data_dir(), 'expenses.csv'),
+    'outputs': os.path.join(get_data_dir(), 'outputs.csv')
+}
+
+# Global IDs of deleted records, so a synced add can never bring one back
+TOMBSTONE_FILE = os.path.join(get_data_dir(), 'tombstones.csv')
+
+# Column each loader's categories= filter applies to
+CATEGORY_COLUMNS = {
+    'inputs': 'category',
+    'expenses': 'category',
+    'outputs': 'crop_type'
+}
+
+# Rows parsed per chunk when filters are pushed down into the read
+READ_CHUNK_ROWS = 100000
+
+# Money column used by RecordQuery amount bounds
+AMOUNT_COLUMNS = {
+    'inputs': 'total_cost',
+    'expenses': 'amount',
+    'outputs': 'sales_amount'
+}
+
+# Columns searched by RecordQuery text
+TEXT_COLUMNS = {
+    'inputs': ['description'],
+    'expenses': ['description'],
+    'outputs': ['buyer']
+}
+
+QUERY_CACHE_SIZE = 64
+
+# Serve reads from one in-memory copy per process instead of parsing the files per
+# session. Column and row filters then run on the whole in-memory table instead
+# of being pushed into the file read.
+USE_SHARED_STORE = True
+
+# Fields whose normalized content identifies a record for duplicate detection
+HASH_FIELDS = {
+    'inputs': ['date', 'category', 'description', 'quantity', 'unit', 'total_cost', 'plot'],
+    'expenses': ['date', 'category', 'description', 'amount', 'plot'],
+    'outputs': ['date', 'crop_type', 'quantity', 'unit', 'sales_amount', 'buyer', 'plot']
+}
+
+# Optional location and crop tags; crop_type is the crop itself on outputs
+DIMENSION_FIELDS = {
+    'inputs': ['plot', 'crop_cycle', 'crop_type'],
+    'expenses': ['plot', 'crop_cycle', 'crop_type'],
+    'outputs': ['plot', 'crop_cycle']
+}
+
+HASH_NUMERIC_FIELDS = {'quantity', 'total_cost', 'amount', 'sales_amount'}
+
+# Callbacks run after every committed write, see register_write_listener
+_write_listeners = []
+
+def register_write_listener(callback):
+    """Register callback(file_type, action, records, versions) to run after each committed write.
+    
+    action is 'add' or 'delete' and records is a DataFrame of the affected rows.
+    versions is (before, after), get_data_version([file_type]) just before and
+    just after the write. A cache built at before can apply records as a delta
+    and move to after; any other cache missed a write (e.g. from another
+    process) and must be rebuilt instead.
+    """
+    if callback not in _write_listeners:
+        _write_listeners.append(callback)
+
+def _notify_write(file_type, action, records, versions):
+    """Tell registered listeners about a committed write."""
+    for callback in list(_write_listeners):
+        try:
+            callback(file_type, action, records, versions)
+        except Exception:
+            # A failing listener must never undo or block a saved write
+            pass
+
+def get_data_version(file_types=None):
+    """Return a cheap fingerprint of the data files that changes on every write.
+    
+    file_types limits the fingerprint to some of the files.
+    """
+    version = []
+    for file_type, file_path in DATA_FILES.items():
+        if file_types is not None and file_type not in file_types:
+            continue
+        try:
+            stat = os.stat(file_path)
+            version.append((file_type, stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            version.append((file_type, 0, 0))
+    return tuple(version)
+
+def load_at_version(file_types, load):
+    """Return (version, load()) for the data files of file_types.
+    
+    version is None when the files changed while loading, so the result is
+    not cached as of a version it may not match, and write listeners drop it
+    instead of applying a delta it may already contain.
+    """
+    version = get_data_version(file_types)
+    result = load()
+    if get_data_version(file_types) != version:
+        return None, result
+    return version, result
+
+def _date_string(value):
+    """Normalise a date-like value to the YYYY-MM-DD form stored in the CSV files."""
+    return pd.Timestamp(value).strftime('%Y-%m-%d')
+
+def _filter_rows(df, file_type, start=None, end=None, categories=None):
+    """Keep rows dated from start to end (inclusive) and in categories.
+    
+    Dates are stored as ISO strings, so the range is compared as strings
+    without parsing every date.
+    """
+    mask = pd.Series(True, index=df.index)
+    if start is not None:
+        mask &= df['date'].astype(str) >= _date_string(start)
+    if end is not None:
+        # Inclusive end date, also for values with a time part
+        mask &= df['date'].astype(str) < _date_string(pd.Timestamp(end) + pd.Timedelta(days=1))
+    if categories:
+        mask &= df[CATEGORY_COLUMNS[file_type]].isin(list(categories))
+    return df[mask]
+
+def _read_table(file_type, columns=None, start=None, end=None, categories=None):
+    """Read a data file, applying column projection and row filters during the read.
+    
+    Only the requested columns plus those needed by the filters are parsed.
+    When filters are given the file is read in chunks and each chunk is
+    filtered before the next one is parsed.
+    """
+    headers = get_file_headers()[f'{file_type}.csv']
+    output_columns = [c for c in headers if c in columns] if columns is not None else headers
+    
+    needed = set(output_columns)
+    if start is not None or end is not None:
+        needed.add('date')
+    if categories:
+        needed.add(CATEGORY_COLUMNS[file_type])
+    
+    def filter_rows(df):
+        return _filter_rows(df, file_type, start, end, categories)
+    
+    filtered = start is not None or end is not None or bool(categories)
     try:
-        df = pd.read_csv('data/inputs.csv')
-        return df
+        if filtered:
+            chunks = [
+                filter_rows(chunk) for chunk in
+                pd.read_csv(DATA_FILES[file_type], usecols=lambda c: c in needed, chunksize=READ_CHUNK_ROWS)
+            ]
+            df = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=output_columns)
+        elif columns is not None:
+            df = pd.read_csv(DATA_FILES[file_type], usecols=lambda c: c in needed)
+        else:
+            df = pd.read_csv(DATA_FILES[file_type])
     except (pd.errors.EmptyDataError, FileNotFoundError):
         # Return empty DataFrame with correct column structure
-        return pd.DataFrame(columns=['id', 'date', 'category', 'description', 'quantity', 'unit', 'cost_per_unit', 'total_cost', 'notes'])
+        return pd.DataFrame(columns=output_columns)
+    
+    if columns is not None or filtered:
+        df = df[[c for c in output_columns if c in df.columns]]
+    
+    return df
+
+_store = RecordStore(load=_read_table, version=lambda file_type: get_data_version([file_type]))
 
-def get_expense_data():
-    """Load expense data from CSV file."""
+def get_record_store():
+    """Return the process-wide record store shared by all sessions."""
+    return _store
+
+def load_table(file_type, columns=None, start=None, end=None, categories=None):
+    """Load any record type's table with column projection and row filters.
+    
+    Served from the shared in-memory store, or read from the file with the
+    filters pushed into the read when USE_SHARED_STORE is off. From the store
+    the filters scan the whole table, projected to the columns they and the
+    caller need first.
+    """
+    if not USE_SHARED_STORE:
+        return _read_table(file_type, columns, start, end, categories)
+    
+    df = _store.get(file_type)
+    if columns is not None:
+        needed = set(columns) | {'date'} | {CATEGORY_COLUMNS[file_type]}
+        df = df[[c for c in df.columns if c in needed]]
+    if start is not None or end is not None or categories:
+        df = _filter_rows(df, file_type, start, end, categories)
+    if columns is not None:
+        df = df[[c for c in df.columns if c in columns]]
+    return df
+
+@timed()
+def get_input_data(columns=None, start=None, end=None, categories=None):
+    """Load input data from CSV file.
+    
+    columns limits the columns returned, start/end keep rows dated within that
+    range (inclusive) and categories keeps rows in those input categories.
+    """
+    return load_table('inputs', columns, start, end, categories)
+
+@timed()
+def get_expense_data(columns=None, start=None, end=None, categories=None):
+    """Load expense data from CSV file.
+    
+    columns limits the columns returned, start/end keep rows dated within that
+    range (inclusive) and categories keeps rows in those expense categories.
+    """
+    return load_table('expenses', columns, start, end, categories)
+
+@timed()
+def get_output_data(columns=None, start=None, end=None, categories=None):
+    """Load output data from CSV file.
+    
+    columns limits the columns returned, start/end keep rows dated within that
+    range (inclusive) and categories keeps rows of those crop types.
+    """
+    return load_table('outputs', columns, start, end, categories)
+
+def normalize_output_quantities(df):
+    """Add normalized_quantity/normalized_unit columns (kg, or liters for oils) to output rows.
+    
+    Uses the per-crop conversion table from utils, so 1 ton plus 50 kg of a
+    crop becomes 1050 kg. Rows whose unit can't be converted for their crop
+    get an empty normalized quantity.
+    """
+    table = get_unit_conversion_table()
+    keys = pd.MultiIndex.from_arrays([df['crop_type'], df['unit']])
+    conversions = table.reindex(keys)
+    df = df.copy()
+    df['normalized_quantity'] = pd.to_numeric(df['quantity'], errors='coerce').to_numpy() * conversions['factor'].to_numpy()
+    df['normalized_unit'] = conversions['normalized_unit'].to_numpy()
+    return df
+
+def _commit_table(file_type, action, df, records, origin=None, gids=None):
+    """Journal a mutation of records, atomically replace the table with df, then checkpoint.
+    
+    Deletes also tombstone the deleted global IDs, plus any extra gids.
+    Returns the file's (before, after) versions for the write listeners.
+    """
+    seq, offset = journal.append(file_type, action, records, origin)
+    before = get_data_version([file_type])
+    atomic_write_csv(df, DATA_FILES[file_type])
+    after = get_data_version([file_type])
+    if action == 'delete':
+        _add_tombstones(file_type, list(records['gid'].dropna()) + list(gids or []))
+    journal.checkpoint(seq, offset)
+    return before, after
+
+def _add_tombstones(file_type, gids):
+    """Append deleted global IDs to the tombstone file."""
+    if not gids:
+        return
+    tombstones = pd.DataFrame({
+        'file_type': file_type,
+        'gid': gids,
+        'deleted_at': pd.Timestamp.now().isoformat(timespec='seconds')
+    })
+    with open(TOMBSTONE_FILE, 'a', newline='', encoding='utf-8') as f:
+        tombstones.to_csv(f, header=f.tell() == 0, index=False)
+        f.flush()
+        os.fsync(f.fileno())
+
+def get_tombstones(file_type=None):
+    """Return the set of deleted global IDs, optionally for one record type."""
     try:
-        df = pd.read_csv('data/expenses.csv')
-        return df
+        df = pd.read_csv(TOMBSTONE_FILE)
     except (pd.errors.EmptyDataError, FileNotFoundError):
-        # Return empty DataFrame with correct column structure
-        return pd.DataFrame(columns=['id', 'date', 'category', 'description', 'amount', 'payment_method', 'notes'])
+        return set()
+    if file_type is not None:
+        df = df[df['file_type'] == file_type]
+    return set(df['gid'].astype(str))
 
-def get_output_data():
-    """Load output data from CSV file."""
-    try:
-        df = pd.read_csv('data/outputs.csv')
+def apply_journal_entry(df, entry):
+    """Return table df with one journal entry applied; applying it twice is harmless."""
+    records = pd.DataFrame(entry['records'])
+    if records.empty or 'id' not in records:
         return df
+    df = df[~df['id'].isin(records['id'])]
+    if entry['action'] == 'add':
+        records = records.reindex(columns=df.columns)
+        df = pd.concat([df, records], ignore_index=True) if not df.empty else records
+    return df
+
+def _replay_journal_entry(entry):
+    """Apply one journal entry to its table file during recovery."""
+    file_type = entry['file']
+    if file_type not in DATA_FILES:
+        return
+    atomic_write_csv(apply_journal_entry(load_table(file_type), entry), DATA_FILES[file_type])
+    if entry['action'] == 'delete':
+        _add_tombstones(file_type, [r['gid'] for r in entry['records'] if r.get('gid')])
+
+def _migrate_output_units():
+    """Store normalized quantities in output files written before they existed."""
+    try:
+        header = pd.read_csv(DATA_FILES['outputs'], nrows=0).columns
     except (pd.errors.EmptyDataError, FileNotFoundError):
-        # Return empty DataFrame with correct column structure
-        return pd.DataFrame(columns=['id', 'date', 'crop_type', 'quantity', 'unit', 'sales_amount', 'buyer', 'notes'])
+        return
+    if 'normalized_quantity' in header:
+        return
+    df = pd.read_csv(DATA_FILES['outputs'])
+    if df.empty:
+        df = df.reindex(columns=get_file_headers()['outputs.csv'])
+    else:
+        df = normalize_output_quantities(df)
+    atomic_write_csv(df, DATA_FILES['outputs'])
+
+def _migrate_global_ids():
+    """Give rows written before global IDs existed a gid.
+    
+    Legacy gids are derived from the record type, local ID and content, so
+    devices that start from copies of the same files agree on them.
+    """
+    for file_type, file_path in DATA_FILES.items():
+        try:
+            header = pd.read_csv(file_path, nrows=0).columns
+        except (pd.errors.EmptyDataError, FileNotFoundError):
+            continue
+        if 'gid' in header:
+            continue
+        df = pd.read_csv(file_path)
+        if df.empty:
+            df = df.reindex(columns=get_file_headers()[f'{file_type}.csv'])
+        else:
+            hashes = pd.Series(record_hashes(file_type, df).to_numpy(), index=df.index)
+            df['gid'] = file_type + '-' + df['id'].astype(str) + '-' + hashes.map('{:016x}'.format)
+        atomic_write_csv(df, file_path)
+
+def summarize_outputs_by_crop(df):
+    """Group output rows by crop with normalized quantity and price per kg/liter."""
+    if df.empty:
+        return pd.DataFrame()
+    
+    summary = df.groupby('crop_type').agg(
+        normalized_quantity=('normalized_quantity', 'sum'),
+        normalized_unit=('normalized_unit', 'first'),
+        sales_amount=('sales_amount', 'sum'),
+        harvest_count=('id', 'count')
+    ).reset_index()
+    
+    # Price only over sales whose quantity could be normalized
+    converted = df[df['normalized_quantity'].notna()]
+    converted_sales = converted.groupby('crop_type')['sales_amount'].sum()
+    quantity = summary['normalized_quantity'].where(summary['normalized_quantity'] > 0)
+    summary['price_per_unit'] = (summary['crop_type'].map(converted_sales) / quantity).fillna(0.0).to_numpy()
+    
+    summary.sort_values('sales_amount', ascending=False, inplace=True)
+    
+    return summary
+
+@dataclass(frozen=True)
+class RecordQuery:
+    """Filter, sort and limit spec for one record type, shared by every page.
+    
+    categories are crop types for outputs, text is a case-insensitive search
+    of the description (buyer for outputs), and the amount bounds apply to
+    total_cost, amount or sales_amount. Queries are hashable so results can
+    be cached by query.
+    """
+    record_type: str
+    start: object = None
+    end: object = None
+    categories: tuple = ()
+    text: str = ''
+    min_amount: float = None
+    max_amount: float = None
+    sort: str = 'date'
+    ascending: bool = False
+    limit: int = None
+
+_query_cache = OrderedDict()
+_query_cache_lock = threading.Lock()
+
+def _refine_query_rows(query, df):
+    """Apply a query's amount bounds and text as one vectorised mask, then sort and limit."""
+    mask = pd.Series(True, index=df.index)
+    amount_column = AMOUNT_COLUMNS[query.record_type]
+    if query.min_amount is not None:
+        mask &= df[amount_column] >= query.min_amount
+    if query.max_amount is not None:
+        mask &= df[amount_column] <= query.max_amount
+    if query.text:
+        text_mask = pd.Series(False, index=df.index)
+        for column in TEXT_COLUMNS[query.record_type]:
+            text_mask |= df[column].astype(str).str.contains(query.text, case=False, regex=False, na=False)
+        mask &= text_mask
+    df = df[mask]
+    
+    if query.sort:
+        df = df.sort_values(query.sort, ascending=query.ascending)
+    if query.limit is not None:
+        df = df.head(query.limit)
+    
+    return df
+
+def _execute_query(query):
+    """Run a query against the loaded tables.
+    
+    Date range and categories are applied by the loader; amount bounds and
+    text are then applied as one combined vectorised mask.
+    """
+    df = load_table(query.record_type, start=query.start, end=query.end,
+                     categories=query.categories or None)
+    if df.empty:
+        return df
+    
+    return _refine_query_rows(query, df)
+
+def apply_query(query, df):
+    """Run a query against an already loaded table, e.g. a past state from history."""
+    if df.empty:
+        return df
+    
+    df = _filter_rows(df, query.record_type, query.start, query.end, query.categories)
+    return _refine_query_rows(query, df)
+
+@timed()
+def run_query(query):
+    """Return the rows matching a RecordQuery, cached until the data file changes.
+    
+    Callers get a copy-on-write copy, so changing it leaves the cache intact.
+    """
+    key = (query, get_data_version([query.record_type]))
+    with _query_cache_lock:
+        if key in _query_cache:
+            _query_cache.move_to_end(key)
+            return _query_cache[key].copy(deep=False)
+    
+    result = _execute_query(query)
+    
+    with _query_cache_lock:
+        _query_cache[key] = result
+        while len(_query_cache) > QUERY_CACHE_SIZE:
+            _query_cache.popitem(last=False)
+    return result.copy(deep=False)
+
+# Whole-table summaries, each cached until its data file changes
+_summary_cache = {}
+
+def _cached_summary(name, file_type, compute):
+    """Return compute() cached until file_type's data file changes.
+    
+    Callers get a copy-on-write copy, so changing it leaves the cache intact.
+    """
+    version = get_data_version([file_type])
+    with _query_cache_lock:
+        entry = _summary_cache.get(name)
+        if entry is not None and entry[0] == version:
+            return entry[1].copy(deep=False)
+    
+    version, result = load_at_version([file_type], compute)
+    
+    with _query_cache_lock:
+        _summary_cache[name] = (version, result)
+    return result.copy(deep=False)
+
+def record_hashes(file_type, df):
+    """Return a uint64 content hash per row of df over the file's HASH_FIELDS.
+    
+    Fields are normalized first, so dates with or without a time part, text differing only in
+    case or spacing, and amounts equal to the kobo hash the same.
+    """
+    fields = {}
+    for column in HASH_FIELDS[file_type]:
+        values = df[column] if column in df.columns else pd.Series('', index=df.index)
+        if column == 'date':
+            dates = pd.to_datetime(values.astype(str), errors='coerce', format='ISO8601')
+            fields[column] = dates.dt.strftime('%Y-%m-%d').fillna('').astype(object)
+        elif column in HASH_NUMERIC_FIELDS:
+            fields[column] = pd.to_numeric(values, errors='coerce').astype(float).round(2)
+        else:
+            text = values.fillna('').astype(str).str.strip().str.lower()
+            fields[column] = text.str.replace(r'\s+', ' ', regex=True).astype(object)
+    return pd.util.hash_pandas_object(pd.DataFrame(fields, index=df.index), index=False)
+
+# Content-hash index per data file, see _get_hash_index
+_hash_index = {}
+_hash_lock = threading.Lock()
+
+def _get_hash_index(file_type):
+    """Return {content hash: row count} for a data file.
+    
+    The index is kept up to date by the write listener and only rebuilt when
+    the file was changed outside this process.
+    """
+    version = get_data_version([file_type])
+    with _hash_lock:
+        entry = _hash_index.get(file_type)
+        if entry is not None and entry['version'] == version:
+            return entry['counts']
+    
+    version, df = load_at_version([file_type], lambda: load_table(file_type, columns=HASH_FIELDS[file_type]))
+    counts = record_hashes(file_type, df).value_counts().to_dict() if not df.empty else {}
+    with _hash_lock:
+        _hash_index[file_type] = {'version': version, 'counts': counts}
+    return counts
+
+def _update_hash_index(file_type, action, records, versions):
+    """Write listener applying added/deleted rows to a built hash index."""
+    before, after = versions
+    with _hash_lock:
+        entry = _hash_index.get(file_type)
+        if entry is None:
+            return
+        if entry['version'] != before:
+            # Built from another state of the file, rebuild on next use
+            del _hash_index[file_type]
+            return
+        counts = entry['counts']
+        step = 1 if action == 'add' else -1
+        for value in record_hashes(file_type, records):
+            count = counts.get(value, 0) + step
+            if count > 0:
+                counts[value] = count
+            else:
+                counts.pop(value, None)
+        entry['version'] = after
+
+def _migrate_dimensions():
+    """Add the empty plot/crop cycle tag columns to files written before they existed."""
+    for file_type, file_path in DATA_FILES.items():
+        try:
+            header = pd.read_csv(file_path, nrows=0).columns
+        except (pd.errors.EmptyDataError, FileNotFoundError):
+            continue
+        if all(column in header for column in DIMENSION_FIELDS[file_type]):
+            continue
+        df = pd.read_csv(file_path)
+        atomic_write_csv(df.reindex(columns=get_file_headers()[f'{file_type}.csv']), file_path)
 
-def add_input_record(date, category, description, quantity, unit, cost_per_unit, notes):
-    """Add a new input record to the inputs CSV file."""
-    # Load existing data
-    df = get_input_data()
+@timed()
+def find_duplicates(file_type):
+    """Return the rows of a data file that share their content with another row.
+    
+    duplicate_group numbers each set of identical rows; rows are sorted by
+    group and ID, so every row after the first in a group is a likely extra.
+    Cached until the file changes.
+    """
+    return _cached_summary(f'duplicates:{file_type}', file_type, lambda: _find_duplicates(file_type))
+
+def _find_duplicates(file_type):
+    df = load_table(file_type)
+    if df.empty:
+        return df.assign(duplicate_group=pd.Series(dtype='int64'))
+    
+    hashes = record_hashes(file_type, df)
+    mask = hashes.duplicated(keep=False)
+    duplicates = df[mask].copy()
+    duplicates['duplicate_group'] = hashes[mask].groupby(hashes[mask], sort=False).ngroup().to_numpy() + 1
+    return duplicates.sort_values(['duplicate_group', 'id']).reset_index(drop=True)
+
+@timed()
+def _append_records(file_type, records, skip_duplicates=True, origin=None):
+    """Append a list of record dicts to a CSV file in a single write.
+    
+    With skip_duplicates, records whose content matches an existing row or an
+    earlier record of the same batch are not written. Records without a gid
+    get a new one. Returns the new IDs in record order, None for each
+    skipped record.
+    """
+    with journal.lock:
+        return _append_records_locked(file_type, records, skip_duplicates, origin)
+
+def _append_records_locked(file_type, records, skip_duplicates, origin):
+    if file_type == 'inputs':
+        df = get_input_data()
+    elif file_type == 'expenses':
+        df = get_expense_data()
+    elif file_type == 'outputs':
+        df = get_output_data()
+    else:
+        return []
+    
+    if not records:
+        return []
+    
+    new_df = pd.DataFrame(records)
+    if skip_duplicates:
+        hashes = record_hashes(file_type, new_df)
+        existing = _get_hash_index(file_type)
+        known = pd.Series([value in existing for value in hashes], index=hashes.index, dtype=bool)
+        keep = ~hashes.duplicated() & ~known
+        new_df = new_df[keep.to_numpy()]
+    else:
+        keep = pd.Series(True, index=new_df.index)
+    
+    if new_df.empty:
+        return [None] * len(records)
+    
+    # Assign sequential IDs after the current maximum
+    first_id = int(generate_id(df))
+    new_ids = list(range(first_id, first_id + len(new_df)))
+    new_df.insert(0, 'id', new_ids)
+    gids = new_df['gid'] if 'gid' in new_df else pd.Series(None, index=new_df.index, dtype=object)
+    new_df['gid'] = [gid if isinstance(gid, str) and gid else generate_gid() for gid in gids]
     
-    # Calculate total cost
-    total_cost = float(quantity) * float(cost_per_unit)
+    # Append new records
+    df = pd.concat([df, new_df], ignore_index=True) if not df.empty else new_df[list(df.columns)]
     
-    # Create new record
-    new_record = {
-        'id': generate_id(df),
+    # Journal first, then replace the table atomically
+    versions = _commit_table(file_type, 'add', df, new_df, origin)
+    
+    _notify_write(file_type, 'add', new_df, versions)
+    
+    assigned = iter(new_ids)
+    return [next(assigned) if kept else None for kept in keep]
+
+def add_input_records(records, skip_duplicates=True):
+    """Add several input records (dicts of add_input_record arguments) in one write.
+    
+    The matching expense rows are also added in a single write. Returns the new
+    input IDs, None for records skipped as duplicates. Raises
+    RecordValidationError, saving nothing, if any record is invalid.
+    """
+    new_records = [{
+        'date': record['date'],
+        'category': record['category'],
+        'description': record['description'],
+        'quantity': record['quantity'],
+        'unit': record['unit'],
+        'cost_per_unit': record['cost_per_unit'],
+        'notes': record.get('notes', ''),
+        **{field: record.get(field, '') for field in DIMENSION_FIELDS['inputs']}
+    } for record in records]
+    
+    # Validated before any numbers are converted, so bad values get field-level errors
+    check_records('inputs', new_records)
+    
+    expense_records = []
+    for record in new_records:
+        # Calculate total cost
+        record['total_cost'] = float(record['quantity']) * float(record['cost_per_unit'])
+        
+        # The expense is charged to the same plot, crop cycle and crop as the input
+        expense_records.append({
+            'date': record['date'],
+            'category': f"Input: {record['category']}",
+            'description': record['description'],
+            'amount': record['total_cost'],
+            'payment_method': "",
+            'notes': f"Auto-added from input: {record['quantity']} {record['unit']} of {record['description']}",
+            **{field: record[field] for field in DIMENSION_FIELDS['expenses']}
+        })
+    
+    new_ids = _append_records('inputs', new_records, skip_duplicates)
+    
+    # Add to expenses as well, only for the inputs actually added
+    add_expense_records(
+        [expense for expense, new_id in zip(expense_records, new_ids) if new_id is not None],
+        skip_duplicates=False
+    )
+    
+    return new_ids
+
+def add_expense_records(records, skip_duplicates=True):
+    """Add several expense records (dicts of add_expense_record arguments) in one write.
+    
+    Returns the new expense IDs, None for records skipped as duplicates.
+    Raises RecordValidationError, saving nothing, if any record is invalid.
+    """
+    new_records = [{
+        'date': record['date'],
+        'category': record['category'],
+        'description': record['description'],
+        'amount': record['amount'],
+        'payment_method': record.get('payment_method', ''),
+        'notes': record.get('notes', ''),
+        **{field: record.get(field, '') for field in DIMENSION_FIELDS['expenses']}
+    } for record in records]
+    
+    check_records('expenses', new_records)
+    for record in new_records:
+        record['amount'] = float(record['amount'])
+    return _append_records('expenses', new_records, skip_duplicates)
+
+def add_output_records(records, skip_duplicates=True):
+    """Add several output records (dicts of add_output_record arguments) in one write.
+    
+    Returns the new output IDs, None for records skipped as duplicates.
+    Raises RecordValidationError, saving nothing, if any record is invalid.
+    """
+    new_records = [{
+        'date': record['date'],
+        'crop_type': record['crop_type'],
+        'quantity': record['quantity'],
+        'unit': record['unit'],
+        'sales_amount': record['sales_amount'],
+        'buyer': record.get('buyer', ''),
+        'notes': record.get('notes', ''),
+        **{field: record.get(field, '') for field in DIMENSION_FIELDS['outputs']}
+    } for record in records]
+    
+    check_records('outputs', new_records)
+    for record in new_records:
+        record['sales_amount'] = float(record['sales_amount'])
+    new_records = pd.DataFrame(new_records)
+    
+    # Normalized quantities are stored with the record, not converted per query
+    if not new_records.empty:
+        new_records = normalize_output_quantities(new_records)
+    
+    return _append_records('outputs', new_records.to_dict('records'), skip_duplicates)
+
+def add_input_record(date, category, description, quantity, unit, cost_per_unit, notes, allow_duplicate=False,
+                     plot='', crop_cycle='', crop_type=''):
+    """Add a new input record to the inputs CSV file.
+    
+    plot, crop_cycle and crop_type optionally tag the field, cycle and crop
+    the input was used for. Returns False without saving when an identical
+    record already exists, unless allow_duplicate is set.
+    """
+    new_ids = add_input_records([{
         'date': date,
         'category': category,
         'description': description,
         'quantity': quantity,
         'unit': unit,
         'cost_per_unit': cost_per_unit,
-        'total_cost': total_cost,
-        'notes': notes
-    }
-    
-    # Append new record
-    df = pd.concat([df, pd.DataFrame([new_record])], ignore_index=True)
-    
-    # Save updated data
-    df.to_csv('data/inputs.csv', index=False)
-    
-    # Add to expenses as well
-    add_expense_record(
-        date=date, 
-        category=f"Input: {category}", 
-        description=description, 
-        amount=total_cost, 
-        payment_method="", 
-        notes=f"Auto-added from input: {quantity} {unit} of {description}"
-    )
+        'notes': notes,
+        'plot': plot,
+        'crop_cycle': crop_cycle,
+        'crop_type': crop_type
+    }], skip_duplicates=not allow_duplicate)
     
-    return True
+    return new_ids[0] is not None
 
-def add_expense_record(date, category, description, amount, payment_method, notes):
-    """Add a new expense record to the expenses CSV file."""
-    # Load existing data
-    df = get_expense_data()
+def add_expense_record(date, category, description, amount, payment_method, notes, allow_duplicate=False,
+                       plot='', crop_cycle='', crop_type=''):
+    """Add a new expense record to the expenses CSV file.
     
-    # Create new record
-    new_record = {
-        'id': generate_id(df),
+    plot, crop_cycle and crop_type optionally tag the field, cycle and crop
+    the cost belongs to. Returns False without saving when an identical
+    record already exists, unless allow_duplicate is set.
+    """
+    new_ids = add_expense_records([{
         'date': date,
         'category': category,
         'description': description,
-        'amount': float(amount),
+        'amount': amount,
         'payment_method': payment_method,
-        'notes': notes
-    }
-    
-    # Append new record
-    df = pd.concat([df, pd.DataFrame([new_record])], ignore_index=True)
-    
-    # Save updated data
-    df.to_csv('data/expenses.csv', index=False)
+        'notes': notes,
+        'plot': plot,
+        'crop_cycle': crop_cycle,
+        'crop_type': crop_type
+    }], skip_duplicates=not allow_duplicate)
     
-    return True
+    return new_ids[0] is not None
 
-def add_output_record(date, crop_type, quantity, unit, sales_amount, buyer, notes):
-    """Add a new output record to the outputs CSV file."""
-    # Load existing data
-    df = get_output_data()
+def add_output_record(date, crop_type, quantity, unit, sales_amount, buyer, notes, allow_duplicate=False,
+                      plot='', crop_cycle=''):
+    """Add a new output record to the outputs CSV file.
     
-    # Create new record
-    new_record = {
-        'id': generate_id(df),
+    plot and crop_cycle optionally tag the field and cycle it was harvested
+    from. Returns False without saving when an identical record already
+    exists, unless allow_duplicate is set.
+    """
+    new_ids = add_output_records([{
         'date': date,
         'crop_type': crop_type,
         'quantity': quantity,
         'unit': unit,
-        'sales_amount': float(sales_amount),
+        'sales_amount': sales_amount,
         'buyer': buyer,
-        'notes': notes
-    }
+        'notes': notes,
+        'plot': plot,
+        'crop_cycle': crop_cycle
+    }], skip_duplicates=not allow_duplicate)
     
-    # Append new record
-    df = pd.concat([df, pd.DataFrame([new_record])], ignore_index=True)
+    return new_ids[0] is not None
+
+def add_synced_records(file_type, records, origin):
+    """Add records received from another device, keyed by their gid.
     
-    # Save updated data
-    df.to_csv('data/outputs.csv', index=False)
+    Records whose gid is already present or was deleted here are skipped, so
+    applying the same changes twice is harmless and deletes always win.
+    Input records do not add expenses here; those arrive as their own records.
+    Returns the number of records added.
+    """
+    if not records:
+        return 0
+    with journal.lock:
+        known = set(load_table(file_type, columns=['gid'])['gid'].dropna().astype(str))
+        known |= get_tombstones(file_type)
+        new_records = []
+        for record in records:
+            if record.get('gid') and record['gid'] not in known:
+                known.add(record['gid'])
+                new_records.append({column: value for column, value in record.items() if column != 'id'})
+        new_ids = _append_records(file_type, new_records, skip_duplicates=False, origin=origin)
+    return sum(new_id is not None for new_id in new_ids)
+
+def delete_records_by_gid(file_type, gids, origin=None):
+    """Delete the records with the given global IDs and tombstone all of them.
     
-    return True
+    gids not present here are tombstoned too, so their add is ignored if it
+    arrives later. Returns the number of rows deleted.
+    """
+    gids = [gid for gid in gids if gid]
+    if not gids:
+        return 0
+    with journal.lock:
+        df = load_table(file_type)
+        deleted = df[df['gid'].isin(gids)]
+        missing = sorted(set(gids) - set(deleted['gid']) - get_tombstones(file_type))
+        if deleted.empty:
+            _add_tombstones(file_type, missing)
+            return 0
+        versions = _commit_table(file_type, 'delete', df[~df['gid'].isin(gids)], deleted, origin, missing)
+    _notify_write(file_type, 'delete', deleted, versions)
+    return len(deleted)
 
+@timed()
 def delete_record(file_type, record_id):
     """Delete a record from the specified CSV file."""
+    with journal.lock:
+        return _delete_record_locked(file_type, record_id)
+
+def _delete_record_locked(file_type, record_id):
     if file_type == 'inputs':
         df = get_input_data()
-        file_path = 'data/inputs.csv'
     elif file_type == 'expenses':
         df = get_expense_data()
-        file_path = 'data/expenses.csv'
     elif file_type == 'outputs':
         df = get_output_data()
-        file_path = 'data/outputs.csv'
     else:
         return False
     
     # Filter out the record to delete
+    deleted = df[df['id'] == record_id]
     df = df[df['id'] != record_id]
+    if deleted.empty:
+        return True
     
-    # Save updated data
-    df.to_csv(file_path, index=False)
+    # Journal first, then replace the table atomically
+    versions = _commit_table(file_type, 'delete', df, deleted)
+    
+    _notify_write(file_type, 'delete', deleted, versions)
     
     return True
 
+@timed()
 def calculate_profit_loss(expense_df, output_df):
     """Calculate monthly profit/loss based on expenses and sales."""
     if expense_df.empty and output_df.empty:
         return pd.DataFrame()
     
     # Prepare dataframes
+    # Month labels are computed on the side so the (possibly cached) inputs are not modified
     if not expense_df.empty:
-        expense_df['date'] = pd.to_datetime(expense_df['date'])
-        expense_df['month_year'] = expense_df['date'].dt.strftime('%b %Y')
-        monthly_expenses = expense_df.groupby('month_year')['amount'].sum().reset_index()
+        month_year = pd.to_datetime(expense_df['date']).dt.strftime('%b %Y').rename('month_year')
+        monthly_expenses = expense_df['amount'].groupby(month_year).sum().reset_index()
         monthly_expenses.rename(columns={'amount': 'total_expenses'}, inplace=True)
     else:
         monthly_expenses = pd.DataFrame(columns=['month_year', 'total_expenses'])
     
     if not output_df.empty:
-        output_df['date'] = pd.to_datetime(output_df['date'])
-        output_df['month_year'] = output_df['date'].dt.strftime('%b %Y')
-        monthly_sales = output_df.groupby('month_year')['sales_amount'].sum().reset_index()
+        month_year = pd.to_datetime(output_df['date']).dt.strftime('%b %Y').rename('month_year')
+        monthly_sales = output_df['sales_amount'].groupby(month_year).sum().reset_index()
         monthly_sales.rename(columns={'sales_amount': 'total_sales'}, inplace=True)
     else:
         monthly_sales = pd.DataFrame(columns=['month_year', 'total_sales'])
@@ -192,9 +916,13 @@ def calculate_profit_loss(expense_df, output_df):
     
     return result
 
+@timed()
 def get_expense_summary_by_category():
-    """Get summary of expenses grouped by category."""
-    df = get_expense_data()
+    """Get summary of expenses grouped by category, cached until expenses change."""
+    return _cached_summary('expenses_by_category', 'expenses', _expense_summary_by_category)
+
+def _expense_summary_by_category():
+    df = get_expense_data(columns=['category', 'amount'])
     if df.empty:
         return pd.DataFrame()
     
@@ -204,19 +932,22 @@ def get_expense_summary_by_category():
     
     return summary
 
+@timed()
 def get_output_summary_by_crop():
-    """Get summary of outputs grouped by crop type."""
-    df = get_output_data()
-    if df.empty:
-        return pd.DataFrame()
-    
-    summary = df.groupby('crop_type').agg({
-        'quantity': 'sum',
-        'sales_amount': 'sum',
-        'id': 'count'
-    }).reset_index()
+    """Get summary of outputs grouped by crop type.
     
-    summary.rename(columns={'id': 'harvest_count'}, inplace=True)
-    summary.sort_values('sales_amount', ascending=False, inplace=True)
-    
-    return summary
+    Quantities are normalized (kg, or liters for oils) and price_per_unit is
+    the sales amount per kg/liter. Cached until outputs change.
+    """
+    return _cached_summary('outputs_by_crop', 'outputs', lambda: summarize_outputs_by_crop(
+        get_output_data(columns=['id', 'crop_type', 'sales_amount', 'normalized_quantity', 'normalized_unit'])
+    ))
+
+# Import-time startup, in this order: write listeners, then recovery of any
+# write interrupted by a crash, then migrations of files from older versions
+register_write_listener(_store.apply_write)
+register_write_listener(_update_hash_index)
+journal.recover(_replay_journal_entry)
+_migrate_output_units()
+_migrate_global_ids()
+_migrate_dimensions()
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+Cash-flow forecasting of monthly expenses and sales.
+
+Forecasts the monthly totals that calculate_profit_loss reports, split per
+expense category and per crop, using additive seasonal exponential smoothing
+(Holt-Winters without trend). All series are fitted together: the smoothing
+recursion steps through the months once, updating every category/crop
+column of the month x series matrix at the same time. Every record type is
+fitted on the months up to the last complete one, with months without
+records counted as zero, so expenses and sales forecast the same months
+from the current one on. Fits are cached per data version.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from analytics import get_monthly_rollup
+from data_manager import get_data_version
+from perf import timed
+
+SEASON_LENGTH = 12
+ALPHA = 0.3   # level smoothing
+GAMMA = 0.2   # seasonal smoothing
+Z_SCORE = 1.96  # 95% band
+FORECAST_CACHE_SIZE = 16
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+def fit_forecast(history, horizon):
+    """Fit all columns of a month x series array and forecast horizon months.
+
+    Returns (forecast, spread): horizon x series arrays of point forecasts and
+    error standard deviations (one-step residual spread widened by the square
+    root of the step). Uses seasonal smoothing when at
+    least two full seasons of history exist, else simple exponential
+    smoothing.
+    """
+    history = np.asarray(history, dtype=float)
+    months, series = history.shape
+    seasonal = months >= 2 * SEASON_LENGTH
+
+    if seasonal:
+        level = history[:SEASON_LENGTH].mean(axis=0)
+        season = history[:SEASON_LENGTH] - level
+    else:
+        level = history[0].copy()
+        season = np.zeros((SEASON_LENGTH, series))
+
+    errors = np.zeros_like(history)
+    for t in range(months):
+        slot = t % SEASON_LENGTH
+        predicted = level + season[slot]
+        errors[t] = history[t] - predicted
+        new_level = ALPHA * (history[t] - season[slot]) + (1 - ALPHA) * level
+        if seasonal:
+            season[slot] = GAMMA * (history[t] - new_level) + (1 - GAMMA) * season[slot]
+        level = new_level
+
+    # Skip the warm-up period when estimating the error spread
+    warmup = SEASON_LENGTH if seasonal else 1
+    residuals = errors[warmup:] if months > warmup + 1 else errors
+    sigma = residuals.std(axis=0)
+
+    steps = np.arange(1, horizon + 1)
+    slots = (months + steps - 1) % SEASON_LENGTH
+    forecast = np.maximum(level + season[slots], 0.0)
+    spread = sigma * np.sqrt(steps)[:, None]
+    return forecast, spread
+
+
+def _forecast_file(file_type, months):
+    """Long-format forecast for every category/crop of one record type over months.
+
+    months starts at the current month; history runs up to the month before,
+    zero where a record type has nothing recorded lately.
+    """
+    wide = get_monthly_rollup(file_type)
+    if wide.empty:
+        return pd.DataFrame(), pd.DataFrame()
+
+    # Fit on complete months only, through the last one even if it had no records
+    wide = wide[wide.index < months[0]]
+    if wide.empty:
+        return pd.DataFrame(), pd.DataFrame()
+    history = pd.date_range(wide.index.min(), months[0] - pd.offsets.MonthBegin(1), freq='MS')
+    wide = wide.reindex(history, fill_value=0.0)
+
+    horizon = len(months)
+    forecast, spread = fit_forecast(wide.to_numpy(), horizon)
+
+    series = pd.DataFrame({
+        'month': np.repeat(months, wide.shape[1]),
+        'series': np.tile(wide.columns.to_numpy(), horizon),
+        'forecast': forecast.ravel(),
+        'lower': np.maximum(forecast - Z_SCORE * spread, 0.0).ravel(),
+        'upper': (forecast + Z_SCORE * spread).ravel()
+    })
+
+    # Totals, treating series errors as independent
+    total_spread = np.sqrt((spread ** 2).sum(axis=1))
+    total_forecast = forecast.sum(axis=1)
+    totals = pd.DataFrame({
+        'month': months,
+        'forecast': total_forecast,
+        'lower': np.maximum(total_forecast - Z_SCORE * total_spread, 0.0),
+        'upper': total_forecast + Z_SCORE * total_spread
+    })
+    return series, totals
+
+
+@timed()
+def get_cash_flow_forecast(horizon=6):
+    """Forecast expenses per category and sales per crop for horizon months.
+
+    Returns a dict with 'series' (one row per month and category/crop, with
+    a 'type' column of expenses or sales) and 'totals' (monthly expenses,
+    sales and net cash flow with 95% bands). Cached per data version.
+    """
+    key = (get_data_version(['expenses', 'outputs']), horizon, pd.Timestamp.now().to_period('M'))
+    with _lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+
+    # The same months for both, from the current month on
+    months = pd.date_range(key[2].to_timestamp(), periods=horizon, freq='MS')
+    expense_series, expense_totals = _forecast_file('expenses', months)
+    sales_series, sales_totals = _forecast_file('outputs', months)
+
+    frames = []
+    if not expense_series.empty:
+        frames.append(expense_series.assign(type='expenses'))
+    if not sales_series.empty:
+        frames.append(sales_series.assign(type='sales'))
+    series = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    parts = [totals.set_index('month').add_prefix(f'{prefix}_')
+             for totals, prefix in ((expense_totals, 'expenses'), (sales_totals, 'sales'))
+             if not totals.empty]
+    totals = pd.DataFrame()
+    if parts:
+        columns = [f'{prefix}_{column}' for prefix in ('expenses', 'sales')
+                   for column in ('forecast', 'lower', 'upper')]
+        totals = pd.concat(parts, axis=1).reindex(columns=columns).fillna(0.0)
+        totals['net_cash_flow'] = totals['sales_forecast'] - totals['expenses_forecast']
+        totals = totals.sort_index().rename_axis('month').reset_index()
+
+    result = {'series': series, 'totals': totals}
+    with _lock:
+        _cache[key] = result
+        while len(_cache) > FORECAST_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return result
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+Point-in-time views of the books from the journal event log.
+
+Every add and delete is an event in data/journal.jsonl (see journal), kept
+forever with its sequence number and timestamp. Compact snapshots of all
+tables are written to data/snapshots every SNAPSHOT_EVERY events, so the
+state at any past moment is rebuilt by loading the nearest earlier snapshot
+and replaying the short tail of events after it. History starts at the
+first snapshot, taken the first time this module runs.
+"""
+import os
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+import pandas as pd
+
+import journal
+from data_manager import (
+    get_expense_data,
+    get_input_data,
+    get_output_data,
+    apply_journal_entry,
+    apply_query,
+    register_write_listener
+)
+from perf import timed
+from utils import get_data_dir
+
+SNAPSHOT_DIR = os.path.join(get_data_dir(), 'snapshots')
+SNAPSHOT_EVERY = 500
+STATE_CACHE_SIZE = 8
+
+_SNAPSHOT_NAME = re.compile(r'snapshot_(\d+)_(\d{8}T\d{6})\.pkl\.gz$')
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+def list_snapshots():
+    """Return [(seq, ts, path)] of the stored snapshots, oldest first."""
+    if not os.path.isdir(SNAPSHOT_DIR):
+        return []
+    snapshots = []
+    for name in os.listdir(SNAPSHOT_DIR):
+        match = _SNAPSHOT_NAME.match(name)
+        if match:
+            ts = datetime.strptime(match.group(2), '%Y%m%dT%H%M%S').isoformat()
+            snapshots.append((int(match.group(1)), ts, os.path.join(SNAPSHOT_DIR, name)))
+    return sorted(snapshots)
+
+
+def _write_snapshot(seq, offset, ts, tables):
+    """Store the tables as the state after event seq (journal byte offset)."""
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    stamp = datetime.fromisoformat(ts).strftime('%Y%m%dT%H%M%S')
+    path = os.path.join(SNAPSHOT_DIR, f'snapshot_{seq:010d}_{stamp}.pkl.gz')
+    tmp_path = f'{path}.tmp'
+    pd.to_pickle({'seq': seq, 'offset': offset, 'ts': ts, 'tables': tables}, tmp_path, compression='gzip')
+    os.replace(tmp_path, path)
+    return path
+
+
+def take_snapshot():
+    """Snapshot the current tables at the last applied journal entry."""
+    with journal.lock:
+        position = journal.read_checkpoint()
+        tables = {
+            'inputs': get_input_data(),
+            'expenses': get_expense_data(),
+            'outputs': get_output_data()
+        }
+        return _write_snapshot(position['seq'], position['offset'],
+                               datetime.now().isoformat(timespec='seconds'), tables)
+
+
+def _on_write(file_type, action, records, versions):
+    """Write listener taking a snapshot every SNAPSHOT_EVERY events."""
+    snapshots = list_snapshots()
+    last_seq = snapshots[-1][0] if snapshots else None
+    if last_seq is None or journal.read_checkpoint()['seq'] - last_seq >= SNAPSHOT_EVERY:
+        take_snapshot()
+
+
+register_write_listener(_on_write)
+
+if not list_snapshots():
+    take_snapshot()
+
+
+@timed()
+def get_state_as_of(as_of):
+    """Rebuild every table as it stood at the end of the day as_of.
+
+    Returns {file_type: DataFrame}. Raises ValueError for dates before the
+    first snapshot. When the replayed tail is long the rebuilt state is
+    saved as a new snapshot, so later lookups near that date stay fast.
+    """
+    cutoff = (pd.Timestamp(as_of).normalize() + pd.Timedelta(days=1)).isoformat()
+    key = (cutoff, journal.read_checkpoint()['seq'])
+    with _lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+
+    candidates = [snapshot for snapshot in list_snapshots() if snapshot[1] < cutoff]
+    if not candidates:
+        first = list_snapshots()
+        since = first[0][1][:10] if first else 'today'
+        raise ValueError(f"History is only available from {since}.")
+
+    snapshot = pd.read_pickle(candidates[-1][2], compression='gzip')
+    tables = dict(snapshot['tables'])
+    seq, offset, ts = snapshot['seq'], snapshot['offset'], snapshot['ts']
+    replayed = 0
+    for entry, end_offset in journal.read_entries(offset):
+        if entry['seq'] <= seq:
+            continue
+        if entry['ts'] >= cutoff:
+            break
+        if entry['file'] in tables:
+            tables[entry['file']] = apply_journal_entry(tables[entry['file']], entry)
+        seq, offset, ts = entry['seq'], end_offset, entry['ts']
+        replayed += 1
+
+    if replayed >= SNAPSHOT_EVERY:
+        _write_snapshot(seq, offset, ts, tables)
+
+    with _lock:
+        _cache[key] = tables
+        while len(_cache) > STATE_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return tables
+
+
+def run_query_as_of(query, as_of):
+    """Run a RecordQuery against the books as they stood at the end of as_of."""
+    return apply_query(query, get_state_as_of(as_of)[query.record_type])
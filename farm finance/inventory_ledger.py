@@ -0,0 +1,314 @@
+# -*- coding: utf-8 -*-
+"""
+Stock on hand and cost of use for purchased inputs.
+
+Receipts are the input records (purchases); issues, the quantities taken out
+of stock for use, are stored in data/inventory_issues.csv. An item is an
+input description and unit, matched ignoring case and spacing, so every
+"NPK 15-15-15" bought in bags is one item. Labour, equipment and area or
+time units are not stock.
+
+Issues are costed two ways without any per-row loop:
+- FIFO: the cost of the first Q units received is a piecewise-linear
+  function of Q through the cumulative receipt quantities and costs, so
+  each issue costs F(issued after) - F(issued before), looked up with
+  np.interp over all items at once.
+- Moving weighted average: each receipt re-averages the value on hand with
+  its own cost, (value on hand + receipt cost) / (quantity on hand +
+  receipt quantity), and each issue takes out quantity x the current
+  average. Across receipts this is the linear recurrence
+  avg = a * previous avg + b, solved with a cumulative product over each
+  run of receipts since the stock last ran out.
+
+Ledgers and balances are cached per item. A new receipt or issue recomputes
+only the items it touched, provided the cache was built from the files as
+they were just before that write; otherwise it is rebuilt.
+"""
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+import journal
+from data_manager import get_data_version, get_input_data, register_write_listener
+from journal import atomic_write_csv
+from perf import timed
+from utils import generate_id, get_data_dir, get_file_headers
+
+ISSUE_FILE = os.path.join(get_data_dir(), 'inventory_issues.csv')
+ISSUE_COLUMNS = get_file_headers()['inventory_issues.csv']
+
+NON_STOCK_CATEGORIES = {'Labor', 'Equipment'}
+NON_STOCK_UNITS = {'hours', 'days', 'acres', 'hectares'}
+
+LEDGER_COLUMNS = ['key', 'date', 'item', 'unit', 'movement', 'ref_id', 'quantity', 'balance',
+                  'unit_cost', 'fifo_cost', 'avg_cost', 'avg_unit_cost', 'shortfall']
+
+_cache = {}
+_lock = threading.Lock()
+
+
+def item_key(description, unit):
+    """Normalised item identity of description/unit Series."""
+    text = description.fillna('').astype(str).str.strip().str.lower().str.replace(r'\s+', ' ', regex=True)
+    return text + '|' + unit.fillna('').astype(str).str.strip().str.lower()
+
+
+def get_issue_data():
+    """Load stock issues from CSV file."""
+    try:
+        return pd.read_csv(ISSUE_FILE)
+    except (pd.errors.EmptyDataError, FileNotFoundError):
+        return pd.DataFrame(columns=ISSUE_COLUMNS)
+
+
+def _issue_version():
+    try:
+        stat = os.stat(ISSUE_FILE)
+        return stat.st_mtime_ns, stat.st_size
+    except FileNotFoundError:
+        return 0, 0
+
+
+def _version():
+    return get_data_version(['inputs']), _issue_version()
+
+
+def _movements(keys=None):
+    """Receipts and issues, optionally of some item keys only, in ledger order."""
+    inputs = get_input_data(columns=['id', 'date', 'category', 'description', 'quantity', 'unit', 'total_cost'])
+    inputs = inputs[~inputs['category'].isin(NON_STOCK_CATEGORIES)
+                    & ~inputs['unit'].isin(NON_STOCK_UNITS)]
+    receipts = pd.DataFrame({
+        'key': item_key(inputs['description'], inputs['unit']),
+        'date': inputs['date'].astype(str),
+        'item': inputs['description'].astype(str).str.strip(),
+        'unit': inputs['unit'],
+        'movement': 'receipt',
+        'ref_id': inputs['id'],
+        'quantity': pd.to_numeric(inputs['quantity'], errors='coerce').fillna(0.0),
+        'total_cost': pd.to_numeric(inputs['total_cost'], errors='coerce').fillna(0.0)
+    })
+    receipts = receipts[receipts['quantity'] > 0]
+
+    issues = get_issue_data()
+    issues = pd.DataFrame({
+        'key': item_key(issues['item'], issues['unit']),
+        'date': issues['date'].astype(str),
+        'item': issues['item'].astype(str).str.strip(),
+        'unit': issues['unit'],
+        'movement': 'issue',
+        'ref_id': issues['id'],
+        'quantity': -pd.to_numeric(issues['quantity'], errors='coerce').fillna(0.0),
+        'total_cost': 0.0
+    })
+
+    movements = pd.concat([receipts, issues], ignore_index=True) if not issues.empty else receipts
+    if keys is not None:
+        movements = movements[movements['key'].isin(keys)]
+    # Receipts before issues on the same day
+    return movements.sort_values(['key', 'date', 'movement', 'ref_id'],
+                                 ascending=[True, True, False, True]).reset_index(drop=True)
+
+
+def _cost_movements(movements):
+    """Add running balance, FIFO and moving-average costs to sorted movements."""
+    m = movements
+    key = m['key']
+    is_receipt = (m['movement'] == 'receipt').to_numpy()
+    quantity = m['quantity'].abs().to_numpy()
+    cost = m['total_cost'].to_numpy()
+
+    m['balance'] = m['quantity'].groupby(key).cumsum()
+
+    # FIFO: F(q) is the cost of the first q units over all items laid end to end
+    received_qty = np.where(is_receipt, quantity, 0.0)
+    received_cost = np.where(is_receipt, cost, 0.0)
+    global_qty = np.concatenate([[0.0], np.cumsum(received_qty[is_receipt])])
+    global_cost = np.concatenate([[0.0], np.cumsum(received_cost[is_receipt])])
+    item_received = pd.Series(received_qty).groupby(key.to_numpy()).transform('sum').to_numpy()
+    # Units received by the items sorted before this one
+    item_start = (pd.Series(received_qty).cumsum() - pd.Series(received_qty).groupby(key.to_numpy()).cumsum())
+    item_start = item_start.groupby(key.to_numpy()).transform('first').to_numpy()
+
+    issued_qty = np.where(is_receipt, 0.0, quantity)
+    issued_after = pd.Series(issued_qty).groupby(key.to_numpy()).cumsum().to_numpy()
+    issued_before = issued_after - issued_qty
+    fifo_after = np.interp(item_start + np.minimum(issued_after, item_received), global_qty, global_cost)
+    fifo_before = np.interp(item_start + np.minimum(issued_before, item_received), global_qty, global_cost)
+    m['fifo_cost'] = np.where(is_receipt, cost, fifo_after - fifo_before)
+
+    # Moving average after each receipt:
+    # avg = (on hand * previous avg + cost) / (on hand + received).
+    # A receipt into empty (or overdrawn) stock, which includes each item's
+    # first receipt, starts again at its own price. Stepped receipt by receipt:
+    # the closed form of this recurrence loses precision on long histories.
+    receipts = np.flatnonzero(is_receipt)
+    on_hand_before = np.maximum((m['balance'].to_numpy() - m['quantity'].to_numpy())[receipts], 0.0)
+    receipt_average = np.zeros(len(receipts))
+    previous = 0.0
+    for i, (held, received, received_cost) in enumerate(zip(on_hand_before, quantity[receipts], cost[receipts])):
+        if held + received > 0:
+            previous = (held * previous + received_cost) / (held + received)
+        receipt_average[i] = previous
+
+    # Issues leave the average unchanged
+    average = np.full(len(m), np.nan)
+    average[receipts] = receipt_average
+    average = pd.Series(average).groupby(key.to_numpy()).ffill().fillna(0.0).to_numpy()
+    m['unit_cost'] = np.where(is_receipt, np.divide(cost, quantity, out=np.zeros(len(m)), where=quantity > 0), average)
+    m['avg_cost'] = np.where(is_receipt, cost, issued_qty * average)
+    m['avg_unit_cost'] = average
+
+    # Issued more than had been received by then
+    m['shortfall'] = m['balance'] < 0
+    return m[LEDGER_COLUMNS]
+
+
+def _balances(ledger):
+    """Per-item stock on hand and its value under both costing methods.
+
+    Values are the receipts less the cost of the issues, so stock issued
+    beyond what was received shows as a zero FIFO value (the excess is not
+    costed) and a negative average value.
+    """
+    if ledger.empty:
+        return pd.DataFrame(columns=['key', 'item', 'unit', 'received', 'issued', 'on_hand',
+                                     'avg_unit_cost', 'fifo_value', 'avg_value', 'last_movement'])
+    is_receipt = ledger['movement'] == 'receipt'
+    signed = np.where(is_receipt, 1.0, -1.0)
+    grouped = ledger.assign(
+        received=ledger['quantity'].where(is_receipt, 0.0),
+        issued=-ledger['quantity'].where(~is_receipt, 0.0),
+        fifo_value=ledger['fifo_cost'] * signed,
+        avg_value=ledger['avg_cost'] * signed
+    ).groupby('key')
+    balances = grouped.agg(
+        item=('item', 'first'),
+        unit=('unit', 'first'),
+        received=('received', 'sum'),
+        issued=('issued', 'sum'),
+        avg_unit_cost=('avg_unit_cost', 'last'),
+        fifo_value=('fifo_value', 'sum'),
+        avg_value=('avg_value', 'sum'),
+        last_movement=('date', 'max')
+    )
+    balances['on_hand'] = balances['received'] - balances['issued']
+    for column in ('fifo_value', 'avg_value'):
+        balances[column] = balances[column].round(2)
+    return balances.reset_index()[['key', 'item', 'unit', 'received', 'issued', 'on_hand',
+                                   'avg_unit_cost', 'fifo_value', 'avg_value', 'last_movement']]
+
+
+def _build(keys=None):
+    movements = _movements(keys)
+    ledger = _cost_movements(movements) if not movements.empty else pd.DataFrame(columns=LEDGER_COLUMNS)
+    return ledger, _balances(ledger)
+
+
+def _refresh_items(keys, before, after):
+    """Recompute the cached ledger and balances of some items after a write.
+
+    before and after are the _version() just before and after the write. A
+    cache built at any other version missed a write and is dropped instead.
+    """
+    keys = set(keys)
+    with _lock:
+        if _cache.get('version') != before:
+            _cache.clear()
+            return
+        if not keys:
+            _cache['version'] = after
+            return
+    ledger, balances = _build(keys)
+    with _lock:
+        if _cache.get('version') != before or _version() != after:
+            # Written to again meanwhile
+            _cache.clear()
+            return
+        old_ledger, old_balances = _cache['ledger'], _cache['balances']
+        _cache['ledger'] = pd.concat([old_ledger[~old_ledger['key'].isin(keys)], ledger], ignore_index=True)
+        _cache['balances'] = (pd.concat([old_balances[~old_balances['key'].isin(keys)], balances])
+                              .sort_values('item').reset_index(drop=True))
+        _cache['version'] = after
+
+
+def _on_write(file_type, action, records, versions):
+    """Write listener: recompute the items of added or deleted input records."""
+    if file_type == 'inputs' and not records.empty:
+        issues = _issue_version()
+        _refresh_items(item_key(records['description'], records['unit']),
+                       (versions[0], issues), (versions[1], issues))
+
+
+register_write_listener(_on_write)
+
+
+@timed()
+def _get_cached():
+    version = _version()
+    with _lock:
+        if _cache.get('version') == version:
+            return _cache['ledger'], _cache['balances']
+
+    ledger, balances = _build()
+    balances = balances.sort_values('item').reset_index(drop=True)
+    if _version() != version:
+        # Written to while building, may already include that write
+        version = None
+    with _lock:
+        _cache.update(version=version, ledger=ledger, balances=balances)
+    return ledger, balances
+
+
+def get_stock_levels():
+    """Return stock on hand per item with FIFO and weighted-average values.
+
+    Columns: key, item, unit, received, issued, on_hand, avg_unit_cost,
+    fifo_value, avg_value and last_movement. Shared, do not modify.
+    """
+    return _get_cached()[1]
+
+
+def get_item_ledger(key):
+    """Movements of one item in order with running balance and costs."""
+    ledger = _get_cached()[0]
+    return ledger[ledger['key'] == key].drop(columns='key').reset_index(drop=True)
+
+
+def record_issue(date, item, unit, quantity, plot='', crop_cycle='', crop_type='', notes=''):
+    """Record quantity of an item taken out of stock. Returns the new issue ID."""
+    # The journal lock keeps other processes out of the read-modify-write
+    with journal.lock:
+        df = get_issue_data()
+        issue_id = int(generate_id(df))
+        new_record = pd.DataFrame([{
+            'id': issue_id,
+            'date': date,
+            'item': item,
+            'unit': unit,
+            'quantity': float(quantity),
+            'plot': plot,
+            'crop_cycle': crop_cycle,
+            'crop_type': crop_type,
+            'notes': notes
+        }], columns=ISSUE_COLUMNS)
+        df = pd.concat([df, new_record], ignore_index=True) if not df.empty else new_record
+        before = _version()
+        atomic_write_csv(df, ISSUE_FILE)
+        _refresh_items(item_key(new_record['item'], new_record['unit']), before, _version())
+    return issue_id
+
+
+def delete_issue(issue_id):
+    """Delete a stock issue. Returns False if there is none with that ID."""
+    with journal.lock:
+        df = get_issue_data()
+        deleted = df[df['id'] == issue_id]
+        if deleted.empty:
+            return False
+        before = _version()
+        atomic_write_csv(df[df['id'] != issue_id], ISSUE_FILE)
+        _refresh_items(item_key(deleted['item'], deleted['unit']), before, _version())
+    return True
@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+"""
+Append-only write-ahead journal for data file mutations.
+
+Every add or delete is appended to data/journal.jsonl and fsync'd before the
+table itself is touched. Tables are then rewritten atomically (temp file,
+fsync, rename), so a power cut leaves either the old or the new file, never
+a truncated one. data/journal.checkpoint records the sequence number and
+byte offset of the last entry known to be applied; startup recovery seeks
+straight to that offset and replays only the entries after it, so recovery
+time depends on the few in-flight writes, not on the size of the journal or
+the tables.
+
+The Streamlit app and the API server write from separate processes, so the
+journal lock is also an exclusive lock on data/journal.lock: a whole
+read-modify-write of a table, and every append, checkpoint and recovery,
+runs in one process at a time.
+"""
+import json
+import os
+import threading
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
+
+from utils import get_data_dir
+
+JOURNAL_FILE = os.path.join(get_data_dir(), 'journal.jsonl')
+CHECKPOINT_FILE = os.path.join(get_data_dir(), 'journal.checkpoint')
+LOCK_FILE = os.path.join(get_data_dir(), 'journal.lock')
+
+
+def _lock_file(fd):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        return
+    while True:
+        try:
+            # Blocks for up to 10 seconds, then raises; keep waiting
+            msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            continue
+
+
+def _unlock_file(fd):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+class JournalLock:
+    """Reentrant lock held across the threads of this process and across processes.
+
+    The first acquire in a thread takes the thread lock, then an exclusive
+    file lock on LOCK_FILE; nested acquires only count.
+    """
+
+    def __init__(self, path):
+        self._path = path
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._fd = None
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        if self._depth == 0:
+            try:
+                fd = os.open(self._path, os.O_RDWR | os.O_CREAT)
+                try:
+                    _lock_file(fd)
+                except BaseException:
+                    os.close(fd)
+                    raise
+            except BaseException:
+                self._thread_lock.release()
+                raise
+            self._fd = fd
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        self._depth -= 1
+        if self._depth == 0:
+            fd, self._fd = self._fd, None
+            try:
+                _unlock_file(fd)
+            finally:
+                os.close(fd)
+        self._thread_lock.release()
+
+
+# Held for the whole read-journal-write-checkpoint sequence of a mutation
+lock = JournalLock(LOCK_FILE)
+
+# Last sequence number and journal size seen by this process
+_state = {'seq': None, 'size': 0}
+
+
+def _fsync_dir(path):
+    """Persist a rename by syncing the containing directory (not possible on Windows)."""
+    if os.name == 'nt':
+        return
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def atomic_write_csv(df, path):
+    """Write df to path via a synced temp file and an atomic rename."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+        df.to_csv(f, index=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    _fsync_dir(path)
+
+
+def read_checkpoint():
+    """Return {'seq', 'offset'} of the last applied journal entry."""
+    try:
+        with open(CHECKPOINT_FILE, encoding='utf-8') as f:
+            checkpoint = json.load(f)
+        return {'seq': int(checkpoint['seq']), 'offset': int(checkpoint['offset'])}
+    except (FileNotFoundError, ValueError, KeyError):
+        return {'seq': 0, 'offset': 0}
+
+
+def checkpoint(seq, offset):
+    """Mark every journal entry up to seq (ending at byte offset) as applied."""
+    tmp_path = f"{CHECKPOINT_FILE}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'seq': seq, 'offset': offset}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, CHECKPOINT_FILE)
+
+
+def read_entries(offset=0):
+    """Yield (entry, end_offset) for each complete entry from byte offset on.
+
+    Stops at the first torn or unreadable line, which can only be the last
+    one written before a crash.
+    """
+    try:
+        f = open(JOURNAL_FILE, 'rb')
+    except FileNotFoundError:
+        return
+    with f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b'\n'):
+                return
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                return
+            offset += len(line)
+            yield entry, offset
+
+
+def _journal_size():
+    try:
+        return os.path.getsize(JOURNAL_FILE)
+    except FileNotFoundError:
+        return 0
+
+
+def _last_seq():
+    """Last sequence number in the journal, reading only what this process has not seen.
+
+    Called with the lock held, so entries appended by another process are
+    complete and the size comparison picks them up.
+    """
+    size = _journal_size()
+    if _state['seq'] is None or size != _state['size']:
+        if _state['seq'] is None or size < _state['size']:
+            position = read_checkpoint()
+            seq, offset = position['seq'], position['offset']
+        else:
+            seq, offset = _state['seq'], _state['size']
+        for entry, offset in read_entries(offset):
+            seq = entry['seq']
+        _state['seq'], _state['size'] = seq, offset
+    return _state['seq']
+
+
+def append(file_type, action, records, origin=None):
+    """Durably journal an add or delete of the records DataFrame.
+
+    origin is the device a synced change came from; local changes have none.
+    Returns (seq, end_offset) to pass to checkpoint once the table is written.
+    """
+    with lock:
+        seq = _last_seq() + 1
+        entry = {
+            'seq': seq,
+            'ts': datetime.now().isoformat(timespec='seconds'),
+            'file': file_type,
+            'action': action
+        }
+        if origin:
+            entry['origin'] = origin
+        header = json.dumps(entry)
+        rows = records.to_json(orient='records', date_format='iso', default_handler=str)
+        line = f'{header[:-1]}, "records": {rows}}}\n'.encode('utf-8')
+        with open(JOURNAL_FILE, 'ab') as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+            offset = f.tell()
+        _state['seq'], _state['size'] = seq, offset
+        return seq, offset
+
+
+def recover(apply):
+    """Replay journal entries after the checkpoint with apply(entry).
+
+    apply must be idempotent: an entry may already be in the table if the
+    crash came between the table rename and the checkpoint. A torn final
+    line is cut off. Returns the number of entries replayed.
+    """
+    with lock:
+        position = read_checkpoint()
+        offset = position['offset']
+        replayed = 0
+        for entry, end_offset in read_entries(offset):
+            apply(entry)
+            checkpoint(entry['seq'], end_offset)
+            offset = end_offset
+            replayed += 1
+        if _journal_size() > offset:
+            with open(JOURNAL_FILE, 'r+b') as f:
+                f.truncate(offset)
+                os.fsync(f.fileno())
+        _state['seq'], _state['size'] = None, 0
+        return replayed
@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+"""
+Headless load test of the Streamlit pages.
+
+Simulates concurrent users with Streamlit's AppTest runner against a
+synthetic dataset in a scratch data directory (the real data/ folder is
+never touched). Each user thread repeatedly picks a scenario: viewing a
+page, changing the expense filters, submitting an expense, or opening the
+reports and downloading a CSV export and the PDF pack. Every script rerun,
+and the wait for the PDF render, is timed, and the p50/p95/p99 latency and
+throughput are reported per scenario and step.
+
+    python load_test.py --users 10 --duration 60 --rows 50000
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_MIX = {'view': 0.5, 'filter': 0.25, 'submit': 0.1, 'export': 0.15}
+
+
+def generate_dataset(data_dir, rows, seed=0):
+    """Write synthetic inputs, expenses and outputs with rows records each."""
+    from utils import get_crop_types, get_expense_categories, get_file_headers, get_input_categories, get_payment_methods
+
+    rng = np.random.default_rng(seed)
+    os.makedirs(data_dir, exist_ok=True)
+    headers = get_file_headers()
+    today = pd.Timestamp(date.today())
+
+    def dates(n):
+        return (today - pd.to_timedelta(rng.integers(0, 3 * 365, n), unit='D')).strftime('%Y-%m-%d')
+
+    expenses = pd.DataFrame({
+        'id': np.arange(1, rows + 1),
+        'date': dates(rows),
+        'category': rng.choice(get_expense_categories(), rows),
+        'description': [f"Expense {i}" for i in range(rows)],
+        'amount': rng.integers(500, 200000, rows).astype(float),
+        'payment_method': rng.choice(get_payment_methods(), rows),
+        'notes': ''
+    })
+    quantity = rng.integers(1, 100, rows).astype(float)
+    cost_per_unit = rng.integers(100, 5000, rows).astype(float)
+    inputs = pd.DataFrame({
+        'id': np.arange(1, rows + 1),
+        'date': dates(rows),
+        'category': rng.choice(get_input_categories(), rows),
+        'description': [f"Input {i}" for i in range(rows)],
+        'quantity': quantity,
+        'unit': 'kg',
+        'cost_per_unit': cost_per_unit,
+        'total_cost': quantity * cost_per_unit,
+        'notes': ''
+    })
+    outputs = pd.DataFrame({
+        'id': np.arange(1, rows + 1),
+        'date': dates(rows),
+        'crop_type': rng.choice(get_crop_types(), rows),
+        'quantity': rng.integers(1, 500, rows).astype(float),
+        'unit': rng.choice(['kg', 'bags', 'tons'], rows),
+        'sales_amount': rng.integers(1000, 500000, rows).astype(float),
+        'buyer': rng.choice(['Ada Foods', 'Bola Traders', 'Chidi & Sons', 'Local Market'], rows),
+        'notes': ''
+    })
+    # gid and normalized quantities are filled in by data_manager's migrations on import
+    for name, df in (('expenses', expenses), ('inputs', inputs), ('outputs', outputs)):
+        columns = [c for c in headers[f'{name}.csv'] if c in df.columns]
+        df[columns].to_csv(os.path.join(data_dir, f'{name}.csv'), index=False)
+
+
+def share_apptest_runtime():
+    """Let AppTest runs overlap in threads.
+
+    Each AppTest run installs a mock Runtime singleton and clears it when it
+    finishes, which breaks the runs still going in other threads. Fall back
+    to the last installed one instead; they are interchangeable.
+    """
+    from streamlit.runtime import Runtime
+
+    last = {}
+
+    def instance(cls):
+        if cls._instance is not None:
+            last['runtime'] = cls._instance
+        runtime = cls._instance or last.get('runtime')
+        if runtime is None:
+            raise RuntimeError("Runtime hasn't been created!")
+        return runtime
+
+    Runtime.instance = classmethod(instance)
+    Runtime.exists = classmethod(lambda cls: cls._instance is not None or 'runtime' in last)
+
+
+def _widget(widgets, label):
+    return next(widget for widget in widgets if widget.label == label)
+
+
+class LoadTest:
+    """Runs user threads and collects one sample per timed rerun."""
+
+    def __init__(self, users, duration, mix, timeout=120):
+        self.users = users
+        self.duration = duration
+        self.mix = mix
+        self.timeout = timeout
+        self.pages = [os.path.join(APP_DIR, 'app.py')] + sorted(glob.glob(os.path.join(APP_DIR, 'pages', '*.py')))
+        self.samples = []
+        self._lock = threading.Lock()
+
+    def _record(self, scenario, step, seconds, error):
+        with self._lock:
+            self.samples.append({'scenario': scenario, 'step': step, 'seconds': seconds, 'error': error})
+
+    def _timed_run(self, app, scenario, step):
+        started = time.perf_counter()
+        app.run(timeout=self.timeout)
+        self._record(scenario, step, time.perf_counter() - started, bool(app.exception))
+        return app
+
+    def _app(self, page):
+        from streamlit.testing.v1 import AppTest
+        return AppTest.from_file(os.path.join(APP_DIR, page), default_timeout=self.timeout)
+
+    def view(self, rng):
+        page = rng.choice(self.pages)
+        self._timed_run(self._app(page), 'view', os.path.relpath(page, APP_DIR))
+
+    def filter(self, rng):
+        app = self._timed_run(self._app('pages/expenses.py'), 'filter', 'load')
+        if app.exception:
+            return
+        _widget(app.text_input, "Search Description").set_value(f"Expense {rng.randint(0, 99)}")
+        self._timed_run(app, 'filter', 'search')
+        end = date.today() - timedelta(days=rng.randint(0, 365))
+        app.date_input(key="expense_date_range").set_value((end - timedelta(days=rng.randint(7, 365)), end))
+        self._timed_run(app, 'filter', 'date_range')
+
+    def submit(self, rng):
+        app = self._timed_run(self._app('pages/expenses.py'), 'submit', 'load')
+        if app.exception:
+            return
+        _widget(app.text_input, "Description").set_value(f"Load test {uuid.uuid4().hex[:8]}")
+        _widget(app.number_input, "Amount (₦)").set_value(float(rng.randint(100, 50000)))
+        _widget(app.button, "Add Expense Record").click()
+        self._timed_run(app, 'submit', 'submit')
+
+    def export(self, rng):
+        from pdf_reports import request_report_pdf
+
+        app = self._timed_run(self._app('pages/reports.py'), 'export', 'load')
+        if app.exception:
+            return
+        start = date.today() - timedelta(days=rng.randint(30, 3 * 365))
+        app.date_input(key="report_start_date").set_value(start)
+        self._timed_run(app, 'export', 'date_range')
+        if app.exception:
+            return
+        _widget(app.selectbox, "Select Report to Export").set_value("Expense Details")
+        self._timed_run(app, 'export', 'csv')
+        _widget(app.selectbox, "Select Report to Export").set_value("PDF Report Pack")
+        self._timed_run(app, 'export', 'pdf_request')
+        if app.exception:
+            return
+        # The page polls the render; wait on the same shared future it started
+        started = time.perf_counter()
+        future = request_report_pdf(start, date.today())
+        error = future.exception(timeout=self.timeout) is not None
+        self._record('export', 'pdf_render', time.perf_counter() - started, error)
+
+    def _user(self, index, deadline):
+        rng = random.Random(index)
+        scenarios = list(self.mix)
+        weights = [self.mix[name] for name in scenarios]
+        while time.monotonic() < deadline:
+            scenario = rng.choices(scenarios, weights)[0]
+            try:
+                getattr(self, scenario)(rng)
+            except Exception as e:
+                with self._lock:
+                    self.samples.append({'scenario': scenario, 'step': f'crash: {type(e).__name__}',
+                                         'seconds': np.nan, 'error': True})
+
+    def warm_up(self):
+        """Run every page once, untimed, like the first visits after a server start."""
+        for page in self.pages:
+            self._app(page).run(timeout=self.timeout)
+
+    def run(self):
+        share_apptest_runtime()
+        self.warm_up()
+        deadline = time.monotonic() + self.duration
+        started = time.perf_counter()
+        threads = [threading.Thread(target=self._user, args=(i, deadline), name=f'user-{i}')
+                   for i in range(self.users)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return summarize(pd.DataFrame(self.samples), time.perf_counter() - started)
+
+
+def summarize(samples, wall_seconds):
+    """Latency percentiles (ms) and throughput per scenario/step and overall."""
+    if samples.empty:
+        return pd.DataFrame()
+
+    def stats(group):
+        seconds = group['seconds'].dropna()
+        return pd.Series({
+            'reruns': len(group),
+            'errors': int(group['error'].sum()),
+            'p50_ms': seconds.quantile(0.50) * 1000,
+            'p95_ms': seconds.quantile(0.95) * 1000,
+            'p99_ms': seconds.quantile(0.99) * 1000,
+            'max_ms': seconds.max() * 1000,
+            'reruns_per_s': len(group) / wall_seconds
+        })
+
+    by_step = samples.groupby(['scenario', 'step'])[['seconds', 'error']].apply(stats)
+    overall = stats(samples).to_frame(('all', 'all')).T
+    return pd.concat([by_step, overall]).round(1)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Concurrent-session load test of the farm finance pages")
+    parser.add_argument('--users', type=int, default=5, help="concurrent simulated users")
+    parser.add_argument('--duration', type=float, default=30, help="seconds to run")
+    parser.add_argument('--rows', type=int, default=10000, help="synthetic records per table")
+    parser.add_argument('--data-dir', help="scratch data directory (default: a new temp dir)")
+    parser.add_argument('--mix', type=json.loads, default=DEFAULT_MIX,
+                        help='scenario weights as JSON, default %s' % json.dumps(DEFAULT_MIX))
+    parser.add_argument('--json', help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    sys.path.insert(0, APP_DIR)
+    data_dir = os.path.abspath(args.data_dir or tempfile.mkdtemp(prefix='farm-load-'))
+    # Must be set before any app module is imported, they read it at import
+    os.environ['FARM_DATA_DIR'] = data_dir
+    generate_dataset(data_dir, args.rows)
+    # Imported only for its import-time startup: migrating the generated files
+    # (gids, normalized quantities, tag columns) happens once here instead of
+    # inside the first user's timed run
+    import data_manager  # noqa: F401
+    from streamlit import logger
+    logger.set_log_level('error')
+
+    print(f"{args.users} users for {args.duration:.0f}s on {args.rows} rows per table in {data_dir}")
+    results = LoadTest(args.users, args.duration, args.mix).run()
+    print(results.to_string())
+    if args.json:
+        results.reset_index().to_json(args.json, orient='records', indent=2)
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 18:12:31 2026
+
+@author: user
+"""
+import streamlit as st
+import sys
+import os
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reconciliation import DEFAULT_PAYMENT_METHODS, DEFAULT_TOLERANCE_DAYS, load_statement, reconcile
+from utils import get_payment_methods
+from perf import PageTimer
+
+# Set page config
+st.set_page_config(
+    page_title="Reconciliation - Farm Management System",
+    page_icon="🏦",
+    layout="wide"
+)
+
+page_timer = PageTimer('reconciliation')
+
+st.title("🏦 Statement Reconciliation")
+st.markdown("Match bank and mobile-money statement lines to recorded expenses.")
+
+# Statement upload and matching options
+col1, col2, col3 = st.columns(3)
+
+with col1:
+    statement_file = st.file_uploader("Statement (CSV)", type=['csv'])
+
+with col2:
+    payment_methods = st.multiselect("Payment Methods", get_payment_methods(), default=DEFAULT_PAYMENT_METHODS)
+
+with col3:
+    tolerance_days = st.slider("Date Tolerance (days)", min_value=0, max_value=14, value=DEFAULT_TOLERANCE_DAYS)
+
+st.caption("The statement needs a date column and an amount or debit column. "
+           "Description and reference columns are used when present.")
+
+if statement_file is not None:
+    try:
+        statement = load_statement(statement_file)
+    except ValueError as exc:
+        st.error(str(exc))
+        st.stop()
+
+    results = reconcile(statement, payment_methods, tolerance_days)
+    summary = results['summary']
+    page_timer.lap('reconcile', rows=summary['statement_lines'])
+
+    if summary['undated']:
+        lines = statement.loc[statement['date'].isna(), 'line'].tolist()
+        st.warning(f"The date of {summary['undated']} statement lines could not be read "
+                   f"(lines {', '.join(str(line) for line in lines)}); they are listed as unmatched.")
+
+    # Summary metrics
+    col1, col2, col3, col4 = st.columns(4)
+
+    with col1:
+        st.metric("Statement Lines", summary['statement_lines'])
+
+    with col2:
+        st.metric("Matched", summary['matched'])
+
+    with col3:
+        st.metric("Ambiguous", summary['ambiguous'])
+
+    with col4:
+        st.metric("Unmatched", summary['unmatched'])
+
+    tab1, tab2, tab3, tab4 = st.tabs([
+        "Matched",
+        "Ambiguous",
+        "Unmatched Statement Lines",
+        f"Expenses Not on Statement ({summary['unmatched_expenses']})"
+    ])
+
+    with tab1:
+        if not results['matched'].empty:
+            st.dataframe(results['matched'], use_container_width=True)
+            st.download_button("Download Matched Items", results['matched'].to_csv(index=False),
+                               file_name="reconciliation_matched.csv", mime="text/csv")
+        else:
+            st.info("No statement lines matched exactly one expense.")
+
+    with tab2:
+        if not results['ambiguous'].empty:
+            st.markdown("These lines have several possible expenses. The suggested match is the closest by date.")
+            st.dataframe(results['ambiguous'], use_container_width=True)
+        else:
+            st.info("No ambiguous statement lines.")
+
+    with tab3:
+        if not results['unmatched_statement'].empty:
+            st.markdown("No expense with the same amount within the date tolerance. These may need recording.")
+            st.dataframe(results['unmatched_statement'], use_container_width=True)
+        else:
+            st.info("Every statement line has at least one candidate expense.")
+
+    with tab4:
+        if not results['unmatched_expenses'].empty:
+            st.markdown("Expenses in the statement period with no matching statement line.")
+            st.dataframe(results['unmatched_expenses'], use_container_width=True)
+        else:
+            st.info("Every expense in the statement period appears on the statement.")
+else:
+    st.info("Upload a statement to start reconciling.")
+
+page_timer.lap('results')
@@ -8,21 +8,20 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from datetime import datetime, timedelta
 import sys
 import os
 
 # Add parent directory to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from data_manager import (
-    get_expense_data, 
-    get_input_data, 
-    get_output_data, 
-    calculate_profit_loss,
-    get_expense_summary_by_category,
-    get_output_summary_by_crop
-)
+from aggregates import DASHBOARD_PERIODS, get_dashboard_snapshot, get_status
+from forecasting import get_cash_flow_forecast
+from budgets import budget_vs_actual, period_months, season_label, set_budget
+from cost_cube import DRILL_PATH, slice_cube
+from utils import get_expense_categories, get_seasons
+from data_manager import get_record_store
+from record_store import POLL_SECONDS
+from perf import PageTimer
 
 # Set page config
 st.set_page_config(
@@ -31,53 +30,40 @@ st.set_page_config(
     layout="wide"
 )
 
+page_timer = PageTimer('dashboard')
+
+# Rerun when any session (or another process) changes the data
+@st.fragment(run_every=POLL_SECONDS)
+def watch_for_changes():
+    changes = get_record_store().refresh()
+    seen = st.session_state.setdefault('dashboard_seen_changes', changes)
+    if changes != seen:
+        st.session_state['dashboard_seen_changes'] = changes
+        st.rerun()
+
+watch_for_changes()
+
 st.title("📈 Farm Dashboard")
 st.markdown("Your farm's financial performance at a glance.")
 
-# Get data
-expense_df = get_expense_data()
-input_df = get_input_data()
-output_df = get_output_data()
+# Precomputed aggregates, refreshed in the background after each write
+snapshot = get_dashboard_snapshot()
+status = get_status()
+if status['last_error_at'] is not None and status['last_error_at'] > snapshot['computed_at']:
+    st.warning(f"Figures last updated {snapshot['computed_at']:%Y-%m-%d %H:%M}; "
+               f"refreshing them failed ({status['last_error']}).")
 
 # Date range selector
 col1, col2 = st.columns(2)
 with col1:
     period = st.selectbox(
         "Select Period",
-        ["Last 30 days", "Last 90 days", "Last 6 months", "Last year", "All time"]
+        list(DASHBOARD_PERIODS)
     )
 
-# Calculate start date based on period
-today = datetime.now()
-if period == "Last 30 days":
-    start_date = today - timedelta(days=30)
-elif period == "Last 90 days":
-    start_date = today - timedelta(days=90)
-elif period == "Last 6 months":
-    start_date = today - timedelta(days=180)
-elif period == "Last year":
-    start_date = today - timedelta(days=365)
-else:  # All time
-    start_date = pd.Timestamp.min
-
-# Filter data by date range
-if not expense_df.empty:
-    expense_df = expense_df[
-        pd.to_datetime(expense_df['date']) >= start_date
-    ]
-
-if not input_df.empty:
-    input_df = input_df[
-        pd.to_datetime(input_df['date']) >= start_date
-    ]
-
-if not output_df.empty:
-    output_df = output_df[
-        pd.to_datetime(output_df['date']) >= start_date
-    ]
-
-# Calculate profit/loss
-profit_loss_df = calculate_profit_loss(expense_df, output_df)
+period_data = snapshot['periods'][period]
+profit_loss_df = period_data['profit_loss']
+page_timer.lap('load_snapshot')
 
 # Display key metrics
 st.header("Key Metrics")
@@ -85,15 +71,15 @@ st.header("Key Metrics")
 col1, col2, col3, col4 = st.columns(4)
 
 with col1:
-    total_expenses = expense_df['amount'].sum() if not expense_df.empty else 0
+    total_expenses = period_data['total_expenses']
     st.metric(label="Total Expenses", value=f"₦{total_expenses:,.2f}")
 
 with col2:
-    total_sales = output_df['sales_amount'].sum() if not output_df.empty else 0
+    total_sales = period_data['total_sales']
     st.metric(label="Total Sales", value=f"₦{total_sales:,.2f}")
 
 with col3:
-    net_profit = total_sales - total_expenses
+    net_profit = period_data['net_profit']
     profit_status = "PROFIT" if net_profit >= 0 else "LOSS"
     st.metric(label=f"Net {profit_status}", value=f"₦{abs(net_profit):,.2f}", 
               delta=f"{net_profit/total_expenses*100:.1f}%" if total_expenses > 0 else "N/A")
@@ -102,6 +88,8 @@ with col4:
     roi = (net_profit / total_expenses * 100) if total_expenses > 0 else 0
     st.metric(label="ROI", value=f"{roi:.1f}%")
 
+page_timer.lap('metrics')
+
 # Financial trends
 st.header("Financial Trends")
 
@@ -124,10 +112,12 @@ if not profit_loss_df.empty:
 else:
     st.info("No financial data available for the selected period.")
 
+page_timer.lap('financial_trends')
+
 # Expense breakdown
 st.header("Expense Breakdown")
 
-expense_summary = get_expense_summary_by_category()
+expense_summary = snapshot['expense_summary']
 
 if not expense_summary.empty:
     col1, col2 = st.columns(2)
@@ -152,10 +142,156 @@ if not expense_summary.empty:
 else:
     st.info("No expense data available for the selected period.")
 
+page_timer.lap('expense_breakdown')
+
+# Plot and crop cycle drill-down, read from the pre-aggregated cube
+DRILL_LABELS = {
+    'plot': "Plot / Field",
+    'crop_cycle': "Crop Cycle",
+    'crop_type': "Crop",
+    'category': "Category",
+    'month': "Month"
+}
+
+@st.fragment
+def plot_drill_down(start_month):
+    timer = PageTimer('dashboard')
+    st.header("Costs and Sales by Plot")
+    st.caption("Pick a value to drill down a level, or set a level back to All to roll up. "
+               "Untagged records are grouped as Unassigned; periods are counted in whole months.")
+    
+    # One selector per level, each limited to the values under the levels above it
+    filters = {}
+    columns = st.columns(len(DRILL_PATH) - 1)
+    for column, dimension in zip(columns, DRILL_PATH[:-1]):
+        values = slice_cube([dimension], filters, start_month)[dimension].tolist()
+        with column:
+            choice = st.selectbox(DRILL_LABELS[dimension], ["All"] + values, key=f"drill_{dimension}")
+        if choice == "All":
+            break
+        filters[dimension] = choice
+    
+    level = DRILL_PATH[len(filters)]
+    level_df = slice_cube([level], filters, start_month)
+    
+    if not level_df.empty:
+        path = " / ".join(filters.values()) or "All plots"
+        fig = px.bar(level_df, x=level, y=['cost', 'sales', 'profit'],
+                    title=f'{path}: Cost, Sales and Profit by {DRILL_LABELS[level]}',
+                    barmode='group',
+                    labels={level: DRILL_LABELS[level], 'value': 'Amount (₦)', 'variable': ''},
+                    color_discrete_sequence=['#FF6B6B', '#4ECDC4', '#1A535C'])
+        st.plotly_chart(fig, use_container_width=True)
+        st.dataframe(level_df, use_container_width=True)
+    else:
+        st.info("No costs or sales for this selection and period.")
+    
+    timer.lap('plot_drill_down', rows=len(level_df))
+
+period_days = DASHBOARD_PERIODS[period]
+plot_drill_down((pd.Timestamp.now() - pd.Timedelta(days=period_days)).strftime('%Y-%m') if period_days else None)
+
+# Budget vs. actual
+st.header("Budget vs. Actual")
+
+budget_period = st.radio("Budget Period", ["This Month", "Current Season", "This Year"], horizontal=True)
+now = pd.Timestamp.now()
+if budget_period == "This Month":
+    budget_months = period_months(now.strftime('%Y-%m'))
+elif budget_period == "Current Season":
+    budget_months = period_months(season_label(now))
+else:
+    budget_months = pd.date_range(f"{now.year}-01-01", f"{now.year}-12-01", freq='MS')
+
+variance_df = budget_vs_actual(budget_months)
+
+if not variance_df.empty:
+    elapsed = variance_df['period_elapsed_pct'].iloc[0]
+    st.caption(f"{budget_months.min():%b %Y} to {budget_months.max():%b %Y}, {elapsed:.0f}% of the period elapsed")
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Actual", f"₦{variance_df['actual'].sum():,.2f}")
+    with col2:
+        st.metric("Budget", f"₦{variance_df['budget'].sum():,.2f}")
+    with col3:
+        projected_variance = variance_df['projected'].sum() - variance_df['budget'].sum()
+        st.metric("Projected Variance", f"₦{projected_variance:,.2f}",
+                  delta=f"₦{projected_variance:,.2f}", delta_color="inverse")
+    
+    fig = px.bar(variance_df, x='category', y=['actual', 'budget', 'projected'],
+                title='Actual, Budget and Projected Spend by Category',
+                barmode='group',
+                labels={'category': 'Category', 'value': 'Amount (₦)', 'variable': ''},
+                color_discrete_sequence=px.colors.qualitative.Safe)
+    st.plotly_chart(fig, use_container_width=True)
+    
+    st.dataframe(variance_df.drop(columns='period_elapsed_pct'), use_container_width=True)
+else:
+    st.info("No budgets or expenses for this period.")
+
+with st.expander("Set a Budget"):
+    with st.form("budget_form"):
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            budget_category = st.selectbox("Category", get_expense_categories())
+        with col2:
+            period_type = st.selectbox("Period Type", ["Month"] + list(get_seasons()))
+            period_year = st.number_input("Year", min_value=2000, max_value=2100, value=now.year, step=1)
+            period_month = st.selectbox("Month", list(range(1, 13)), index=now.month - 1,
+                                        format_func=lambda m: pd.Timestamp(2000, m, 1).strftime('%B'))
+        with col3:
+            budget_amount = st.number_input("Budget Amount (₦)", min_value=0.0, step=1000.0)
+        
+        if st.form_submit_button("Save Budget"):
+            if period_type == "Month":
+                new_budget_period = f"{int(period_year)}-{period_month:02d}"
+            else:
+                new_budget_period = f"{period_type} {int(period_year)}"
+            set_budget(budget_category, new_budget_period, budget_amount)
+            st.success(f"Budget for {budget_category} ({new_budget_period}) saved.")
+            st.rerun()
+
+page_timer.lap('budget_vs_actual')
+
+# Cash-flow forecast
+st.header("Cash-Flow Forecast")
+
+horizon = st.slider("Months to Forecast", min_value=3, max_value=12, value=6)
+forecast = get_cash_flow_forecast(horizon)
+forecast_totals = forecast['totals']
+
+if not forecast_totals.empty:
+    fig = go.Figure()
+    for prefix, name, color, band in (('expenses', 'Expenses', '#FF6B6B', 'rgba(255,107,107,0.2)'),
+                                      ('sales', 'Sales', '#4ECDC4', 'rgba(78,205,196,0.2)')):
+        fig.add_trace(go.Scatter(
+            x=list(forecast_totals['month']) + list(forecast_totals['month'][::-1]),
+            y=list(forecast_totals[f'{prefix}_upper']) + list(forecast_totals[f'{prefix}_lower'][::-1]),
+            fill='toself', fillcolor=band, line=dict(width=0),
+            name=f'{name} 95% band', hoverinfo='skip'
+        ))
+        fig.add_trace(go.Scatter(
+            x=forecast_totals['month'], y=forecast_totals[f'{prefix}_forecast'],
+            name=f'{name} forecast', mode='lines+markers', line=dict(color=color)
+        ))
+    fig.update_layout(title='Projected Monthly Expenses and Sales',
+                      xaxis_title='Month', yaxis_title='Amount (₦)')
+    st.plotly_chart(fig, use_container_width=True)
+    
+    st.metric("Projected Net Cash Flow", f"₦{forecast_totals['net_cash_flow'].sum():,.2f}")
+    
+    with st.expander("Forecast by Category and Crop"):
+        st.dataframe(forecast['series'], use_container_width=True)
+else:
+    st.info("Not enough history to forecast. Forecasts start after the first complete month of data.")
+
+page_timer.lap('cash_flow_forecast')
+
 # Output analysis
 st.header("Output Analysis")
 
-output_summary = get_output_summary_by_crop()
+output_summary = snapshot['output_summary']
 
 if not output_summary.empty:
     col1, col2 = st.columns(2)
@@ -172,38 +308,44 @@ if not output_summary.empty:
     
     with col2:
         # Bar chart for quantity
-        fig = px.bar(output_summary, x='crop_type', y='quantity',
+        fig = px.bar(output_summary, x='crop_type', y='normalized_quantity',
                     title='Harvest Quantity by Crop Type',
                     color='crop_type',
-                    labels={'crop_type': 'Crop Type', 'quantity': 'Quantity'},
+                    hover_data=['normalized_unit'],
+                    labels={'crop_type': 'Crop Type', 'normalized_quantity': 'Quantity (kg / liters)',
+                            'normalized_unit': 'Unit'},
                     color_discrete_sequence=px.colors.qualitative.Pastel)
-        fig.update_layout(xaxis_title='Crop Type', yaxis_title='Quantity')
+        fig.update_layout(xaxis_title='Crop Type', yaxis_title='Quantity (kg / liters)')
         st.plotly_chart(fig, use_container_width=True)
 else:
     st.info("No output data available for the selected period.")
 
+page_timer.lap('output_analysis')
+
 # Recent transactions
 st.header("Recent Transactions")
 
 tab1, tab2, tab3 = st.tabs(["Recent Expenses", "Recent Inputs", "Recent Outputs"])
 
 with tab1:
-    if not expense_df.empty:
-        recent_expenses = expense_df.sort_values('date', ascending=False).head(5)
+    recent_expenses = period_data['recent_expenses']
+    if not recent_expenses.empty:
         st.dataframe(recent_expenses[['date', 'category', 'description', 'amount']], use_container_width=True)
     else:
         st.info("No recent expenses to display.")
 
 with tab2:
-    if not input_df.empty:
-        recent_inputs = input_df.sort_values('date', ascending=False).head(5)
+    recent_inputs = period_data['recent_inputs']
+    if not recent_inputs.empty:
         st.dataframe(recent_inputs[['date', 'category', 'description', 'quantity', 'unit', 'total_cost']], use_container_width=True)
     else:
         st.info("No recent inputs to display.")
 
 with tab3:
-    if not output_df.empty:
-        recent_outputs = output_df.sort_values('date', ascending=False).head(5)
+    recent_outputs = period_data['recent_outputs']
+    if not recent_outputs.empty:
         st.dataframe(recent_outputs[['date', 'crop_type', 'quantity', 'unit', 'sales_amount']], use_container_width=True)
     else:
         st.info("No recent outputs to display.")
+
+page_timer.lap('recent_transactions')
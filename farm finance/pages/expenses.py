@@ -5,7 +5,6 @@ Created on Sun Apr 13 16:45:57 2025
 @author: user
 """
 import streamlit as st
-import pandas as pd
 from datetime import datetime
 import plotly.express as px
 import sys
@@ -14,8 +13,11 @@ import os
 # Add parent directory to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from data_manager import get_expense_data, add_expense_record, delete_record, get_expense_summary_by_category
-from utils import get_expense_categories, get_payment_methods, get_current_date
+from data_manager import RecordQuery, run_query, get_expense_data, add_expense_record, delete_record, find_duplicates, get_expense_summary_by_category
+from utils import get_expense_categories, get_payment_methods, get_crop_types, get_current_date
+from budgets import season_label
+from validation import RecordValidationError, format_errors
+from perf import PageTimer
 
 # Set page config
 st.set_page_config(
@@ -24,88 +26,118 @@ st.set_page_config(
     layout="wide"
 )
 
+page_timer = PageTimer('expenses')
+
 st.title("💰 Farm Expenses Management")
 st.markdown("Track all farm-related expenses including salaries, repairs, fuel, and other operational costs.")
 
-# Form for adding new expense
-st.subheader("Add New Expense")
+# Each section is a fragment: interacting with a filter or the form reruns
+# only that section, and a save or delete reruns the whole page so every
+# section shows the new data.
+
+def flash_message(text):
+    """Show text after the next full rerun."""
+    st.session_state['expense_flash'] = text
+    st.rerun()
 
-with st.form("expense_form"):
-    col1, col2 = st.columns(2)
+@st.fragment
+def entry_form():
+    timer = PageTimer('expenses')
     
-    with col1:
-        date = st.date_input("Date", datetime.now())
-        category = st.selectbox("Category", get_expense_categories())
-        description = st.text_input("Description")
-        
-    with col2:
-        amount = st.number_input("Amount (₦)", min_value=0.0, step=10.0)
-        payment_method = st.selectbox("Payment Method", get_payment_methods())
+    # Form for adding new expense
+    st.subheader("Add New Expense")
+    
+    with st.form("expense_form"):
+        col1, col2 = st.columns(2)
         
-    notes = st.text_area("Notes")
-    
-    submitted = st.form_submit_button("Add Expense Record")
-    
-    if submitted:
-        if description and amount > 0:
-            success = add_expense_record(
-                date=date.strftime('%Y-%m-%d'),
-                category=category,
-                description=description,
-                amount=amount,
-                payment_method=payment_method,
-                notes=notes
-            )
+        with col1:
+            date = st.date_input("Date", datetime.now())
+            category = st.selectbox("Category", get_expense_categories())
+            description = st.text_input("Description")
             
-            if success:
-                st.success("Expense record added successfully!")
+        with col2:
+            amount = st.number_input("Amount (₦)", min_value=0.0, step=10.0)
+            payment_method = st.selectbox("Payment Method", get_payment_methods())
+            
+        notes = st.text_area("Notes")
+        # Optional tags for the plot and crop cycle breakdowns
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            plot = st.text_input("Plot / Field", help="Leave empty if not specific to one plot.")
+        with col2:
+            crop_cycle = st.text_input("Crop Cycle", value=season_label(datetime.now()))
+        with col3:
+            crop_tag = st.selectbox("For Crop", [""] + get_crop_types(),
+                                    format_func=lambda crop: crop or "Not crop-specific")
+        allow_duplicate = st.checkbox("Save even if an identical record exists",
+                                      help="Use for genuine repeats, e.g. two equal purchases on the same day.")
+        
+        submitted = st.form_submit_button("Add Expense Record")
+        
+        if submitted:
+            if description and amount > 0:
+                try:
+                    success = add_expense_record(
+                        date=date.strftime('%Y-%m-%d'),
+                        category=category,
+                        description=description,
+                        amount=amount,
+                        payment_method=payment_method,
+                        notes=notes,
+                        allow_duplicate=allow_duplicate,
+                        plot=plot.strip(),
+                        crop_cycle=crop_cycle.strip(),
+                        crop_type=crop_tag
+                    )
+                except RecordValidationError as exc:
+                    st.error("Not saved:\n\n" + "\n".join(f"- {line}" for line in format_errors(exc.errors)))
+                else:
+                    if success:
+                        flash_message("Expense record added successfully!")
+                    else:
+                        st.warning("Not saved: an expense with the same date, category, description and amount already exists. "
+                                   "Tick 'Save even if an identical record exists' if this is a genuine repeat.")
             else:
-                st.error("Failed to add expense record.")
-        else:
-            st.warning("Please fill all required fields (description and amount).")
-
-# Display existing expense records
-st.subheader("Expense Records")
-
-# Filter options
-st.markdown("### Filter Records")
-col1, col2, col3 = st.columns(3)
+                st.warning("Please fill all required fields (description and amount).")
+    
+    timer.lap('entry_form')
 
-with col1:
-    filter_category = st.multiselect("Filter by Category", get_expense_categories())
+@st.fragment
+def expense_records():
+    timer = PageTimer('expenses')
     
-with col2:
-    date_range = st.date_input("Date Range", 
-                               value=[datetime.now().replace(day=1), datetime.now()],
-                               key="expense_date_range")
+    # Display existing expense records
+    st.subheader("Expense Records")
     
-with col3:
-    search_term = st.text_input("Search Description")
-
-# Get expense data
-expense_df = get_expense_data()
-
-if not expense_df.empty:
-    # Apply filters
-    filtered_df = expense_df.copy()
+    # Filter options
+    st.markdown("### Filter Records")
+    col1, col2, col3 = st.columns(3)
     
-    if filter_category:
-        filtered_df = filtered_df[filtered_df['category'].isin(filter_category)]
+    with col1:
+        filter_category = st.multiselect("Filter by Category", get_expense_categories())
+        
+    with col2:
+        date_range = st.date_input("Date Range", 
+                                   value=[datetime.now().replace(day=1), datetime.now()],
+                                   key="expense_date_range")
+        
+    with col3:
+        search_term = st.text_input("Search Description")
     
-    if len(date_range) == 2:
-        start_date, end_date = date_range
-        filtered_df = filtered_df[
-            (pd.to_datetime(filtered_df['date']) >= pd.to_datetime(start_date.strftime('%Y-%m-%d'))) &
-            (pd.to_datetime(filtered_df['date']) <= pd.to_datetime(end_date.strftime('%Y-%m-%d')))
-        ]
+    # Build the query once for this rerun
+    start_date, end_date = date_range if len(date_range) == 2 else (None, None)
+    expense_query = RecordQuery(
+        record_type='expenses',
+        start=start_date,
+        end=end_date,
+        categories=tuple(filter_category),
+        text=search_term
+    )
     
-    if search_term:
-        filtered_df = filtered_df[
-            filtered_df['description'].str.contains(search_term, case=False, na=False)
-        ]
+    # Apply filters, sorted by date (newest first)
+    filtered_df = run_query(expense_query)
     
-    # Sort by date (newest first)
-    filtered_df = filtered_df.sort_values('date', ascending=False)
+    timer.lap('filters', rows=len(filtered_df))
     
     # Display filtered data
     st.dataframe(filtered_df, use_container_width=True)
@@ -126,6 +158,12 @@ if not expense_df.empty:
         avg_amount = total_amount / len(filtered_df) if len(filtered_df) > 0 else 0
         st.metric("Average Expense", f"₦{avg_amount:,.2f}")
     
+    timer.lap('summary')
+
+@st.fragment
+def category_breakdown():
+    timer = PageTimer('expenses')
+    
     # Expense breakdown by category
     st.subheader("Expense Breakdown by Category")
     
@@ -143,18 +181,49 @@ if not expense_df.empty:
         # Show table summary
         st.dataframe(expense_summary, use_container_width=True)
     
+    timer.lap('breakdown')
+
+@st.fragment
+def manage_records():
+    timer = PageTimer('expenses')
+    
+    # Duplicate check over all records
+    with st.expander("Possible Duplicates"):
+        duplicates = find_duplicates('expenses')
+        if duplicates.empty:
+            st.write("No duplicate expense records found.")
+        else:
+            st.write(f"{duplicates['duplicate_group'].nunique()} groups of identical records. "
+                     "Rows after the first in each group are likely extras; delete them by ID below.")
+            st.dataframe(duplicates, use_container_width=True)
+    
+    timer.lap('duplicates')
+    
     # Delete record option
     st.subheader("Delete Expense Record")
     delete_id = st.number_input("Enter ID to delete", min_value=1, step=1)
     if st.button("Delete Record"):
-        if delete_id in expense_df['id'].values:
+        if delete_id in get_expense_data(columns=['id'])['id'].values:
             if delete_record('expenses', delete_id):
-                st.success(f"Record with ID {delete_id} deleted successfully.")
-                st.rerun()
+                flash_message(f"Record with ID {delete_id} deleted successfully.")
             else:
                 st.error("Failed to delete record.")
         else:
             st.warning(f"No record found with ID {delete_id}.")
-    
+
+# Result of the last save or delete
+if 'expense_flash' in st.session_state:
+    st.success(st.session_state.pop('expense_flash'))
+
+entry_form()
+
+# Load only the IDs to check whether any records exist
+expense_ids = get_expense_data(columns=['id'])['id']
+page_timer.lap('load_data', rows=len(expense_ids))
+
+if not expense_ids.empty:
+    expense_records()
+    category_breakdown()
+    manage_records()
 else:
     st.info("No expense records found. Add some expenses to get started!")
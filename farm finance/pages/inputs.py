@@ -5,7 +5,6 @@ Created on Sun Apr 13 16:47:09 2025
 @author: user
 """
 import streamlit as st
-import pandas as pd
 from datetime import datetime
 import sys
 import os
@@ -13,8 +12,11 @@ import os
 # Add parent directory to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from data_manager import get_input_data, add_input_record, delete_record
-from utils import get_input_categories, get_units, get_current_date
+from data_manager import RecordQuery, run_query, get_input_data, add_input_record, delete_record, find_duplicates
+from utils import get_input_categories, get_units, get_crop_types, get_current_date
+from budgets import season_label
+from validation import RecordValidationError, format_errors
+from perf import PageTimer
 
 # Set page config
 st.set_page_config(
@@ -23,91 +25,121 @@ st.set_page_config(
     layout="wide"
 )
 
+page_timer = PageTimer('inputs')
+
 st.title("🌱 Farm Inputs Management")
 st.markdown("Record all inputs used on your farm including seeds, fertilizers, and other materials.")
 
-# Form for adding new input
-st.subheader("Add New Input")
+# Each section is a fragment: interacting with a filter or the form reruns
+# only that section, and a save or delete reruns the whole page so every
+# section shows the new data.
+
+def flash_message(text):
+    """Show text after the next full rerun."""
+    st.session_state['input_flash'] = text
+    st.rerun()
 
-with st.form("input_form"):
-    col1, col2 = st.columns(2)
+@st.fragment
+def entry_form():
+    timer = PageTimer('inputs')
     
-    with col1:
-        date = st.date_input("Date", datetime.now())
-        category = st.selectbox("Category", get_input_categories())
-        description = st.text_input("Description")
-        
-    with col2:
-        quantity = st.number_input("Quantity", min_value=0.0, step=0.1)
-        unit = st.selectbox("Unit", get_units())
-        cost_per_unit = st.number_input("Cost per Unit (₦)", min_value=0.0, step=0.1)
+    # Form for adding new input
+    st.subheader("Add New Input")
+    
+    with st.form("input_form"):
+        col1, col2 = st.columns(2)
         
-    notes = st.text_area("Notes")
-    
-    submitted = st.form_submit_button("Add Input Record")
-    
-    if submitted:
-        if description and quantity > 0 and cost_per_unit > 0:
-            success = add_input_record(
-                date=date.strftime('%Y-%m-%d'),
-                category=category,
-                description=description,
-                quantity=quantity,
-                unit=unit,
-                cost_per_unit=cost_per_unit,
-                notes=notes
-            )
+        with col1:
+            date = st.date_input("Date", datetime.now())
+            category = st.selectbox("Category", get_input_categories())
+            description = st.text_input("Description")
             
-            if success:
-                st.success("Input record added successfully!")
-                st.info("This input has also been automatically added to your expenses.")
+        with col2:
+            quantity = st.number_input("Quantity", min_value=0.0, step=0.1)
+            unit = st.selectbox("Unit", get_units())
+            cost_per_unit = st.number_input("Cost per Unit (₦)", min_value=0.0, step=0.1)
+            
+        notes = st.text_area("Notes")
+        # Optional tags for the plot and crop cycle breakdowns
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            plot = st.text_input("Plot / Field", help="Leave empty if not specific to one plot.")
+        with col2:
+            crop_cycle = st.text_input("Crop Cycle", value=season_label(datetime.now()))
+        with col3:
+            crop_tag = st.selectbox("For Crop", [""] + get_crop_types(),
+                                    format_func=lambda crop: crop or "Not crop-specific")
+        allow_duplicate = st.checkbox("Save even if an identical record exists",
+                                      help="Use for genuine repeats, e.g. two equal purchases on the same day.")
+        
+        submitted = st.form_submit_button("Add Input Record")
+        
+        if submitted:
+            if description and quantity > 0 and cost_per_unit > 0:
+                try:
+                    success = add_input_record(
+                        date=date.strftime('%Y-%m-%d'),
+                        category=category,
+                        description=description,
+                        quantity=quantity,
+                        unit=unit,
+                        cost_per_unit=cost_per_unit,
+                        notes=notes,
+                        allow_duplicate=allow_duplicate,
+                        plot=plot.strip(),
+                        crop_cycle=crop_cycle.strip(),
+                        crop_type=crop_tag
+                    )
+                except RecordValidationError as exc:
+                    st.error("Not saved:\n\n" + "\n".join(f"- {line}" for line in format_errors(exc.errors)))
+                else:
+                    if success:
+                        flash_message("Input record added successfully! "
+                                      "It has also been automatically added to your expenses.")
+                    else:
+                        st.warning("Not saved: an input with the same date, category, description, quantity, unit and cost already exists. "
+                                   "Tick 'Save even if an identical record exists' if this is a genuine repeat.")
             else:
-                st.error("Failed to add input record.")
-        else:
-            st.warning("Please fill all required fields (description, quantity, cost per unit).")
-
-# Display existing input records
-st.subheader("Input Records")
-
-# Filter options
-st.markdown("### Filter Records")
-col1, col2, col3 = st.columns(3)
+                st.warning("Please fill all required fields (description, quantity, cost per unit).")
+    
+    timer.lap('entry_form')
 
-with col1:
-    filter_category = st.multiselect("Filter by Category", get_input_categories())
+@st.fragment
+def input_records():
+    timer = PageTimer('inputs')
     
-with col2:
-    date_range = st.date_input("Date Range", 
-                               value=[datetime.now().replace(day=1), datetime.now()],
-                               key="input_date_range")
+    # Display existing input records
+    st.subheader("Input Records")
     
-with col3:
-    search_term = st.text_input("Search Description")
-
-# Get input data
-input_df = get_input_data()
-
-if not input_df.empty:
-    # Apply filters
-    filtered_df = input_df.copy()
+    # Filter options
+    st.markdown("### Filter Records")
+    col1, col2, col3 = st.columns(3)
     
-    if filter_category:
-        filtered_df = filtered_df[filtered_df['category'].isin(filter_category)]
+    with col1:
+        filter_category = st.multiselect("Filter by Category", get_input_categories())
+        
+    with col2:
+        date_range = st.date_input("Date Range", 
+                                   value=[datetime.now().replace(day=1), datetime.now()],
+                                   key="input_date_range")
+        
+    with col3:
+        search_term = st.text_input("Search Description")
     
-    if len(date_range) == 2:
-        start_date, end_date = date_range
-        filtered_df = filtered_df[
-            (pd.to_datetime(filtered_df['date']) >= pd.to_datetime(start_date.strftime('%Y-%m-%d'))) &
-            (pd.to_datetime(filtered_df['date']) <= pd.to_datetime(end_date.strftime('%Y-%m-%d')))
-        ]
+    # Build the query once for this rerun
+    start_date, end_date = date_range if len(date_range) == 2 else (None, None)
+    input_query = RecordQuery(
+        record_type='inputs',
+        start=start_date,
+        end=end_date,
+        categories=tuple(filter_category),
+        text=search_term
+    )
     
-    if search_term:
-        filtered_df = filtered_df[
-            filtered_df['description'].str.contains(search_term, case=False, na=False)
-        ]
+    # Apply filters, sorted by date (newest first)
+    filtered_df = run_query(input_query)
     
-    # Sort by date (newest first)
-    filtered_df = filtered_df.sort_values('date', ascending=False)
+    timer.lap('filters', rows=len(filtered_df))
     
     # Display filtered data
     st.dataframe(filtered_df, use_container_width=True)
@@ -128,19 +160,49 @@ if not input_df.empty:
         avg_cost = total_cost / len(filtered_df) if len(filtered_df) > 0 else 0
         st.metric("Average Cost per Input", f"₦{avg_cost:,.2f}")
     
+    timer.lap('summary')
+
+@st.fragment
+def manage_records():
+    timer = PageTimer('inputs')
+    
+    # Duplicate check over all records
+    with st.expander("Possible Duplicates"):
+        duplicates = find_duplicates('inputs')
+        if duplicates.empty:
+            st.write("No duplicate input records found.")
+        else:
+            st.write(f"{duplicates['duplicate_group'].nunique()} groups of identical records. "
+                     "Rows after the first in each group are likely extras; delete them by ID below.")
+            st.dataframe(duplicates, use_container_width=True)
+    
+    timer.lap('duplicates')
+    
     # Delete record option
     st.subheader("Delete Input Record")
     delete_id = st.number_input("Enter ID to delete", min_value=1, step=1)
     if st.button("Delete Record"):
-        if delete_id in input_df['id'].values:
+        if delete_id in get_input_data(columns=['id'])['id'].values:
             if delete_record('inputs', delete_id):
-                st.success(f"Record with ID {delete_id} deleted successfully.")
-                st.warning("Note: This only removes the input record, not the corresponding expense record.")
-                st.rerun()
+                flash_message(f"Record with ID {delete_id} deleted successfully. "
+                              "Note: This only removes the input record, not the corresponding expense record.")
             else:
                 st.error("Failed to delete record.")
         else:
             st.warning(f"No record found with ID {delete_id}.")
-    
+
+# Result of the last save or delete
+if 'input_flash' in st.session_state:
+    st.success(st.session_state.pop('input_flash'))
+
+entry_form()
+
+# Load only the IDs to check whether any records exist
+input_ids = get_input_data(columns=['id'])['id']
+page_timer.lap('load_data', rows=len(input_ids))
+
+if not input_ids.empty:
+    input_records()
+    manage_records()
 else:
     st.info("No input records found. Add some inputs to get started!")
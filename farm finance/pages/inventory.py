@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 21:04:52 2026
+
+@author: user
+"""
+import streamlit as st
+from datetime import datetime
+import sys
+import os
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from inventory_ledger import get_stock_levels, get_item_ledger, get_issue_data, record_issue, delete_issue
+from utils import get_crop_types
+from budgets import season_label
+from perf import PageTimer
+
+# Set page config
+st.set_page_config(
+    page_title="Inventory - Farm Management System",
+    page_icon="📦",
+    layout="wide"
+)
+
+page_timer = PageTimer('inventory')
+
+st.title("📦 Input Inventory")
+st.markdown("Stock on hand of purchased inputs, and what each use of stock cost.")
+
+def flash_message(text):
+    """Show text after the next full rerun."""
+    st.session_state['inventory_flash'] = text
+    st.rerun()
+
+def item_label(stock, key):
+    row = stock[stock['key'] == key].iloc[0]
+    return f"{row['item']} ({row['unit']}) - {row['on_hand']:,.2f} on hand"
+
+@st.fragment
+def issue_form(stock):
+    timer = PageTimer('inventory')
+
+    # Form for taking stock out for use
+    st.subheader("Record Stock Use")
+
+    with st.form("issue_form"):
+        col1, col2 = st.columns(2)
+
+        with col1:
+            key = st.selectbox("Item", stock['key'].tolist(), format_func=lambda key: item_label(stock, key))
+            date = st.date_input("Date", datetime.now())
+
+        with col2:
+            quantity = st.number_input("Quantity Used", min_value=0.0, step=0.1)
+            notes = st.text_input("Notes")
+
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            plot = st.text_input("Plot / Field", help="Leave empty if not specific to one plot.")
+        with col2:
+            crop_cycle = st.text_input("Crop Cycle", value=season_label(datetime.now()))
+        with col3:
+            crop_tag = st.selectbox("For Crop", [""] + get_crop_types(),
+                                    format_func=lambda crop: crop or "Not crop-specific")
+
+        submitted = st.form_submit_button("Record Use")
+
+        if submitted:
+            item = stock[stock['key'] == key].iloc[0]
+            if quantity <= 0:
+                st.warning("Please enter the quantity used.")
+            elif quantity > item['on_hand']:
+                st.warning(f"Only {item['on_hand']:,.2f} {item['unit']} of {item['item']} on hand.")
+            else:
+                record_issue(
+                    date=date.strftime('%Y-%m-%d'),
+                    item=item['item'],
+                    unit=item['unit'],
+                    quantity=quantity,
+                    plot=plot.strip(),
+                    crop_cycle=crop_cycle.strip(),
+                    crop_type=crop_tag,
+                    notes=notes
+                )
+                flash_message(f"Recorded use of {quantity:,.2f} {item['unit']} of {item['item']}.")
+
+    timer.lap('issue_form')
+
+@st.fragment
+def item_ledger(stock):
+    timer = PageTimer('inventory')
+
+    # Movements of one item with running balance and cost of each use
+    st.subheader("Item Ledger")
+    key = st.selectbox("Item", stock['key'].tolist(), format_func=lambda key: item_label(stock, key),
+                       key="ledger_item")
+    ledger = get_item_ledger(key)
+
+    st.dataframe(ledger.rename(columns={
+        'date': 'Date',
+        'item': 'Item',
+        'unit': 'Unit',
+        'movement': 'Movement',
+        'ref_id': 'Record ID',
+        'quantity': 'Quantity',
+        'balance': 'Balance',
+        'unit_cost': 'Unit Cost (₦)',
+        'fifo_cost': 'FIFO Cost (₦)',
+        'avg_cost': 'Average Cost (₦)',
+        'avg_unit_cost': 'Average Unit Cost (₦)',
+        'shortfall': 'Short'
+    }), use_container_width=True)
+
+    if ledger['shortfall'].any():
+        st.warning("More was used than had been bought by then; FIFO cost covers only the stock received.")
+
+    timer.lap('item_ledger', rows=len(ledger))
+
+@st.fragment
+def manage_issues():
+    # Delete a recorded use of stock
+    issues = get_issue_data()
+    with st.expander("Recorded Stock Use"):
+        if issues.empty:
+            st.write("No stock use recorded yet.")
+            return
+        st.dataframe(issues.sort_values('date', ascending=False), use_container_width=True)
+        delete_id = st.number_input("Enter ID to delete", min_value=1, step=1)
+        if st.button("Delete Stock Use"):
+            if delete_issue(delete_id):
+                flash_message(f"Stock use with ID {delete_id} deleted successfully.")
+            else:
+                st.warning(f"No stock use found with ID {delete_id}.")
+
+# Result of the last save or delete
+if 'inventory_flash' in st.session_state:
+    st.success(st.session_state.pop('inventory_flash'))
+
+stock = get_stock_levels()
+page_timer.lap('stock_levels', rows=len(stock))
+
+if stock.empty:
+    st.info("No stock yet. Inputs recorded on the Inputs page are received into stock here.")
+else:
+    # Stock on hand
+    st.subheader("Stock on Hand")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Items in Stock", int((stock['on_hand'] > 0).sum()))
+    with col2:
+        st.metric("Stock Value (FIFO)", f"₦{stock['fifo_value'].sum():,.2f}")
+    with col3:
+        st.metric("Stock Value (Weighted Average)", f"₦{stock['avg_value'].sum():,.2f}")
+
+    st.dataframe(stock.drop(columns='key').rename(columns={
+        'item': 'Item',
+        'unit': 'Unit',
+        'received': 'Received',
+        'issued': 'Used',
+        'on_hand': 'On Hand',
+        'avg_unit_cost': 'Average Unit Cost (₦)',
+        'fifo_value': 'FIFO Value (₦)',
+        'avg_value': 'Weighted Average Value (₦)',
+        'last_movement': 'Last Movement'
+    }), use_container_width=True)
+
+    issue_form(stock)
+    item_ledger(stock)
+    manage_issues()
@@ -5,7 +5,6 @@ Created on Sun Apr 13 16:48:21 2025
 @author: user
 """
 import streamlit as st
-import pandas as pd
 from datetime import datetime
 import plotly.express as px
 import sys
@@ -14,8 +13,11 @@ import os
 # Add parent directory to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from data_manager import get_output_data, add_output_record, delete_record, get_output_summary_by_crop
+from data_manager import RecordQuery, run_query, get_output_data, add_output_record, delete_record, find_duplicates, get_output_summary_by_crop
 from utils import get_crop_types, get_units, get_current_date
+from budgets import season_label
+from validation import RecordValidationError, format_errors
+from perf import PageTimer
 
 # Set page config
 st.set_page_config(
@@ -24,88 +26,116 @@ st.set_page_config(
     layout="wide"
 )
 
+page_timer = PageTimer('outputs')
+
 st.title("🌾 Farm Outputs Management")
 st.markdown("Record all harvests and sales from your farm production.")
 
-# Form for adding new output
-st.subheader("Add New Output/Sale")
+# Each section is a fragment: interacting with a filter or the form reruns
+# only that section, and a save or delete reruns the whole page so every
+# section shows the new data.
+
+def flash_message(text):
+    """Show text after the next full rerun."""
+    st.session_state['output_flash'] = text
+    st.rerun()
 
-with st.form("output_form"):
-    col1, col2 = st.columns(2)
+@st.fragment
+def entry_form():
+    timer = PageTimer('outputs')
     
-    with col1:
-        date = st.date_input("Date", datetime.now())
-        crop_type = st.selectbox("Crop Type", get_crop_types())
-        quantity = st.number_input("Quantity", min_value=0.0, step=0.1)
-        
-    with col2:
-        unit = st.selectbox("Unit", get_units())
-        sales_amount = st.number_input("Sales Amount (₦)", min_value=0.0, step=10.0)
-        buyer = st.text_input("Buyer/Customer")
+    # Form for adding new output
+    st.subheader("Add New Output/Sale")
+    
+    with st.form("output_form"):
+        col1, col2 = st.columns(2)
         
-    notes = st.text_area("Notes")
-    
-    submitted = st.form_submit_button("Add Output Record")
-    
-    if submitted:
-        if crop_type and quantity > 0:
-            success = add_output_record(
-                date=date.strftime('%Y-%m-%d'),
-                crop_type=crop_type,
-                quantity=quantity,
-                unit=unit,
-                sales_amount=sales_amount,
-                buyer=buyer,
-                notes=notes
-            )
+        with col1:
+            date = st.date_input("Date", datetime.now())
+            crop_type = st.selectbox("Crop Type", get_crop_types())
+            quantity = st.number_input("Quantity", min_value=0.0, step=0.1)
+            
+        with col2:
+            unit = st.selectbox("Unit", get_units())
+            sales_amount = st.number_input("Sales Amount (₦)", min_value=0.0, step=10.0)
+            buyer = st.text_input("Buyer/Customer")
             
-            if success:
-                st.success("Output record added successfully!")
+        notes = st.text_area("Notes")
+        # Optional tags for the plot and crop cycle breakdowns
+        col1, col2 = st.columns(2)
+        with col1:
+            plot = st.text_input("Plot / Field", help="Leave empty if not specific to one plot.")
+        with col2:
+            crop_cycle = st.text_input("Crop Cycle", value=season_label(datetime.now()))
+        allow_duplicate = st.checkbox("Save even if an identical record exists",
+                                      help="Use for genuine repeats, e.g. two equal purchases on the same day.")
+        
+        submitted = st.form_submit_button("Add Output Record")
+        
+        if submitted:
+            if crop_type and quantity > 0:
+                try:
+                    success = add_output_record(
+                        date=date.strftime('%Y-%m-%d'),
+                        crop_type=crop_type,
+                        quantity=quantity,
+                        unit=unit,
+                        sales_amount=sales_amount,
+                        buyer=buyer,
+                        notes=notes,
+                        allow_duplicate=allow_duplicate,
+                        plot=plot.strip(),
+                        crop_cycle=crop_cycle.strip()
+                    )
+                except RecordValidationError as exc:
+                    st.error("Not saved:\n\n" + "\n".join(f"- {line}" for line in format_errors(exc.errors)))
+                else:
+                    if success:
+                        flash_message("Output record added successfully!")
+                    else:
+                        st.warning("Not saved: an output with the same date, crop type, quantity, unit, sales amount and buyer already exists. "
+                                   "Tick 'Save even if an identical record exists' if this is a genuine repeat.")
             else:
-                st.error("Failed to add output record.")
-        else:
-            st.warning("Please fill all required fields (crop type and quantity).")
-
-# Display existing output records
-st.subheader("Output Records")
-
-# Filter options
-st.markdown("### Filter Records")
-col1, col2, col3 = st.columns(3)
+                st.warning("Please fill all required fields (crop type and quantity).")
+    
+    timer.lap('entry_form')
 
-with col1:
-    filter_crop = st.multiselect("Filter by Crop Type", get_crop_types())
+@st.fragment
+def output_records():
+    timer = PageTimer('outputs')
     
-with col2:
-    date_range = st.date_input("Date Range", 
-                               value=[datetime.now().replace(day=1), datetime.now()],
-                               key="output_date_range")
+    # Display existing output records
+    st.subheader("Output Records")
     
-with col3:
-    min_sales = st.number_input("Minimum Sales Amount", min_value=0.0, step=100.0)
-
-# Get output data
-output_df = get_output_data()
-
-if not output_df.empty:
-    # Apply filters
-    filtered_df = output_df.copy()
+    # Filter options
+    st.markdown("### Filter Records")
+    col1, col2, col3 = st.columns(3)
     
-    if filter_crop:
-        filtered_df = filtered_df[filtered_df['crop_type'].isin(filter_crop)]
+    with col1:
+        filter_crop = st.multiselect("Filter by Crop Type", get_crop_types())
+        
+    with col2:
+        date_range = st.date_input("Date Range", 
+                                   value=[datetime.now().replace(day=1), datetime.now()],
+                                   key="output_date_range")
+        
+    with col3:
+        min_sales = st.number_input("Minimum Sales Amount", min_value=0.0, step=100.0)
     
-    if len(date_range) == 2:
-        start_date, end_date = date_range
-        filtered_df = filtered_df[
-            (pd.to_datetime(filtered_df['date']) >= pd.to_datetime(start_date.strftime('%Y-%m-%d'))) &
-            (pd.to_datetime(filtered_df['date']) <= pd.to_datetime(end_date.strftime('%Y-%m-%d')))
-        ]
+    # Build the query once for this rerun
+    start_date, end_date = date_range if len(date_range) == 2 else (None, None)
+    output_query = RecordQuery(
+        record_type='outputs',
+        start=start_date,
+        end=end_date,
+        categories=tuple(filter_crop),
+        min_amount=min_sales if min_sales > 0 else None
+    )
     
-    if min_sales > 0:
-        filtered_df = filtered_df[filtered_df['sales_amount'] >= min_sales]
+    # Apply filters, sorted by date (newest first)
+    filtered_df = run_query(output_query)
     
-    # Sort by date (newest first)
-    filtered_df = filtered_df.sort_values('date', ascending=False)
+    timer.lap('filters', rows=len(filtered_df))
     
     # Display filtered data
     st.dataframe(filtered_df, use_container_width=True)
@@ -123,8 +153,22 @@ if not output_df.empty:
         st.metric("Total Sales", f"₦{total_sales:,.2f}")
         
     with col3:
-        avg_price_per_unit = total_sales / filtered_df['quantity'].sum() if filtered_df['quantity'].sum() > 0 else 0
-        st.metric("Average Price", f"₦{avg_price_per_unit:,.2f} per unit")
+        # Price per kg (or liter) over sales whose quantity could be normalized
+        normalized_units = filtered_df['normalized_unit'].dropna().unique()
+        if len(normalized_units) == 1:
+            converted = filtered_df[filtered_df['normalized_quantity'].notna()]
+            total_quantity = converted['normalized_quantity'].sum()
+            avg_price_per_unit = converted['sales_amount'].sum() / total_quantity if total_quantity > 0 else 0
+            st.metric("Average Price", f"₦{avg_price_per_unit:,.2f} per {normalized_units[0]}")
+        else:
+            st.metric("Average Price", "Mixed units")
+            st.caption("Filter to crops sold by weight or by volume, or see the per-crop summary below.")
+    
+    timer.lap('summary')
+
+@st.fragment
+def crop_breakdown():
+    timer = PageTimer('outputs')
     
     # Output summary by crop
     st.subheader("Output Summary by Crop")
@@ -147,18 +191,49 @@ if not output_df.empty:
         # Show table summary
         st.dataframe(output_summary, use_container_width=True)
     
+    timer.lap('breakdown')
+
+@st.fragment
+def manage_records():
+    timer = PageTimer('outputs')
+    
+    # Duplicate check over all records
+    with st.expander("Possible Duplicates"):
+        duplicates = find_duplicates('outputs')
+        if duplicates.empty:
+            st.write("No duplicate output records found.")
+        else:
+            st.write(f"{duplicates['duplicate_group'].nunique()} groups of identical records. "
+                     "Rows after the first in each group are likely extras; delete them by ID below.")
+            st.dataframe(duplicates, use_container_width=True)
+    
+    timer.lap('duplicates')
+    
     # Delete record option
     st.subheader("Delete Output Record")
     delete_id = st.number_input("Enter ID to delete", min_value=1, step=1)
     if st.button("Delete Record"):
-        if delete_id in output_df['id'].values:
+        if delete_id in get_output_data(columns=['id'])['id'].values:
             if delete_record('outputs', delete_id):
-                st.success(f"Record with ID {delete_id} deleted successfully.")
-                st.rerun()
+                flash_message(f"Record with ID {delete_id} deleted successfully.")
             else:
                 st.error("Failed to delete record.")
         else:
             st.warning(f"No record found with ID {delete_id}.")
-    
+
+# Result of the last save or delete
+if 'output_flash' in st.session_state:
+    st.success(st.session_state.pop('output_flash'))
+
+entry_form()
+
+# Load only the IDs to check whether any records exist
+output_ids = get_output_data(columns=['id'])['id']
+page_timer.lap('load_data', rows=len(output_ids))
+
+if not output_ids.empty:
+    output_records()
+    crop_breakdown()
+    manage_records()
 else:
     st.info("No output records found. Add some outputs to get started!")
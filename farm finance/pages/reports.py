@@ -18,13 +18,21 @@ import base64
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from data_manager import (
-    get_expense_data, 
-    get_input_data, 
-    get_output_data, 
+    RecordQuery,
+    run_query,
     calculate_profit_loss,
+    summarize_outputs_by_crop,
     get_expense_summary_by_category,
     get_output_summary_by_crop
 )
+from analytics import ROLLING_WINDOWS, profit_margin, rolling_profit, ytd_comparison, same_month_last_year
+from price_analytics import get_price_analytics
+from crop_profitability import ALLOCATION_RULES, crop_margins, crop_summary
+from history import run_query_as_of
+from pdf_reports import request_report_pdf
+from report_scheduler import start_scheduler, standard_windows, get_standard_report, is_report_ready, get_status
+from utils import get_crop_types
+from perf import PageTimer
 
 # Set page config
 st.set_page_config(
@@ -33,44 +41,79 @@ st.set_page_config(
     layout="wide"
 )
 
+page_timer = PageTimer('reports')
+
+# Keep the standard period reports pre-generated in the background
+start_scheduler()
+
 st.title("📊 Farm Reports")
 st.markdown("Generate comprehensive reports for your farm operations.")
 
-# Get data
-expense_df = get_expense_data()
-input_df = get_input_data()
-output_df = get_output_data()
+# Standard periods are served from the pre-generated reports
+report_period = st.selectbox(
+    "Period",
+    ["Custom"] + list(standard_windows()),
+    key="report_period"
+)
 
 # Date range selector for all reports
-start_date = st.date_input(
-    "Start Date",
-    value=(datetime.now() - timedelta(days=365)).replace(day=1),
-    key="report_start_date"
-)
-end_date = st.date_input(
-    "End Date",
-    value=datetime.now(),
-    key="report_end_date"
+if report_period == "Custom":
+    start_date = st.date_input(
+        "Start Date",
+        value=(datetime.now() - timedelta(days=365)).replace(day=1),
+        key="report_start_date"
+    )
+    end_date = st.date_input(
+        "End Date",
+        value=datetime.now(),
+        key="report_end_date"
+    )
+else:
+    start_date, end_date = standard_windows()[report_period]
+    st.caption(f"{start_date:%d %b %Y} to {end_date:%d %b %Y}"
+               + ("" if is_report_ready(report_period) else ". Generating the report now."))
+    status = get_status()
+    if status['last_error_at'] is not None and (status['last_success'] is None
+                                                or status['last_error_at'] > status['last_success']):
+        st.warning(f"Pre-generating the standard reports failed ({status['last_error']}); "
+                   f"they are built when opened instead.")
+
+as_of_date = st.date_input(
+    "As of",
+    value=None,
+    key="report_as_of_date",
+    help="Show the books as they were recorded at the end of this day, before any later edits or deletes."
 )
 
-# Filter data by date range
-if not expense_df.empty:
-    expense_df = expense_df[
-        (pd.to_datetime(expense_df['date']) >= pd.to_datetime(start_date)) &
-        (pd.to_datetime(expense_df['date']) <= pd.to_datetime(end_date))
-    ]
+# Load only the rows within the date range
+expense_query = RecordQuery('expenses', start=start_date, end=end_date, sort=None)
+input_query = RecordQuery('inputs', start=start_date, end=end_date, sort=None)
+output_query = RecordQuery('outputs', start=start_date, end=end_date, sort=None)
 
-if not input_df.empty:
-    input_df = input_df[
-        (pd.to_datetime(input_df['date']) >= pd.to_datetime(start_date)) &
-        (pd.to_datetime(input_df['date']) <= pd.to_datetime(end_date))
-    ]
+if as_of_date is not None and as_of_date < datetime.now().date():
+    try:
+        expense_df = run_query_as_of(expense_query, as_of_date)
+        input_df = run_query_as_of(input_query, as_of_date)
+        output_df = run_query_as_of(output_query, as_of_date)
+        st.info(f"Showing the books as recorded on {as_of_date:%d %b %Y}. "
+                "The Comparisons, Prices & Buyers and Crop Profitability tabs always use current data.")
+    except ValueError as e:
+        st.warning(f"{e} Showing current data.")
+        as_of_date = None
+
+standard_report = None
+if as_of_date is None or as_of_date >= datetime.now().date():
+    if report_period != "Custom":
+        standard_report = get_standard_report(report_period)
+        expense_df = standard_report['expenses']
+        input_df = standard_report['inputs']
+        output_df = standard_report['outputs']
+    else:
+        expense_df = run_query(expense_query)
+        input_df = run_query(input_query)
+        output_df = run_query(output_query)
 
-if not output_df.empty:
-    output_df = output_df[
-        (pd.to_datetime(output_df['date']) >= pd.to_datetime(start_date)) &
-        (pd.to_datetime(output_df['date']) <= pd.to_datetime(end_date))
-    ]
+page_timer.lap('load_data', rows=len(expense_df) + len(input_df) + len(output_df))
 
 # Report tabs
 report_tabs = st.tabs([
@@ -78,6 +121,9 @@ report_tabs = st.tabs([
     "Expense Analysis", 
     "Output Analysis", 
     "Monthly Trends",
+    "Comparisons",
+    "Prices & Buyers",
+    "Crop Profitability",
     "Export Reports"
 ])
 
@@ -86,7 +132,11 @@ with report_tabs[0]:
     st.header("Financial Summary Report")
     
     # Calculate profit/loss
-    profit_loss_df = calculate_profit_loss(expense_df, output_df)
+    if standard_report is not None:
+        # The Monthly Trends tab adds columns, keep the shared report unchanged
+        profit_loss_df = standard_report['profit_loss'].copy()
+    else:
+        profit_loss_df = calculate_profit_loss(expense_df, output_df)
     
     # Key financial metrics
     col1, col2, col3, col4 = st.columns(4)
@@ -125,6 +175,8 @@ with report_tabs[0]:
     else:
         st.info("No financial data available for the selected date range.")
 
+page_timer.lap('financial_summary')
+
 # Expense Analysis Report Tab
 with report_tabs[1]:
     st.header("Expense Analysis Report")
@@ -148,10 +200,10 @@ with report_tabs[1]:
         st.subheader("Monthly Expense Trend by Category")
         
         # Create month column
-        expense_df['month'] = pd.to_datetime(expense_df['date']).dt.strftime('%Y-%m')
+        expense_by_month = expense_df.assign(month=pd.to_datetime(expense_df['date']).dt.strftime('%Y-%m'))
         
         # Group by month and category
-        monthly_expense_by_category = expense_df.pivot_table(
+        monthly_expense_by_category = expense_by_month.pivot_table(
             index='month', 
             columns='category', 
             values='amount', 
@@ -174,17 +226,15 @@ with report_tabs[1]:
     else:
         st.info("No expense data available for the selected date range.")
 
+page_timer.lap('expense_analysis')
+
 # Output Analysis Report Tab
 with report_tabs[2]:
     st.header("Output Analysis Report")
     
     if not output_df.empty:
         # Output by crop type
-        output_by_crop = output_df.groupby('crop_type').agg({
-            'quantity': 'sum',
-            'sales_amount': 'sum'
-        }).reset_index()
-        output_by_crop.sort_values('sales_amount', ascending=False, inplace=True)
+        output_by_crop = summarize_outputs_by_crop(output_df)
         
         # Bar chart
         fig = px.bar(output_by_crop, x='crop_type', y='sales_amount',
@@ -203,11 +253,11 @@ with report_tabs[2]:
         st.subheader("Monthly Output Trend")
         
         # Create month column
-        output_df['month'] = pd.to_datetime(output_df['date']).dt.strftime('%Y-%m')
+        output_by_month = output_df.assign(month=pd.to_datetime(output_df['date']).dt.strftime('%Y-%m'))
         
         # Group by month
-        monthly_output = output_df.groupby('month').agg({
-            'quantity': 'sum',
+        monthly_output = output_by_month.groupby('month').agg({
+            'normalized_quantity': 'sum',
             'sales_amount': 'sum'
         }).reset_index()
         
@@ -221,8 +271,8 @@ with report_tabs[2]:
         ))
         fig.add_trace(go.Scatter(
             x=monthly_output['month'],
-            y=monthly_output['quantity'],
-            name='Quantity',
+            y=monthly_output['normalized_quantity'],
+            name='Quantity (kg / liters)',
             yaxis='y2',
             marker_color='royalblue'
         ))
@@ -232,7 +282,7 @@ with report_tabs[2]:
             xaxis_title='Month',
             yaxis_title='Sales Amount (₦)',
             yaxis2=dict(
-                title='Quantity',
+                title='Quantity (kg / liters)',
                 overlaying='y',
                 side='right'
             ),
@@ -242,6 +292,8 @@ with report_tabs[2]:
     else:
         st.info("No output data available for the selected date range.")
 
+page_timer.lap('output_analysis')
+
 # Monthly Trends Report Tab
 with report_tabs[3]:
     st.header("Monthly Trends Report")
@@ -263,9 +315,8 @@ with report_tabs[3]:
         
         # Profit margin trend
         if 'total_sales' in profit_loss_df.columns and 'profit_loss' in profit_loss_df.columns:
-            profit_loss_df['profit_margin'] = profit_loss_df.apply(
-                lambda x: (x['profit_loss'] / x['total_sales'] * 100) if x['total_sales'] > 0 else 0, 
-                axis=1
+            profit_loss_df['profit_margin'] = profit_margin(
+                profit_loss_df['profit_loss'], profit_loss_df['total_sales']
             )
             
             fig = px.bar(profit_loss_df, x='month_year', y='profit_margin',
@@ -278,13 +329,186 @@ with report_tabs[3]:
     else:
         st.info("No financial data available for the selected date range.")
 
-# Export Reports Tab
+page_timer.lap('monthly_trends')
+
+# Comparisons Report Tab
 with report_tabs[4]:
+    st.header("Rolling and Year-over-Year Comparisons")
+    st.caption("Computed from monthly rollups over all recorded data, independent of the date range above.")
+    
+    rolling_df = rolling_profit()
+    
+    if not rolling_df.empty:
+        # Rolling windows
+        st.subheader("Rolling Profit/Loss")
+        window_columns = [f'profit_{window}m' for window in ROLLING_WINDOWS]
+        fig = px.line(rolling_df, x='month', y=window_columns,
+                     title='Trailing 3/6/12-Month Profit/Loss',
+                     labels={'month': 'Month', 'value': 'Profit/Loss (₦)', 'variable': 'Window'},
+                     markers=True)
+        fig.add_hline(y=0, line_dash="dash", line_color="red")
+        st.plotly_chart(fig, use_container_width=True)
+        
+        comparison_type = st.radio("Compare", ["Expenses by Category", "Sales by Crop"], horizontal=True)
+        comparison_file = 'expenses' if comparison_type == "Expenses by Category" else 'outputs'
+        
+        # Year to date versus the same span last year
+        st.subheader("Year to Date vs. Prior Year to Date")
+        ytd_df = ytd_comparison(comparison_file)
+        if not ytd_df.empty:
+            col1, col2 = st.columns(2)
+            with col1:
+                st.metric("YTD Total", f"₦{ytd_df['ytd'].sum():,.2f}",
+                          delta=f"₦{ytd_df['change'].sum():,.2f}")
+            with col2:
+                st.metric("Prior YTD Total", f"₦{ytd_df['prior_ytd'].sum():,.2f}")
+            st.dataframe(ytd_df, use_container_width=True)
+        else:
+            st.info("No data for this year or the prior year.")
+        
+        # Same month last year
+        st.subheader("Same Month Last Year")
+        same_month_df = same_month_last_year(comparison_file)
+        if not same_month_df.empty:
+            fig = px.bar(same_month_df, x=same_month_df.columns[0], y=['this_year', 'last_year'],
+                        title='Latest Month vs. Same Month Last Year',
+                        barmode='group',
+                        labels={'value': 'Amount (₦)', 'variable': 'Year'},
+                        color_discrete_sequence=px.colors.qualitative.Safe)
+            st.plotly_chart(fig, use_container_width=True)
+            st.dataframe(same_month_df, use_container_width=True)
+        else:
+            st.info("No data for the latest month or the same month last year.")
+    else:
+        st.info("No financial data available for comparisons.")
+
+page_timer.lap('comparisons')
+
+# Prices & Buyers Report Tab
+with report_tabs[5]:
+    st.header("Prices and Buyers")
+    st.caption("Unit prices are per kg (per liter for oils) over all recorded sales, independent of the date range above.")
+    
+    price_analytics = get_price_analytics()
+    price_by_crop = price_analytics['by_crop']
+    
+    if not price_by_crop.empty:
+        # Price distribution per crop
+        st.subheader("Price Distribution by Crop")
+        st.dataframe(price_by_crop, use_container_width=True)
+        
+        price_crop = st.selectbox("Crop", price_by_crop['crop_type'].tolist(), key="price_crop")
+        
+        # Price trend for the chosen crop
+        crop_trend = price_analytics['trend']
+        crop_trend = crop_trend[crop_trend['crop_type'] == price_crop]
+        fig = go.Figure()
+        fig.add_trace(go.Scatter(
+            x=list(crop_trend['month']) + list(crop_trend['month'][::-1]),
+            y=list(crop_trend['p90_price']) + list(crop_trend['p10_price'][::-1]),
+            fill='toself', fillcolor='rgba(65,105,225,0.2)', line=dict(width=0),
+            name='p10-p90', hoverinfo='skip'
+        ))
+        fig.add_trace(go.Scatter(
+            x=crop_trend['month'], y=crop_trend['median_price'],
+            name='Median price', mode='lines+markers', marker_color='royalblue'
+        ))
+        fig.update_layout(title=f'{price_crop} Monthly Unit Price',
+                          xaxis_title='Month', yaxis_title='Price (₦)')
+        st.plotly_chart(fig, use_container_width=True)
+        
+        # Buyers of the chosen crop
+        st.subheader(f"{price_crop} Prices by Buyer")
+        crop_buyers = price_analytics['by_crop_buyer']
+        st.dataframe(crop_buyers[crop_buyers['crop_type'] == price_crop], use_container_width=True)
+        
+        # Top buyers overall
+        st.subheader("Top Buyers")
+        top_buyers = price_analytics['top_buyers']
+        fig = px.bar(top_buyers.head(10), x='buyer', y='sales_amount',
+                    title='Top 10 Buyers by Sales',
+                    labels={'buyer': 'Buyer', 'sales_amount': 'Sales Amount (₦)'},
+                    color_discrete_sequence=px.colors.qualitative.Safe)
+        st.plotly_chart(fig, use_container_width=True)
+        st.dataframe(top_buyers, use_container_width=True)
+    else:
+        st.info("No sales with convertible quantities to analyse.")
+
+page_timer.lap('prices_and_buyers')
+
+# Crop Profitability Report Tab
+with report_tabs[6]:
+    st.header("Crop Profitability")
+    st.caption("Whole months within the date range above. Expenses tagged with a crop are charged to it; "
+               "shared costs are spread over the crops by the rule below.")
+    
+    rule_labels = {
+        'revenue': "Share of sales",
+        'area': "Share of area",
+        'direct': "Tagged costs only"
+    }
+    allocation_rule = st.radio("Allocate shared costs by", ALLOCATION_RULES,
+                               format_func=rule_labels.get, horizontal=True, key="allocation_rule")
+    
+    crop_areas = None
+    if allocation_rule == 'area':
+        st.markdown("Area under each crop (hectares)")
+        area_columns = st.columns(len(get_crop_types()))
+        crop_areas = {}
+        for column, crop in zip(area_columns, get_crop_types()):
+            with column:
+                crop_areas[crop] = st.number_input(crop, min_value=0.0, step=0.5, key=f"crop_area_{crop}")
+    
+    crop_df = crop_summary(start_date, end_date, allocation_rule, crop_areas)
+    
+    if not crop_df.empty:
+        # Margin per crop over the period
+        fig = px.bar(crop_df, x='crop', y=['total_cost', 'sales', 'margin'],
+                    title='Cost, Sales and Margin by Crop',
+                    barmode='group',
+                    labels={'crop': 'Crop', 'value': 'Amount (₦)', 'variable': 'Measure'},
+                    color_discrete_sequence=px.colors.qualitative.Safe)
+        st.plotly_chart(fig, use_container_width=True)
+        
+        st.dataframe(crop_df.rename(columns={
+            'crop': 'Crop',
+            'direct_cost': 'Tagged Cost (₦)',
+            'allocated_cost': 'Allocated Cost (₦)',
+            'total_cost': 'Total Cost (₦)',
+            'sales': 'Sales (₦)',
+            'quantity': 'Quantity Sold',
+            'margin': 'Margin (₦)',
+            'margin_pct': 'Margin (%)',
+            'cost_per_unit': 'Cost per Unit (₦)',
+            'unit': 'Unit',
+            'avg_price': 'Average Price (₦)'
+        }), use_container_width=True)
+        
+        if (crop_df['crop'] == 'Unallocated').any():
+            st.info("Some shared costs could not be allocated: there were no sales in the period, "
+                    "no areas were entered, or the rule keeps them unallocated.")
+        
+        # Margin over time
+        st.subheader("Monthly Margin by Crop")
+        margin_df = crop_margins(start_date, end_date, allocation_rule, crop_areas)
+        fig = px.line(margin_df, x='month', y='margin', color='crop',
+                     title='Monthly Margin by Crop',
+                     labels={'month': 'Month', 'margin': 'Margin (₦)', 'crop': 'Crop'},
+                     markers=True)
+        fig.add_hline(y=0, line_dash="dash", line_color="red")
+        st.plotly_chart(fig, use_container_width=True)
+    else:
+        st.info("No expense or sales data available for the selected period.")
+
+page_timer.lap('crop_profitability')
+
+# Export Reports Tab
+with report_tabs[7]:
     st.header("Export Reports")
     
     export_type = st.selectbox(
         "Select Report to Export",
-        ["Financial Summary", "Expense Details", "Output Details", "Input Details"]
+        ["Financial Summary", "Expense Details", "Output Details", "Input Details", "PDF Report Pack"]
     )
     
     # Function to create a download link
@@ -317,3 +541,28 @@ with report_tabs[4]:
             st.markdown(get_csv_download_link(input_df, "input_details.csv"), unsafe_allow_html=True)
         else:
             st.warning("No input data available to export.")
+    
+    elif export_type == "PDF Report Pack":
+        st.caption("Financial summary, expense analysis, output analysis and monthly trends for the selected dates, ready to print.")
+        pdf_as_of = as_of_date if as_of_date is not None and as_of_date < datetime.now().date() else None
+        pdf_future = request_report_pdf(start_date, end_date, pdf_as_of)
+        pdf_pending = not pdf_future.done()
+        
+        # Rendering runs in a worker process; poll it without rerunning the page
+        @st.fragment(run_every=1 if pdf_pending else None)
+        def pdf_download():
+            if not pdf_future.done():
+                st.info("Rendering the PDF report pack...")
+            elif pdf_pending:
+                # Rerun the page once so this fragment stops polling
+                st.rerun()
+            elif pdf_future.exception() is not None:
+                st.error(f"Could not render the PDF: {pdf_future.exception()}")
+            else:
+                st.download_button("Download PDF", pdf_future.result(),
+                                   file_name=f"farm_report_{start_date:%Y%m%d}_{end_date:%Y%m%d}.pdf",
+                                   mime="application/pdf")
+        
+        pdf_download()
+
+page_timer.lap('export')
@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 22:15:37 2026
+
+@author: user
+"""
+import streamlit as st
+import pandas as pd
+import plotly.express as px
+from datetime import datetime
+import sys
+import os
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from payroll import (
+    PAY_TYPES,
+    DEFAULT_DAYS,
+    get_workers,
+    add_worker,
+    set_worker_active,
+    payroll_lines,
+    run_payroll,
+    labor_cost_by_worker,
+    labor_cost_by_period
+)
+from utils import get_payment_methods
+from perf import PageTimer
+
+# Set page config
+st.set_page_config(
+    page_title="Workers & Payroll - Farm Management System",
+    page_icon="👷",
+    layout="wide"
+)
+
+page_timer = PageTimer('workers')
+
+st.title("👷 Workers & Payroll")
+st.markdown("Keep a register of farm workers and pay everyone for the month in one run.")
+
+def flash_message(text):
+    """Show text after the next full rerun."""
+    st.session_state['workers_flash'] = text
+    st.rerun()
+
+@st.fragment
+def worker_form():
+    timer = PageTimer('workers')
+
+    # Form for adding a worker to the register
+    st.subheader("Add Worker")
+
+    with st.form("worker_form"):
+        col1, col2 = st.columns(2)
+
+        with col1:
+            name = st.text_input("Name")
+            role = st.text_input("Role")
+            pay_type = st.selectbox("Pay Type", list(PAY_TYPES),
+                                    help="Monthly staff are paid as Salaries, daily workers as Contract Labor.")
+
+        with col2:
+            rate = st.number_input("Rate (₦ per month or per day)", min_value=0.0, step=100.0)
+            feeding_allowance = st.number_input("Feeding Allowance (₦ per day worked)", min_value=0.0, step=50.0)
+            payment_method = st.selectbox("Payment Method", get_payment_methods())
+
+        plot = st.text_input("Plot / Field", help="Leave empty if not specific to one plot.")
+        notes = st.text_area("Notes")
+
+        submitted = st.form_submit_button("Add Worker")
+
+        if submitted:
+            if name and rate > 0:
+                add_worker(
+                    name=name.strip(),
+                    role=role.strip(),
+                    pay_type=pay_type,
+                    rate=rate,
+                    feeding_allowance=feeding_allowance,
+                    payment_method=payment_method,
+                    plot=plot.strip(),
+                    notes=notes
+                )
+                flash_message(f"{name.strip()} added to the worker register.")
+            else:
+                st.warning("Please fill all required fields (name, rate).")
+
+    timer.lap('worker_form')
+
+@st.fragment
+def worker_register():
+    # Register with activate/deactivate
+    st.subheader("Worker Register")
+    workers = get_workers()
+    st.dataframe(workers, use_container_width=True)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        worker_id = st.selectbox("Worker", workers.index.tolist(),
+                                 format_func=lambda worker_id: workers.loc[worker_id, 'name'],
+                                 key="register_worker")
+    with col2:
+        active = bool(workers.loc[worker_id, 'active'])
+        st.write("")
+        if st.button("Deactivate" if active else "Reactivate"):
+            set_worker_active(worker_id, not active)
+            flash_message(f"{workers.loc[worker_id, 'name']} {'deactivated' if active else 'reactivated'}.")
+
+@st.fragment
+def payroll_run():
+    timer = PageTimer('workers')
+
+    st.subheader("Payroll Run")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        pay_date = st.date_input("Pay Date", datetime.now(), key="pay_date")
+    with col2:
+        period = st.text_input("Period (YYYY-MM)", value=pay_date.strftime('%Y-%m'),
+                               help="The month being paid for, e.g. last month when paying at the start of a month.")
+    with col3:
+        default_days = st.number_input("Days Worked", min_value=0, max_value=31, value=DEFAULT_DAYS,
+                                       help="Days worked by everyone not given their own days below.")
+
+    if pd.isna(pd.to_datetime(period, format='%Y-%m', errors='coerce')):
+        st.warning("Please enter the period as YYYY-MM, e.g. 2025-09.")
+        return
+
+    # Days worked per worker, for daily pay and feeding
+    workers = get_workers()
+    workers = workers[workers['active']]
+    days_df = st.data_editor(
+        pd.DataFrame({'name': workers['name'], 'pay_type': workers['pay_type'],
+                      'days': float(default_days)}, index=workers.index),
+        disabled=['name', 'pay_type'],
+        use_container_width=True,
+        key=f"payroll_days_{default_days}"
+    )
+
+    lines = payroll_lines(period, days_df['days'].to_dict(), default_days)
+    timer.lap('payroll_lines', rows=len(lines))
+
+    if lines.empty:
+        st.info(f"Every active worker has already been paid for {period}.")
+        return
+
+    st.dataframe(lines, use_container_width=True)
+    st.metric("Payroll Total", f"₦{lines['amount'].sum():,.2f}")
+
+    if st.button("Run Payroll"):
+        result = run_payroll(period, pay_date.strftime('%Y-%m-%d'), days_df['days'].to_dict(), default_days)
+        message = (f"Payroll for {period}: {result['added']} expenses added "
+                   f"totalling ₦{result['total']:,.2f}.")
+        if result['recovered']:
+            message += (f" {result['recovered']} expenses of an earlier run that did not finish "
+                        f"were recorded as paid.")
+        flash_message(message)
+
+@st.fragment
+def labor_costs():
+    timer = PageTimer('workers')
+
+    # Labour cost summaries
+    st.subheader("Labour Costs")
+    by_period = labor_cost_by_period()
+    if by_period.empty:
+        st.info("No payroll runs yet.")
+        return
+
+    fig = px.bar(by_period, x='period', y=[column for column in by_period.columns if column not in ('period', 'total')],
+                title='Labour Cost by Period',
+                labels={'period': 'Period', 'value': 'Amount (₦)', 'variable': 'Category'},
+                color_discrete_sequence=px.colors.qualitative.Safe)
+    st.plotly_chart(fig, use_container_width=True)
+    st.dataframe(by_period, use_container_width=True)
+
+    st.markdown("### By Worker")
+    periods = by_period['period'].tolist()
+    col1, col2 = st.columns(2)
+    with col1:
+        start_period = st.selectbox("From", periods, key="labor_from")
+    with col2:
+        end_period = st.selectbox("To", periods, index=len(periods) - 1, key="labor_to")
+    st.dataframe(labor_cost_by_worker(start_period, end_period), use_container_width=True)
+
+    timer.lap('labor_costs')
+
+# Result of the last save or run
+if 'workers_flash' in st.session_state:
+    st.success(st.session_state.pop('workers_flash'))
+
+worker_form()
+
+workers = get_workers()
+page_timer.lap('load_workers', rows=len(workers))
+
+if not workers.empty:
+    worker_register()
+    payroll_run()
+    labor_costs()
+else:
+    st.info("No workers registered yet. Add your workers to run payroll.")
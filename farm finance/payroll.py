@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+"""
+Worker register and monthly payroll runs.
+
+Workers are stored in data/workers.csv. Monthly staff are paid their rate as
+"Salaries", daily workers their rate times days worked as "Contract Labor",
+and a feeding allowance per day worked is paid as "Worker Feeding". A run
+for a month writes every wage expense in one add_expense_records call, one
+file rewrite however many workers there are, and keeps a line per worker
+and category in data/payroll.csv with the expense ID it created. Workers
+already paid for the month are left out, so a run can be repeated for late
+additions or to re-pay a worker whose wage expenses were deleted. That,
+not the expense duplicate check, keeps a period from being paid twice:
+two workers with the same name and rate have identical wage expenses.
+
+The expenses are written before the lines, and each expense's notes name
+the period and worker. If a run stops between the two writes, the next run
+for that period finds the expenses without lines and records them instead
+of paying the workers twice.
+
+Labour-cost summaries join the payroll lines to the worker register indexed
+by worker ID. Lines whose expense has since been deleted are not counted.
+"""
+import os
+import re
+import threading
+from datetime import datetime
+
+import pandas as pd
+
+from budgets import season_label
+from data_manager import add_expense_records, get_data_version, get_expense_data
+import journal
+from journal import atomic_write_csv
+from utils import generate_id, get_data_dir, get_file_headers
+
+WORKER_FILE = os.path.join(get_data_dir(), 'workers.csv')
+WORKER_COLUMNS = get_file_headers()['workers.csv']
+PAYROLL_FILE = os.path.join(get_data_dir(), 'payroll.csv')
+PAYROLL_COLUMNS = get_file_headers()['payroll.csv']
+
+# Wage expense category of each pay type
+PAY_TYPES = {
+    'Monthly': 'Salaries',
+    'Daily': 'Contract Labor'
+}
+FEEDING_CATEGORY = 'Worker Feeding'
+DEFAULT_DAYS = 22
+
+# Notes of a wage expense written by a payroll run
+PAYROLL_NOTES = re.compile(r'^Payroll (?P<period>\d{4}-\d{2}), worker (?P<worker_id>\d+), (?P<days>[\d.]+) days$')
+
+_cache = {}
+_lock = threading.Lock()
+_write_lock = threading.Lock()
+
+
+def _read(path, columns):
+    try:
+        return pd.read_csv(path)
+    except (pd.errors.EmptyDataError, FileNotFoundError):
+        return pd.DataFrame(columns=columns)
+
+
+def _file_version(path):
+    try:
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+    except FileNotFoundError:
+        return 0, 0
+
+
+def get_worker_data():
+    """Load the worker register from CSV file."""
+    return _read(WORKER_FILE, WORKER_COLUMNS)
+
+
+def get_payroll_data():
+    """Load payroll lines from CSV file."""
+    return _read(PAYROLL_FILE, PAYROLL_COLUMNS)
+
+
+def get_workers():
+    """Return the worker register indexed by worker ID. Shared, do not modify."""
+    version = _file_version(WORKER_FILE)
+    with _lock:
+        if _cache.get('workers_version') == version:
+            return _cache['workers']
+
+    workers = get_worker_data()
+    workers['active'] = workers['active'].astype(str).str.lower().isin(['true', '1'])
+    workers['rate'] = pd.to_numeric(workers['rate'], errors='coerce').fillna(0.0)
+    workers['feeding_allowance'] = pd.to_numeric(workers['feeding_allowance'], errors='coerce').fillna(0.0)
+    workers = workers.set_index('id').sort_index()
+    with _lock:
+        _cache.update(workers_version=version, workers=workers)
+    return workers
+
+
+def add_worker(name, role, pay_type, rate, feeding_allowance=0.0, payment_method='', plot='', notes=''):
+    """Add a worker to the register. Returns the new worker ID."""
+    if pay_type not in PAY_TYPES:
+        raise ValueError(f"Unknown pay type '{pay_type}', expected one of {list(PAY_TYPES)}")
+    with _write_lock:
+        df = get_worker_data()
+        worker_id = int(generate_id(df))
+        new_record = pd.DataFrame([{
+            'id': worker_id,
+            'name': name,
+            'role': role,
+            'pay_type': pay_type,
+            'rate': float(rate),
+            'feeding_allowance': float(feeding_allowance),
+            'payment_method': payment_method,
+            'plot': plot,
+            'active': True,
+            'notes': notes
+        }], columns=WORKER_COLUMNS)
+        df = pd.concat([df, new_record], ignore_index=True) if not df.empty else new_record
+        atomic_write_csv(df, WORKER_FILE)
+    return worker_id
+
+
+def set_worker_active(worker_id, active):
+    """Activate or deactivate a worker; inactive workers are left out of payroll runs."""
+    with _write_lock:
+        df = get_worker_data()
+        if worker_id not in df['id'].values:
+            return False
+        df.loc[df['id'] == worker_id, 'active'] = bool(active)
+        atomic_write_csv(df, WORKER_FILE)
+    return True
+
+
+def payroll_lines(period, days=None, default_days=DEFAULT_DAYS):
+    """Return the payroll lines a run for period ('YYYY-MM') would write.
+
+    days maps worker ID to days worked in the month, default_days for the
+    rest. One row per worker and category with amounts above zero, without
+    the workers already paid for the period (see _paid_lines and
+    _recover_lines).
+    """
+    workers = get_workers()
+    workers = workers[workers['active']]
+    paid = _paid_lines()
+    paid = pd.concat([paid.loc[paid['period'] == period, 'worker_id'], _recover_lines(period)['worker_id']])
+    workers = workers[~workers.index.isin(paid)]
+    if workers.empty:
+        return pd.DataFrame(columns=['worker_id', 'name', 'category', 'days', 'amount', 'payment_method', 'plot'])
+
+    worked = pd.Series(days or {}, dtype=float).reindex(workers.index).fillna(float(default_days))
+    is_monthly = workers['pay_type'] == 'Monthly'
+    wages = pd.DataFrame({
+        'category': workers['pay_type'].map(PAY_TYPES),
+        'amount': workers['rate'].where(is_monthly, workers['rate'] * worked)
+    })
+    feeding = pd.DataFrame({
+        'category': FEEDING_CATEGORY,
+        'amount': workers['feeding_allowance'] * worked
+    })
+    lines = pd.concat([wages, feeding]).rename_axis('worker_id')
+    lines = lines.join(workers[['name', 'payment_method', 'plot']]).assign(days=worked)
+    lines = lines[lines['amount'] > 0].reset_index().sort_values(['worker_id', 'category'])
+    lines['amount'] = lines['amount'].round(2)
+    return lines[['worker_id', 'name', 'category', 'days', 'amount', 'payment_method', 'plot']].reset_index(drop=True)
+
+
+def run_payroll(period, pay_date, days=None, default_days=DEFAULT_DAYS):
+    """Write the wage expenses for period in one batch and record the run.
+
+    pay_date ('YYYY-MM-DD') is the expense date. Returns a dict with the
+    number of expenses 'added' and their 'total', and the number of lines
+    'recovered' from an earlier run that stopped before recording them.
+    """
+    # Held across processes, so two runs of a period cannot both pay
+    with journal.lock:
+        recovered = _recover_lines(period)
+        _record_lines(recovered)
+
+        lines = payroll_lines(period, days, default_days)
+        if lines.empty:
+            return {'added': 0, 'total': 0.0, 'recovered': len(recovered)}
+
+        crop_cycle = season_label(pay_date) or ''
+        expense_ids = add_expense_records([{
+            'date': pay_date,
+            'category': line.category,
+            'description': f"{line.name} - {line.category} {period}",
+            'amount': line.amount,
+            'payment_method': '' if pd.isna(line.payment_method) else line.payment_method,
+            'notes': f"Payroll {period}, worker {line.worker_id}, {line.days:g} days",
+            'plot': '' if pd.isna(line.plot) else line.plot,
+            'crop_cycle': crop_cycle
+        } for line in lines.itertuples(index=False)], skip_duplicates=False)
+
+        lines['expense_id'] = [int(expense_id) for expense_id in expense_ids]
+        _record_lines(lines.assign(period=period))
+
+    return {'added': len(lines), 'total': float(lines['amount'].sum()), 'recovered': len(recovered)}
+
+
+def _record_lines(lines):
+    """Append payroll lines (with period and expense_id) to the payroll file."""
+    if lines.empty:
+        return
+    run = lines.assign(run_date=datetime.now().strftime('%Y-%m-%d %H:%M:%S'))[PAYROLL_COLUMNS]
+    df = get_payroll_data()
+    df = pd.concat([df, run], ignore_index=True) if not df.empty else run
+    atomic_write_csv(df, PAYROLL_FILE)
+
+
+def _recover_lines(period):
+    """Lines for the wage expenses of period that have no payroll line.
+
+    A run writes its expenses before its lines; these are the expenses of a
+    run that stopped in between, found by their notes.
+    """
+    expenses = get_expense_data(columns=['id', 'category', 'amount', 'notes'])
+    notes = expenses['notes'].astype(str).str.extract(PAYROLL_NOTES)
+    expenses = expenses[(notes['period'] == period) & ~expenses['id'].isin(get_payroll_data()['expense_id'])]
+    notes = notes.loc[expenses.index]
+    return pd.DataFrame({
+        'period': period,
+        'worker_id': notes['worker_id'].astype(int),
+        'category': expenses['category'],
+        'days': notes['days'].astype(float),
+        'amount': expenses['amount'],
+        'expense_id': expenses['id'].astype(int)
+    }, columns=[column for column in PAYROLL_COLUMNS if column != 'run_date'])
+
+
+def _paid_lines():
+    """Payroll lines whose expense still exists, with the worker's name and role."""
+    version = (_file_version(PAYROLL_FILE), _file_version(WORKER_FILE), get_data_version(['expenses']))
+    with _lock:
+        if _cache.get('lines_version') == version:
+            return _cache['lines']
+
+    lines = get_payroll_data()
+    lines = lines[lines['expense_id'].isin(get_expense_data(columns=['id'])['id'])]
+    lines = lines.join(get_workers()[['name', 'role', 'pay_type']].rename(columns={'name': 'worker'}),
+                       on='worker_id')
+    with _lock:
+        _cache.update(lines_version=version, lines=lines)
+    return lines
+
+
+def _summary(keys, start_period=None, end_period=None):
+    lines = _paid_lines()
+    if start_period is not None:
+        lines = lines[lines['period'] >= start_period]
+    if end_period is not None:
+        lines = lines[lines['period'] <= end_period]
+    if lines.empty:
+        return pd.DataFrame()
+
+    # pivot_table drops rows with a missing key, e.g. a worker without a role
+    lines = lines.assign(**{key: lines[key].fillna('') for key in keys})
+    summary = lines.pivot_table(index=keys, columns='category', values='amount', aggfunc='sum', fill_value=0.0)
+    summary = summary.reindex(columns=list(PAY_TYPES.values()) + [FEEDING_CATEGORY], fill_value=0.0)
+    summary['total'] = summary.sum(axis=1)
+    summary.columns.name = None
+    return summary.reset_index()
+
+
+def labor_cost_by_worker(start_period=None, end_period=None):
+    """Salaries, contract labour, feeding and total per worker between two periods."""
+    summary = _summary(['worker_id', 'worker', 'role', 'pay_type'], start_period, end_period)
+    return summary.sort_values('total', ascending=False).reset_index(drop=True) if not summary.empty else summary
+
+
+def labor_cost_by_period(start_period=None, end_period=None):
+    """Salaries, contract labour, feeding and total per payroll period."""
+    return _summary(['period'], start_period, end_period)
@@ -0,0 +1,294 @@
+# -*- coding: utf-8 -*-
+"""
+Printable PDF report packs rendered with matplotlib.
+
+A pack has one page per report tab: financial summary, expense analysis,
+output analysis and monthly trends. The report tables are computed in the
+calling process, which already holds the data, and the drawing is done in
+a small process pool so a render never blocks the Streamlit server. Renders
+are futures cached by data version and date range: a repeat download of the
+same pack is served from memory, and sessions asking for the same pack at
+the same time share one render.
+
+The pool uses spawned workers (the only kind on Windows), which import this
+module to render. Nothing at its top level may touch the data files, so
+data_manager is imported inside the functions that run in the app process.
+"""
+import io
+import multiprocessing
+import sys
+import threading
+import types
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from matplotlib.backends.backend_pdf import PdfPages
+from matplotlib.figure import Figure
+
+RENDER_WORKERS = 2
+PDF_CACHE_SIZE = 16
+
+# A4 landscape, in inches
+PAGE_SIZE = (11.69, 8.27)
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+# Held for the whole of a submit, while __main__ is swapped out
+_submit_lock = threading.Lock()
+_pool = None
+
+
+def _submit(fn, *args):
+    """Submit fn(*args) to the render pool, creating it on first use.
+
+    Streamlit runs page scripts as the __main__ module, and a spawned process
+    re-imports __main__ from its file on start, which would run the page
+    again in every worker. A blank __main__ stands in while submit() may be
+    starting workers. The swap and the submit happen under one lock, so no
+    other submit sees or restores the blank module, and the page's module is
+    put back only if nothing else replaced __main__ in the meantime.
+    """
+    global _pool
+    with _submit_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=RENDER_WORKERS,
+                                        mp_context=multiprocessing.get_context('spawn'))
+        main = sys.modules['__main__']
+        blank = types.ModuleType('__main__')
+        sys.modules['__main__'] = blank
+        try:
+            return _pool.submit(fn, *args)
+        finally:
+            if sys.modules.get('__main__') is blank:
+                sys.modules['__main__'] = main
+
+
+def report_tables(expense_df, output_df):
+    """The small tables each PDF page is drawn from, as a dict of DataFrames."""
+    from data_manager import calculate_profit_loss, summarize_outputs_by_crop
+
+    profit_loss = calculate_profit_loss(expense_df, output_df)
+    if not profit_loss.empty:
+        profit_loss['cumulative_profit'] = profit_loss['profit_loss'].cumsum()
+        sales = profit_loss['total_sales'].to_numpy(dtype=float)
+        profit_loss['profit_margin'] = np.divide(profit_loss['profit_loss'].to_numpy(dtype=float) * 100, sales,
+                                                 out=np.zeros(len(sales)), where=sales > 0)
+
+    expense_by_category = pd.DataFrame(columns=['category', 'amount'])
+    monthly_expense_by_category = pd.DataFrame()
+    if not expense_df.empty:
+        expense_by_category = (expense_df.groupby('category')['amount'].sum()
+                               .sort_values(ascending=False).reset_index())
+        month = pd.to_datetime(expense_df['date']).dt.strftime('%Y-%m').rename('month')
+        monthly_expense_by_category = (expense_df['amount'].groupby([month, expense_df['category']]).sum()
+                                       .unstack(fill_value=0))
+
+    output_by_crop = pd.DataFrame()
+    monthly_output = pd.DataFrame()
+    if not output_df.empty:
+        output_by_crop = summarize_outputs_by_crop(output_df)
+        month = pd.to_datetime(output_df['date']).dt.strftime('%Y-%m').rename('month')
+        monthly_output = output_df[['normalized_quantity', 'sales_amount']].groupby(month).sum().reset_index()
+
+    return {
+        'profit_loss': profit_loss,
+        'expense_by_category': expense_by_category,
+        'monthly_expense_by_category': monthly_expense_by_category,
+        'output_by_crop': output_by_crop,
+        'monthly_output': monthly_output
+    }
+
+
+def _page(title, subtitle):
+    fig = Figure(figsize=PAGE_SIZE)
+    fig.suptitle(title, fontsize=16, fontweight='bold')
+    fig.text(0.5, 0.925, subtitle, ha='center', fontsize=9, color='dimgray')
+    return fig
+
+
+def _no_data(ax, message):
+    ax.axis('off')
+    ax.text(0.5, 0.5, message, ha='center', va='center', color='dimgray')
+
+
+def _table(ax, df, max_rows=12):
+    """Draw up to max_rows of df as a table, amounts with thousands separators."""
+    ax.axis('off')
+    if df.empty:
+        return
+    df = df.head(max_rows)
+    cells = [[f"{value:,.2f}" if isinstance(value, (float, np.floating)) else str(value) for value in row]
+             for row in df.itertuples(index=False)]
+    table = ax.table(cellText=cells, colLabels=[str(c).replace('_', ' ') for c in df.columns],
+                     loc='upper center', cellLoc='right')
+    table.auto_set_font_size(False)
+    table.set_fontsize(7)
+    table.scale(1, 1.2)
+
+
+def _financial_summary(tables, subtitle):
+    fig = _page("Financial Summary", subtitle)
+    profit_loss = tables['profit_loss']
+    if profit_loss.empty:
+        _no_data(fig.add_subplot(), "No financial data for this date range.")
+        return fig
+
+    total_expenses = profit_loss['total_expenses'].sum()
+    total_sales = profit_loss['total_sales'].sum()
+    net_profit = total_sales - total_expenses
+    margin = net_profit / total_sales * 100 if total_sales > 0 else 0
+    fig.text(0.5, 0.87,
+             f"Total expenses ₦{total_expenses:,.2f}    Total sales ₦{total_sales:,.2f}    "
+             f"Net {'profit' if net_profit >= 0 else 'loss'} ₦{abs(net_profit):,.2f}    Margin {margin:.1f}%",
+             ha='center', fontsize=11)
+
+    chart, table = fig.subplots(2, 1, gridspec_kw={'height_ratios': [3, 2], 'top': 0.82})
+    x = np.arange(len(profit_loss))
+    width = 0.27
+    for offset, column, color in ((-width, 'total_expenses', 'indianred'),
+                                  (0, 'total_sales', 'seagreen'),
+                                  (width, 'profit_loss', 'royalblue')):
+        chart.bar(x + offset, profit_loss[column], width, label=column.replace('_', ' '), color=color)
+    chart.set_xticks(x, profit_loss['month_year'], rotation=45, ha='right', fontsize=7)
+    chart.axhline(0, color='black', linewidth=0.5)
+    chart.set_ylabel('Amount (₦)')
+    chart.set_title('Monthly Revenue, Expenses, and Profit/Loss', fontsize=10)
+    chart.legend(fontsize=7)
+    _table(table, profit_loss[['month_year', 'total_expenses', 'total_sales', 'profit_loss']].tail(12))
+    return fig
+
+
+def _expense_analysis(tables, subtitle):
+    fig = _page("Expense Analysis", subtitle)
+    by_category = tables['expense_by_category']
+    if by_category.empty:
+        _no_data(fig.add_subplot(), "No expense data for this date range.")
+        return fig
+
+    pie, table = fig.subplots(1, 2, gridspec_kw={'top': 0.85, 'bottom': 0.45})
+    pie.pie(by_category['amount'], labels=by_category['category'], autopct='%1.0f%%',
+            textprops={'fontsize': 7}, startangle=90)
+    pie.set_title('Expense Distribution by Category', fontsize=10)
+    _table(table, by_category.head(10), max_rows=10)
+
+    trend = fig.add_axes([0.08, 0.08, 0.84, 0.3])
+    monthly = tables['monthly_expense_by_category']
+    for category in monthly.columns:
+        trend.plot(monthly.index, monthly[category], marker='o', markersize=3, label=category)
+    trend.set_title('Monthly Expenses by Category', fontsize=10)
+    trend.set_ylabel('Amount (₦)')
+    trend.tick_params(axis='x', labelrotation=45, labelsize=7)
+    trend.legend(fontsize=6, ncol=4)
+    return fig
+
+
+def _output_analysis(tables, subtitle):
+    fig = _page("Output Analysis", subtitle)
+    by_crop = tables['output_by_crop']
+    if by_crop.empty:
+        _no_data(fig.add_subplot(), "No output data for this date range.")
+        return fig
+
+    bars, table = fig.subplots(1, 2, gridspec_kw={'top': 0.85, 'bottom': 0.45})
+    bars.bar(by_crop['crop_type'], by_crop['sales_amount'], color='seagreen')
+    bars.set_title('Sales by Crop Type', fontsize=10)
+    bars.set_ylabel('Sales Amount (₦)')
+    bars.tick_params(axis='x', labelrotation=45, labelsize=7)
+    _table(table, by_crop[['crop_type', 'sales_amount', 'normalized_quantity', 'normalized_unit']], max_rows=10)
+
+    monthly = tables['monthly_output']
+    sales = fig.add_axes([0.08, 0.08, 0.84, 0.3])
+    sales.bar(monthly['month'], monthly['sales_amount'], color='indianred', label='Sales Amount')
+    sales.set_ylabel('Sales Amount (₦)')
+    sales.tick_params(axis='x', labelrotation=45, labelsize=7)
+    quantity = sales.twinx()
+    quantity.plot(monthly['month'], monthly['normalized_quantity'], color='royalblue', marker='o', markersize=3)
+    quantity.set_ylabel('Quantity (kg / liters)')
+    sales.set_title('Monthly Output (Sales and Quantity)', fontsize=10)
+    return fig
+
+
+def _monthly_trends(tables, subtitle):
+    fig = _page("Monthly Trends", subtitle)
+    profit_loss = tables['profit_loss']
+    if profit_loss.empty:
+        _no_data(fig.add_subplot(), "No financial data for this date range.")
+        return fig
+
+    cumulative, margin = fig.subplots(2, 1, gridspec_kw={'top': 0.85, 'hspace': 0.5})
+    cumulative.plot(profit_loss['month_year'], profit_loss['cumulative_profit'], marker='o', markersize=3)
+    cumulative.axhline(0, color='red', linestyle='--', linewidth=1)
+    cumulative.set_title('Cumulative Profit/Loss Over Time', fontsize=10)
+    cumulative.set_ylabel('Cumulative Profit/Loss (₦)')
+    cumulative.tick_params(axis='x', labelrotation=45, labelsize=7)
+
+    colors = np.where(profit_loss['profit_margin'] >= 0, 'seagreen', 'indianred')
+    margin.bar(profit_loss['month_year'], profit_loss['profit_margin'], color=colors)
+    margin.axhline(0, color='black', linewidth=0.5)
+    margin.set_title('Monthly Profit Margin (%)', fontsize=10)
+    margin.set_ylabel('Profit Margin (%)')
+    margin.tick_params(axis='x', labelrotation=45, labelsize=7)
+    return fig
+
+
+def render_pdf(tables, subtitle):
+    """Draw the report pack from report_tables() output; returns PDF bytes.
+
+    Runs in the worker processes. Figures are built without pyplot, so no
+    GUI backend or global figure state is involved.
+    """
+    buffer = io.BytesIO()
+    with PdfPages(buffer) as pdf:
+        for page in (_financial_summary, _expense_analysis, _output_analysis, _monthly_trends):
+            pdf.savefig(page(tables, subtitle))
+        info = pdf.infodict()
+        info['Title'] = 'Farm Report'
+        info['Subject'] = subtitle
+    return buffer.getvalue()
+
+
+def request_report_pdf(start, end, as_of=None):
+    """Return a future of the PDF pack for start..end, starting a render if needed.
+
+    as_of renders the books as they were recorded at the end of that day
+    (see history). The future is shared by every caller asking for the same
+    pack while the data is unchanged.
+    """
+    from data_manager import RecordQuery, get_data_version, run_query
+
+    key = (get_data_version(['expenses', 'outputs']), start, end, as_of)
+    with _lock:
+        future = _cache.get(key)
+        if future is not None and not (future.done() and future.exception() is not None):
+            _cache.move_to_end(key)
+            return future
+
+    expense_query = RecordQuery('expenses', start=start, end=end, sort=None)
+    output_query = RecordQuery('outputs', start=start, end=end, sort=None)
+    if as_of is not None:
+        from history import run_query_as_of
+        expense_df = run_query_as_of(expense_query, as_of)
+        output_df = run_query_as_of(output_query, as_of)
+    else:
+        expense_df = run_query(expense_query)
+        output_df = run_query(output_query)
+
+    subtitle = f"{start:%d %b %Y} to {end:%d %b %Y}"
+    if as_of is not None:
+        subtitle += f", as recorded on {as_of:%d %b %Y}"
+    subtitle += f". Generated {datetime.now():%d %b %Y %H:%M}"
+    future = _submit(render_pdf, report_tables(expense_df, output_df), subtitle)
+
+    with _lock:
+        _cache[key] = future
+        while len(_cache) > PDF_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return future
+
+
+def get_report_pdf(start, end, as_of=None, timeout=None):
+    """Render (or fetch the cached) PDF pack for start..end and return its bytes."""
+    return request_report_pdf(start, end, as_of).result(timeout)
@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+"""
+Opt-in hot-path timing instrumentation.
+
+Set the environment variable FARM_PERF=1 (or call enable()) to record wall
+time, rows processed and memory deltas for the instrumented data_manager
+functions and page sections. When disabled every hook is a single boolean
+check.
+
+Metrics are shown on the hidden diagnostics panel (open the app with
+?diagnostics=1) and exported to data/perf_metrics.json and
+data/perf_metrics.prom (Prometheus text format) at most once a minute.
+"""
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+
+import pandas as pd
+
+from utils import get_data_dir
+
+METRICS_JSON = os.path.join(get_data_dir(), 'perf_metrics.json')
+METRICS_PROM = os.path.join(get_data_dir(), 'perf_metrics.prom')
+EXPORT_INTERVAL_SECONDS = 60
+MAX_SAMPLES = 2000
+
+_enabled = os.environ.get('FARM_PERF', '').lower() in ('1', 'true', 'yes')
+_lock = threading.Lock()
+_samples = deque(maxlen=MAX_SAMPLES)
+_totals = {}
+_last_export = 0.0
+# True while tracemalloc runs because enable() started it
+_started_tracing = False
+
+
+def enable(flag=True):
+    """Turn instrumentation on or off for this process.
+
+    Memory tracing started here is stopped again when turned off; tracing
+    started by someone else is left running.
+    """
+    global _enabled, _started_tracing
+    with _lock:
+        _enabled = flag
+        if flag and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _started_tracing = True
+        elif not flag and _started_tracing:
+            tracemalloc.stop()
+            _started_tracing = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def _memory():
+    return tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+
+
+def _count_rows(value):
+    """Rows in a DataFrame-like result, or None."""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return len(value)
+    if isinstance(value, (list, tuple)):
+        return len(value)
+    return None
+
+
+def record(name, seconds, rows=None, memory_delta=0):
+    """Store one timing sample and update the running totals for name."""
+    with _lock:
+        _samples.append({
+            'name': name,
+            'timestamp': time.time(),
+            'seconds': seconds,
+            'rows': rows,
+            'memory_delta_bytes': memory_delta
+        })
+        totals = _totals.setdefault(name, {
+            'calls': 0, 'seconds': 0.0, 'max_seconds': 0.0, 'rows': 0, 'memory_delta_bytes': 0
+        })
+        totals['calls'] += 1
+        totals['seconds'] += seconds
+        totals['max_seconds'] = max(totals['max_seconds'], seconds)
+        totals['rows'] += rows or 0
+        totals['memory_delta_bytes'] += memory_delta
+
+    if time.time() - _last_export >= EXPORT_INTERVAL_SECONDS:
+        try:
+            export_metrics()
+        except OSError:
+            pass
+
+
+def timed(name=None):
+    """Decorator that records the wall time, result rows and memory delta of a function."""
+    def decorator(func):
+        label = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            memory_before = _memory()
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            record(label, time.perf_counter() - start, _count_rows(result), _memory() - memory_before)
+            return result
+        return wrapper
+    return decorator
+
+
+class PageTimer:
+    """Lap timer for page scripts.
+
+    Create one at the top of a page and call lap('section') after each
+    section; each lap records the time since the previous one, so sections
+    don't need to be re-indented into with-blocks.
+    """
+
+    def __init__(self, page):
+        self.page = page
+        self._start = time.perf_counter()
+        self._memory = _memory() if _enabled else 0
+
+    def lap(self, section, rows=None):
+        if not _enabled:
+            return
+        now = time.perf_counter()
+        memory = _memory()
+        record(f"{self.page}.{section}", now - self._start, rows, memory - self._memory)
+        self._start = time.perf_counter()
+        self._memory = _memory()
+
+
+def get_summary():
+    """Per-name totals as a DataFrame, slowest first."""
+    with _lock:
+        rows = [dict(name=name, **totals) for name, totals in _totals.items()]
+    if not rows:
+        return pd.DataFrame()
+    summary = pd.DataFrame(rows)
+    summary['avg_ms'] = summary['seconds'] / summary['calls'] * 1000
+    summary['max_ms'] = summary['max_seconds'] * 1000
+    summary['total_ms'] = summary['seconds'] * 1000
+    summary['memory_delta_kb'] = summary['memory_delta_bytes'] / 1024
+    summary = summary[['name', 'calls', 'avg_ms', 'max_ms', 'total_ms', 'rows', 'memory_delta_kb']]
+    return summary.sort_values('total_ms', ascending=False).reset_index(drop=True)
+
+
+def get_samples():
+    """Recent individual samples as a DataFrame, newest first."""
+    with _lock:
+        samples = list(_samples)
+    if not samples:
+        return pd.DataFrame()
+    df = pd.DataFrame(samples)
+    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='s')
+    df['ms'] = df['seconds'] * 1000
+    return df.drop(columns='seconds').iloc[::-1].reset_index(drop=True)
+
+
+def to_prometheus():
+    """Render the totals in Prometheus text exposition format."""
+    with _lock:
+        totals = {name: dict(values) for name, values in _totals.items()}
+
+    metrics = [
+        ('farm_finance_section_calls_total', 'counter', 'Number of timed calls', 'calls'),
+        ('farm_finance_section_seconds_total', 'counter', 'Total wall time in seconds', 'seconds'),
+        ('farm_finance_section_max_seconds', 'gauge', 'Slowest call in seconds', 'max_seconds'),
+        ('farm_finance_section_rows_total', 'counter', 'Rows processed', 'rows'),
+        ('farm_finance_section_memory_delta_bytes', 'counter', 'Net traced memory change', 'memory_delta_bytes')
+    ]
+    lines = []
+    for metric, kind, help_text, key in metrics:
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} {kind}")
+        for name, values in sorted(totals.items()):
+            label = name.replace('\\', '\\\\').replace('"', '\\"')
+            lines.append(f'{metric}{{section="{label}"}} {values[key]}')
+    return "\n".join(lines) + "\n"
+
+
+def export_metrics(json_path=METRICS_JSON, prom_path=METRICS_PROM):
+    """Write the totals as JSON and Prometheus text for external monitoring."""
+    global _last_export
+    _last_export = time.time()
+
+    with _lock:
+        payload = {
+            'exported_at': _last_export,
+            'sections': {name: dict(values) for name, values in _totals.items()}
+        }
+    for path, content in ((json_path, json.dumps(payload, indent=2)), (prom_path, to_prometheus())):
+        # Write then rename so a scraper never reads a half-written file
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    return json_path, prom_path
+
+
+def reset():
+    """Forget all recorded samples."""
+    with _lock:
+        _samples.clear()
+        _totals.clear()
+
+
+def render_performance_panel():
+    """Draw the diagnostics panel (opened with ?diagnostics=1 on the main page)."""
+    import streamlit as st
+
+    st.title("⏱️ Performance Diagnostics")
+
+    enabled = st.toggle("Record timings", value=is_enabled())
+    if enabled != is_enabled():
+        enable(enabled)
+
+    summary = get_summary()
+    if summary.empty:
+        st.info("No timings recorded yet. Enable recording and use the other pages.")
+    else:
+        st.subheader("Totals by Section")
+        st.dataframe(summary, use_container_width=True)
+        st.subheader("Recent Samples")
+        st.dataframe(get_samples().head(200), use_container_width=True)
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        if st.button("Export Metrics"):
+            json_path, prom_path = export_metrics()
+            st.success(f"Exported to {json_path} and {prom_path}")
+    with col2:
+        st.download_button("Download Prometheus Text", to_prometheus(),
+                           file_name="perf_metrics.prom", mime="text/plain")
+    with col3:
+        if st.button("Reset"):
+            reset()
+            st.rerun()
+
+
+if _enabled:
+    enable(True)
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+Price and buyer analytics for sales negotiations.
+
+Unit prices are sales_amount per normalized kg/liter. Distributions
+(p10/median/p90) per crop, per crop and buyer, and per crop and month, plus
+top-buyer rankings, are each computed in one grouped pass over the sales
+and cached until outputs.csv changes.
+"""
+import threading
+
+import pandas as pd
+
+from data_manager import get_output_data, get_data_version
+from perf import timed
+
+RECENT_DAYS = 90
+
+_cache = {}
+_lock = threading.Lock()
+
+
+def _price_rows():
+    """Sales with a usable normalized quantity and their unit price."""
+    df = get_output_data(columns=['date', 'crop_type', 'buyer', 'sales_amount',
+                                  'normalized_quantity', 'normalized_unit'])
+    if df.empty:
+        return df
+    df = df[(df['normalized_quantity'] > 0) & (df['sales_amount'] > 0)].copy()
+    df['buyer'] = df['buyer'].fillna('').astype(str).str.strip().replace('', 'Unknown')
+    df['date'] = pd.to_datetime(df['date'])
+    df['month'] = df['date'].dt.to_period('M').dt.to_timestamp()
+    df['unit_price'] = df['sales_amount'] / df['normalized_quantity']
+    return df
+
+
+def _distribution(df, keys):
+    """Volume, sales and unit-price percentiles for each group of keys."""
+    grouped = df.groupby(keys)
+    summary = grouped.agg(
+        unit=('normalized_unit', 'first'),
+        sales_count=('unit_price', 'size'),
+        volume=('normalized_quantity', 'sum'),
+        sales_amount=('sales_amount', 'sum'),
+        last_sale=('date', 'max')
+    )
+    percentiles = grouped['unit_price'].quantile([0.1, 0.5, 0.9]).unstack()
+    percentiles.columns = ['p10_price', 'median_price', 'p90_price']
+    summary = summary.join(percentiles)
+    # Volume-weighted price, what the crop actually earned per kg/liter
+    summary['avg_price'] = summary['sales_amount'] / summary['volume']
+    return summary
+
+
+@timed()
+def get_price_analytics():
+    """Return cached price distributions and buyer rankings.
+
+    A dict of DataFrames: 'by_crop', 'by_crop_buyer', 'trend' (per crop and
+    month) and 'top_buyers'. Empty frames when there are no priced sales.
+    """
+    version = get_data_version(['outputs'])
+    with _lock:
+        if _cache.get('version') == version:
+            return _cache['result']
+
+    df = _price_rows()
+    if df.empty:
+        result = {name: pd.DataFrame() for name in ('by_crop', 'by_crop_buyer', 'trend', 'top_buyers')}
+    else:
+        by_crop = _distribution(df, 'crop_type')
+        recent = df[df['date'] >= df['date'].max() - pd.Timedelta(days=RECENT_DAYS)]
+        by_crop['recent_median_price'] = recent.groupby('crop_type')['unit_price'].median()
+        by_crop = by_crop.sort_values('sales_amount', ascending=False).reset_index()
+
+        by_crop_buyer = _distribution(df, ['crop_type', 'buyer'])
+        by_crop_buyer['price_vs_crop_median'] = (
+            by_crop_buyer['median_price']
+            / by_crop_buyer.index.get_level_values('crop_type').map(by_crop.set_index('crop_type')['median_price'])
+            - 1
+        ) * 100
+        by_crop_buyer = by_crop_buyer.sort_values(['crop_type', 'sales_amount'], ascending=[True, False]).reset_index()
+
+        trend = _distribution(df, ['crop_type', 'month']).reset_index()
+
+        top_buyers = df.groupby('buyer').agg(
+            sales_amount=('sales_amount', 'sum'),
+            sales_count=('sales_amount', 'size'),
+            crops=('crop_type', 'nunique'),
+            last_sale=('date', 'max')
+        )
+        top_buyers['share_pct'] = top_buyers['sales_amount'] / top_buyers['sales_amount'].sum() * 100
+        top_buyers = top_buyers.sort_values('sales_amount', ascending=False).reset_index()
+        top_buyers.insert(0, 'rank', range(1, len(top_buyers) + 1))
+
+        result = {
+            'by_crop': by_crop,
+            'by_crop_buyer': by_crop_buyer,
+            'trend': trend,
+            'top_buyers': top_buyers
+        }
+
+    with _lock:
+        _cache['version'] = version
+        _cache['result'] = result
+    return result
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""
+Bank / mobile-money statement reconciliation against expenses.
+
+Statement lines are matched to expense rows on exact amount plus a date
+tolerance. Matching is a hash join on the amount (in kobo) followed by a
+vectorised date-window filter, so thousands of lines reconcile in one
+pass with no pairwise loops. Every line ends up matched, ambiguous (more
+than one possible expense, or an expense claimed by more than one line) or
+unmatched. Lines and expenses with a blank or unreadable amount, and lines
+whose date can't be read, are never matched, so they are listed as
+unmatched.
+"""
+import numpy as np
+import pandas as pd
+
+from data_manager import get_expense_data
+from perf import timed
+from validation import parse_dates
+
+DEFAULT_PAYMENT_METHODS = ["Bank Transfer", "Mobile Money"]
+DEFAULT_TOLERANCE_DAYS = 3
+
+# Header names used by common bank and mobile-money exports
+DATE_COLUMNS = ['date', 'transaction date', 'trans date', 'value date', 'posting date', 'txn date']
+AMOUNT_COLUMNS = ['amount', 'transaction amount', 'value']
+DEBIT_COLUMNS = ['debit', 'debit amount', 'withdrawal', 'withdrawals', 'money out', 'paid out']
+DESCRIPTION_COLUMNS = ['description', 'narration', 'details', 'remarks', 'memo', 'particulars']
+REFERENCE_COLUMNS = ['reference', 'ref', 'reference number', 'transaction id', 'transaction ref']
+
+
+def _find_column(columns, candidates):
+    lookup = {str(column).strip().lower(): column for column in columns}
+    for candidate in candidates:
+        if candidate in lookup:
+            return lookup[candidate]
+    return None
+
+
+def _to_number(values):
+    """Parse amounts like '₦1,200.00' or '(500)'."""
+    text = values.astype(str).str.replace(r'[^\d.\-()]', '', regex=True)
+    negative = text.str.startswith('(') | text.str.startswith('-')
+    numbers = pd.to_numeric(text.str.replace(r'[()\-]', '', regex=True), errors='coerce')
+    return numbers.where(~negative, -numbers)
+
+
+def load_statement(file):
+    """Read a CSV statement into date, amount, description, reference columns.
+
+    Amounts are outgoing payments as positive numbers. With a debit column
+    only debits are kept; with a single signed amount column negative
+    amounts are treated as payments when any exist. ISO dates are read as
+    such, other dates day first; lines whose date can't be read are kept
+    with a blank date.
+    """
+    raw = pd.read_csv(file)
+    date_column = _find_column(raw.columns, DATE_COLUMNS)
+    debit_column = _find_column(raw.columns, DEBIT_COLUMNS)
+    amount_column = _find_column(raw.columns, AMOUNT_COLUMNS)
+    if date_column is None or (debit_column is None and amount_column is None):
+        raise ValueError("Statement needs a date column and an amount or debit column.")
+
+    if debit_column is not None:
+        amounts = _to_number(raw[debit_column])
+    else:
+        amounts = _to_number(raw[amount_column])
+        if (amounts < 0).any():
+            amounts = -amounts
+
+    description_column = _find_column(raw.columns, DESCRIPTION_COLUMNS)
+    reference_column = _find_column(raw.columns, REFERENCE_COLUMNS)
+    statement = pd.DataFrame({
+        'date': parse_dates(raw[date_column], dayfirst=True),
+        'amount': amounts,
+        'description': raw[description_column].astype(str) if description_column is not None else '',
+        'reference': raw[reference_column].astype(str) if reference_column is not None else ''
+    })
+    statement = statement[statement['amount'] > 0]
+    statement.insert(0, 'line', np.arange(1, len(statement) + 1))
+    return statement.reset_index(drop=True)
+
+
+def _amount_key(amounts):
+    """Amounts in kobo, missing where the amount is blank or not a number."""
+    return np.round(pd.to_numeric(amounts, errors='coerce') * 100).astype('Int64')
+
+
+@timed()
+def reconcile(statement, payment_methods=DEFAULT_PAYMENT_METHODS, tolerance_days=DEFAULT_TOLERANCE_DAYS):
+    """Match statement lines to expenses and classify every line.
+
+    Returns a dict of DataFrames: 'matched', 'ambiguous',
+    'unmatched_statement', 'unmatched_expenses' (expenses in the statement
+    period with no statement line), and a 'summary' dict of counts, with
+    'undated' the unmatched lines whose date couldn't be read.
+    """
+    undated = int(statement['date'].isna().sum()) if not statement.empty else 0
+    if undated == len(statement):
+        empty = pd.DataFrame()
+        return {'matched': empty, 'ambiguous': empty, 'unmatched_statement': statement,
+                'unmatched_expenses': empty, 'summary': {'statement_lines': len(statement), 'matched': 0,
+                                                         'ambiguous': 0, 'unmatched': len(statement),
+                                                         'unmatched_expenses': 0, 'undated': undated}}
+
+    tolerance = pd.Timedelta(days=tolerance_days)
+    expenses = get_expense_data(
+        columns=['id', 'date', 'category', 'description', 'amount', 'payment_method'],
+        start=statement['date'].min() - tolerance,
+        end=statement['date'].max() + tolerance
+    )
+    if payment_methods:
+        expenses = expenses[expenses['payment_method'].isin(list(payment_methods))]
+    expenses = expenses.assign(date=pd.to_datetime(expenses['date']))
+
+    statement = statement.assign(amount_key=_amount_key(statement['amount']))
+    expenses = expenses.assign(amount_key=_amount_key(expenses['amount']))
+
+    # Hash join on amount, then keep pairs within the date tolerance
+    pairs = statement.dropna(subset=['amount_key']).merge(
+        expenses.dropna(subset=['amount_key']), on='amount_key', suffixes=('', '_expense')
+    )
+    pairs['date_diff_days'] = (pairs['date_expense'] - pairs['date']).dt.days
+    pairs = pairs[pairs['date_diff_days'].abs() <= tolerance_days]
+
+    line_candidates = pairs.groupby('line')['id'].transform('size')
+    expense_candidates = pairs.groupby('id')['line'].transform('size')
+    unique = (line_candidates == 1) & (expense_candidates == 1)
+
+    matched = pairs[unique][[
+        'line', 'date', 'amount', 'description', 'reference',
+        'id', 'date_expense', 'category', 'description_expense', 'payment_method', 'date_diff_days'
+    ]].rename(columns={'id': 'expense_id'}).sort_values('line').reset_index(drop=True)
+
+    # Ambiguous lines list their candidates, nearest date first as the suggestion
+    ambiguous_pairs = pairs[~unique].assign(abs_diff=lambda df: df['date_diff_days'].abs())
+    ambiguous_pairs = ambiguous_pairs.sort_values(['line', 'abs_diff', 'id'])
+    ambiguous = ambiguous_pairs.groupby('line').agg(
+        date=('date', 'first'),
+        amount=('amount', 'first'),
+        description=('description', 'first'),
+        reference=('reference', 'first'),
+        candidate_expense_ids=('id', lambda ids: ', '.join(str(i) for i in ids)),
+        suggested_expense_id=('id', 'first')
+    ).reset_index()
+
+    paired_lines = pairs['line'].unique()
+    unmatched_statement = statement[~statement['line'].isin(paired_lines)].drop(columns='amount_key')
+
+    statement_start = statement['date'].min()
+    statement_end = statement['date'].max()
+    unmatched_expenses = expenses[
+        ~expenses['id'].isin(pairs['id'])
+        & (expenses['date'] >= statement_start)
+        & (expenses['date'] <= statement_end)
+    ].drop(columns='amount_key')
+
+    summary = {
+        'statement_lines': len(statement),
+        'matched': len(matched),
+        'ambiguous': len(ambiguous),
+        'unmatched': len(unmatched_statement),
+        'unmatched_expenses': len(unmatched_expenses),
+        'undated': undated
+    }
+    return {
+        'matched': matched,
+        'ambiguous': ambiguous,
+        'unmatched_statement': unmatched_statement.reset_index(drop=True),
+        'unmatched_expenses': unmatched_expenses.reset_index(drop=True),
+        'summary': summary
+    }
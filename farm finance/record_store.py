@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+Process-wide in-memory store of the data tables shared by every session.
+
+Streamlit runs every browser session in the same process, so one parsed
+copy of each table serves them all. Readers get a shallow copy of the
+stored DataFrame: with copy-on-write, always on from pandas 3 (hence the
+pandas>=3.0 requirement), it shares memory with the store but any change a
+page makes to it copies first, so the store is never modified by readers. Writes from data_manager are applied in place through
+its write listener when the table was loaded from the file as it was just
+before that write; otherwise, and for changes made by other processes (the
+API server, a sync import), the table is reloaded from the file. Every change bumps a
+counter that sessions poll to refresh their views.
+"""
+import threading
+
+import pandas as pd
+
+# How often open dashboards check the store for changes
+POLL_SECONDS = 5
+
+
+class RecordStore:
+    """One authoritative DataFrame per record type, loaded on first use."""
+
+    def __init__(self, load, version):
+        # load(file_type) reads a whole table; version(file_type) fingerprints its file
+        self._load = load
+        self._version = version
+        self._tables = {}
+        self._versions = {}
+        self._changes = 0
+        self._lock = threading.RLock()
+        self._changed = threading.Condition(self._lock)
+
+    @property
+    def changes(self):
+        """Counter bumped on every change to any table."""
+        return self._changes
+
+    def get(self, file_type):
+        """Return a read-only view of a table, reloading it if its file changed."""
+        version = self._version(file_type)
+        with self._lock:
+            if file_type not in self._tables or self._versions.get(file_type) != version:
+                reload = file_type in self._tables
+                self._tables[file_type] = self._load(file_type)
+                # Written to while loading: the table may or may not contain that write
+                self._versions[file_type] = version if self._version(file_type) == version else None
+                if reload:
+                    self._notify()
+            return self._tables[file_type].copy(deep=False)
+
+    def refresh(self):
+        """Reload the loaded tables whose files were changed by another process."""
+        for file_type in list(self._tables):
+            self.get(file_type)
+        return self._changes
+
+    def apply_write(self, file_type, action, records, versions):
+        """Write listener: apply committed adds/deletes to the stored table in place.
+
+        Only a table loaded at the version just before the write is patched;
+        any other is dropped and reloaded from the file on next use.
+        """
+        before, after = versions
+        with self._lock:
+            df = self._tables.get(file_type)
+            if df is None:
+                return
+            if self._versions.get(file_type) != before:
+                del self._tables[file_type]
+                self._versions.pop(file_type, None)
+                self._notify()
+                return
+            if action == 'add':
+                # Empty strings read back from the CSV as missing values
+                records = records.reindex(columns=df.columns).replace('', float('nan'))
+                # An empty table read from a header-only file has no useful dtypes
+                df = pd.concat([df, records], ignore_index=True) if not df.empty else records.reset_index(drop=True)
+            elif action == 'delete':
+                df = df[~df['id'].isin(records['id'])].reset_index(drop=True)
+            self._tables[file_type] = df
+            self._versions[file_type] = after
+            self._notify()
+
+    def wait_for_change(self, since, timeout=None):
+        """Block until the change counter moves past since; return the counter."""
+        with self._changed:
+            self._changed.wait_for(lambda: self._changes != since, timeout)
+            return self._changes
+
+    def memory_usage(self):
+        """Bytes held per loaded table."""
+        with self._lock:
+            return {file_type: int(df.memory_usage(deep=True).sum()) for file_type, df in self._tables.items()}
+
+    def _notify(self):
+        self._changes += 1
+        self._changed.notify_all()
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""
+Pre-generated reports for the standard reporting windows.
+
+A background thread keeps the reports for last week, last month, quarter to
+date and year to date ready: the date-filtered records and monthly
+profit/loss the reports page shows. It rebuilds the stale ones after writes
+(debounced, like the dashboard aggregates), when another process changed the
+files and when the date rolls over. Reports are kept in a bounded LRU cache
+and served only while the data version they were built from is still
+current, so the reports page never shows stale numbers. Any window can also
+be built on demand through the same cache. PDF packs are rendered only when
+asked for (see pdf_reports). Failed refreshes are logged and reported by
+get_status().
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+
+from data_manager import (
+    RecordQuery,
+    run_query,
+    calculate_profit_loss,
+    get_data_version,
+    register_write_listener
+)
+from perf import timed
+
+REPORT_FILES = ['expenses', 'inputs', 'outputs']
+REPORT_CACHE_SIZE = 12
+# Also check for changes by other processes and date rollover this often
+REFRESH_SECONDS = 300
+
+logger = logging.getLogger(__name__)
+
+
+def standard_windows(today=None):
+    """Return {name: (start, end)} of the standard reporting windows."""
+    today = today or date.today()
+    this_month = today.replace(day=1)
+    last_month_end = this_month - timedelta(days=1)
+    last_week_start = today - timedelta(days=today.weekday() + 7)
+    quarter_start = date(today.year, 3 * ((today.month - 1) // 3) + 1, 1)
+    return {
+        "Last week": (last_week_start, last_week_start + timedelta(days=6)),
+        "Last month": (last_month_end.replace(day=1), last_month_end),
+        "Quarter to date": (quarter_start, today),
+        "Year to date": (today.replace(month=1, day=1), today)
+    }
+
+
+@timed()
+def build_report(start, end):
+    """Compute the report data for start..end.
+
+    A dict with the 'expenses', 'inputs' and 'outputs' rows in the window,
+    their monthly 'profit_loss' and when it was 'generated'.
+    """
+    expense_df = run_query(RecordQuery('expenses', start=start, end=end, sort=None))
+    input_df = run_query(RecordQuery('inputs', start=start, end=end, sort=None))
+    output_df = run_query(RecordQuery('outputs', start=start, end=end, sort=None))
+    return {
+        'start': start,
+        'end': end,
+        'expenses': expense_df,
+        'inputs': input_df,
+        'outputs': output_df,
+        'profit_loss': calculate_profit_loss(expense_df, output_df),
+        'generated': datetime.now()
+    }
+
+
+class ReportScheduler:
+    """Bounded cache of built reports and the thread that keeps it warm."""
+
+    def __init__(self, debounce_seconds=2.0, cache_size=REPORT_CACHE_SIZE):
+        self.debounce_seconds = debounce_seconds
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._dirty = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.last_success = None
+        self.last_error = None
+        self.last_error_at = None
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='report-scheduler', daemon=True)
+                self._thread.start()
+
+    def request_refresh(self):
+        """Mark the reports stale; the thread rebuilds them once writes go quiet."""
+        self._dirty.set()
+
+    def get_report(self, start, end):
+        """Return the report for start..end, from the cache if its data is unchanged."""
+        key = (start, end)
+        version = get_data_version(REPORT_FILES)
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and entry[0] == version:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        report = build_report(start, end)
+
+        with self._lock:
+            self._cache[key] = (version, report)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return report
+
+    def is_ready(self, start, end):
+        """True if the report for start..end is cached and current."""
+        with self._lock:
+            entry = self._cache.get((start, end))
+        return entry is not None and entry[0] == get_data_version(REPORT_FILES)
+
+    def refresh(self):
+        """Build the standard reports that are missing or stale; return their names."""
+        built = []
+        for name, (start, end) in standard_windows().items():
+            if not self.is_ready(start, end):
+                self.get_report(start, end)
+                built.append(name)
+        return built
+
+    def status(self):
+        """When the reports were last refreshed, and the last refresh error with its time."""
+        return {'last_success': self.last_success, 'last_error': self.last_error,
+                'last_error_at': self.last_error_at}
+
+    def _run(self):
+        while True:
+            try:
+                self.refresh()
+                self.last_success = datetime.now()
+            except Exception as exc:
+                logger.exception("Standard report refresh failed")
+                self.last_error, self.last_error_at = repr(exc), datetime.now()
+            # Woken early by local writes; the timeout covers other processes and midnight
+            self._dirty.wait(REFRESH_SECONDS)
+            # Debounce: keep waiting while writes are still arriving
+            while self._dirty.is_set():
+                self._dirty.clear()
+                time.sleep(self.debounce_seconds)
+
+
+_scheduler = ReportScheduler()
+
+
+def _on_write(file_type, action, records, versions):
+    if file_type in REPORT_FILES:
+        _scheduler.request_refresh()
+
+
+register_write_listener(_on_write)
+
+
+def start_scheduler():
+    """Start pre-generating the standard reports in this process (idempotent)."""
+    _scheduler.start()
+
+
+def get_standard_report(name):
+    """Return the current report for one of the standard_windows() by name.
+
+    Served from the scheduler's cache when it is ready, built now otherwise.
+    The DataFrames are shared and must not be modified in place.
+    """
+    start, end = standard_windows()[name]
+    return _scheduler.get_report(start, end)
+
+
+def get_status():
+    """Return the scheduler's last_success, last_error and last_error_at."""
+    return _scheduler.status()
+
+
+def is_report_ready(name):
+    """True if the named standard report can be served without building it."""
+    start, end = standard_windows()[name]
+    return _scheduler.is_ready(start, end)
@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+"""
+Delta sync between offline field devices and the central store.
+
+Each instance keeps its own data directory (FARM_DATA_DIR) and device ID.
+Changes are the journal events (see journal) after the last sequence number
+a peer has acknowledged. They are written to a small gzip JSON bundle that is
+carried over by USB stick, email or any other way, then imported on the other
+side. Every bundle also carries how far its sender has received the other
+side's changes, and only that acknowledgement moves the export position on:
+a bundle that is lost on the way is simply sent again with the next export.
+Records are matched by their global ID (gid), never by the local numeric ID,
+which differs between devices. Records are only ever added or deleted, so the
+only conflict is an add against a delete of the same gid. Deletes win,
+through the tombstone list. Importing the same bundle twice is harmless.
+
+    python sync.py id
+    python sync.py export field_to_central.json.gz --peer <central device id>
+    python sync.py import field_to_central.json.gz
+
+Run from the "farm finance" directory with FARM_DATA_DIR set to the
+instance's data directory.
+"""
+import argparse
+import gzip
+import json
+import os
+import socket
+from datetime import datetime
+
+import journal
+from data_manager import (
+    DATA_FILES,
+    add_synced_records,
+    delete_records_by_gid,
+    get_tombstones,
+    load_table
+)
+from utils import generate_gid, get_data_dir
+from validation import validate_records
+
+DEVICE_FILE = os.path.join(get_data_dir(), 'device.json')
+SYNC_STATE_FILE = os.path.join(get_data_dir(), 'sync_state.json')
+BUNDLE_FORMAT = 1
+
+
+def _write_json(path, payload):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def get_device():
+    """Return this instance's {'device_id', 'name'}, creating it on first use."""
+    try:
+        with open(DEVICE_FILE, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        device = {'device_id': generate_gid(), 'name': socket.gethostname()}
+        _write_json(DEVICE_FILE, device)
+        return device
+
+
+def get_sync_state():
+    """Return {peer device id: {'sent': {'seq', 'offset'}, 'received_seq', ...}}.
+
+    sent is the journal position the peer has acknowledged, exported the
+    positions of the bundles written since, and received_seq how far this
+    device has imported the peer's own changes.
+    """
+    try:
+        with open(SYNC_STATE_FILE, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _bundle_event(entry, device_id):
+    """Strip a journal entry to what a peer needs: full rows for adds, gids for deletes."""
+    records = [record for record in entry['records'] if record.get('gid')]
+    if entry['action'] == 'delete':
+        records = [{'gid': record['gid']} for record in records]
+    return {
+        'file': entry['file'],
+        'action': entry['action'],
+        'origin': entry.get('origin') or device_id,
+        'ts': entry['ts'],
+        'records': records
+    }
+
+
+def _full_events(device_id):
+    """Every current row as an add plus every tombstone as a delete, for a first sync."""
+    ts = datetime.now().isoformat(timespec='seconds')
+    events = []
+    for file_type in DATA_FILES:
+        df = load_table(file_type)
+        rows = json.loads(df.to_json(orient='records', date_format='iso', default_handler=str))
+        events.append({'file': file_type, 'action': 'add', 'origin': device_id, 'ts': ts, 'records': rows})
+        gids = sorted(get_tombstones(file_type))
+        if gids:
+            events.append({'file': file_type, 'action': 'delete', 'origin': device_id, 'ts': ts,
+                           'records': [{'gid': gid} for gid in gids]})
+    return events
+
+
+def export_bundle(path, peer, full=False):
+    """Write the changes peer has not acknowledged yet to a bundle at path.
+
+    Until peer acknowledges a first bundle, or with full=True, every current
+    record is sent instead, which also covers rows written before the
+    journal. Returns the number of events written.
+    """
+    device_id = get_device()['device_id']
+    with journal.lock:
+        state = get_sync_state()
+        peer_state = state.setdefault(peer, {})
+        sent = peer_state.get('sent')
+        position = journal.read_checkpoint()
+        if full or sent is None:
+            from_seq = 0
+            events = _full_events(device_id)
+        else:
+            from_seq = sent['seq']
+            events = [
+                _bundle_event(entry, device_id)
+                for entry, _ in journal.read_entries(sent['offset'])
+                if from_seq < entry['seq'] <= position['seq'] and entry.get('origin') != peer
+            ]
+
+        bundle = {
+            'format': BUNDLE_FORMAT,
+            'device_id': device_id,
+            'peer': peer,
+            'from_seq': from_seq,
+            'to_seq': position['seq'],
+            'ack_seq': peer_state.get('received_seq', 0),
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'events': events
+        }
+        with gzip.open(path, 'wt', encoding='utf-8') as f:
+            json.dump(bundle, f)
+
+        # Sent for good only once the peer acknowledges it (see import_bundle)
+        exported = peer_state.setdefault('exported', [])
+        if all(item['seq'] != position['seq'] for item in exported):
+            exported.append({'seq': position['seq'], 'offset': position['offset']})
+        _write_json(SYNC_STATE_FILE, state)
+    return len(events)
+
+
+def import_bundle(path):
+    """Apply a bundle exported by another device.
+
+    Deletes are applied first and tombstoned, so an add and a delete of the
+    same record in any order leave it deleted. Changes that started on this
+    device are skipped. Added records failing validation are still applied,
+    so every device keeps the same books, and counted as invalid to be
+    corrected where they were entered. The bundle's ack_seq moves the export
+    position for its sender on to the last bundle it has imported from here.
+    Returns a summary dict of counts.
+    """
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        bundle = json.load(f)
+    if bundle.get('format') != BUNDLE_FORMAT:
+        raise ValueError(f"Unsupported bundle format {bundle.get('format')}.")
+
+    device_id = get_device()['device_id']
+    source = bundle['device_id']
+    if source == device_id:
+        raise ValueError("This bundle was exported by this device.")
+
+    # One write per record type, action and origin
+    adds, deletes = {}, {}
+    skipped = 0
+    for event in bundle['events']:
+        if event['origin'] == device_id:
+            skipped += len(event['records'])
+            continue
+        target = adds if event['action'] == 'add' else deletes
+        target.setdefault((event['file'], event['origin']), []).extend(event['records'])
+
+    summary = {'source': source, 'deleted': 0, 'added': 0, 'skipped': skipped, 'invalid': 0}
+    for (file_type, origin), records in deletes.items():
+        if file_type in DATA_FILES:
+            summary['deleted'] += delete_records_by_gid(file_type, [r['gid'] for r in records], origin)
+    for (file_type, origin), records in adds.items():
+        if file_type in DATA_FILES:
+            summary['invalid'] += validate_records(file_type, records)['row'].nunique()
+            summary['added'] += add_synced_records(file_type, records, origin)
+
+    with journal.lock:
+        state = get_sync_state()
+        peer_state = state.setdefault(source, {})
+        peer_state['received_seq'] = max(peer_state.get('received_seq', 0), bundle['to_seq'])
+        peer_state['last_import'] = datetime.now().isoformat(timespec='seconds')
+
+        acked = bundle.get('ack_seq', 0)
+        exported = peer_state.get('exported', [])
+        confirmed = [item for item in exported if item['seq'] <= acked]
+        if confirmed:
+            peer_state['sent'] = max(confirmed, key=lambda item: item['seq'])
+            peer_state['exported'] = [item for item in exported if item['seq'] > acked]
+        _write_json(SYNC_STATE_FILE, state)
+    summary['acknowledged_seq'] = peer_state.get('sent', {}).get('seq')
+    return summary
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Delta sync between farm finance instances")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('id', help="print this device's ID")
+    export_parser = commands.add_parser('export', help="write changes for a peer to a bundle")
+    export_parser.add_argument('path')
+    export_parser.add_argument('--peer', required=True, help="device ID of the receiving instance")
+    export_parser.add_argument('--full', action='store_true', help="send every record, not only changes")
+    import_parser = commands.add_parser('import', help="apply a bundle from another device")
+    import_parser.add_argument('path')
+    args = parser.parse_args()
+
+    if args.command == 'id':
+        print(get_device()['device_id'])
+    elif args.command == 'export':
+        print(f"{export_bundle(args.path, args.peer, args.full)} events written to {args.path}")
+    else:
+        print(json.dumps(import_bundle(args.path)))
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+"""
+Shared test setup.
+
+The data file paths are fixed when the modules are imported, so the scratch
+data directory is set here, before any test imports them. The fresh_data
+fixture empties it for tests that write records.
+"""
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+DATA_DIR = tempfile.mkdtemp(prefix='farm-finance-tests-')
+os.environ['FARM_DATA_DIR'] = DATA_DIR
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def fresh_data():
+    """Empty data files, journal and snapshots for one test."""
+    from utils import ensure_data_files_exist
+
+    for name in os.listdir(DATA_DIR):
+        path = os.path.join(DATA_DIR, name)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+    ensure_data_files_exist()
+    return DATA_DIR
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+import logging
+import time
+
+import aggregates
+from data_manager import add_expense_record
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.02)
+    return condition()
+
+
+def test_snapshot_totals(fresh_data):
+    add_expense_record('2026-01-05', 'Seeds', 'Seed', 1200.0, 'Cash', '')
+    snapshot = aggregates.compute_dashboard_snapshot()
+    assert snapshot['periods']['All time']['total_expenses'] == 1200.0
+    assert snapshot['expense_summary']['category'].tolist() == ['Seeds']
+
+
+def test_failed_refresh_is_logged_and_reported(fresh_data, monkeypatch, caplog):
+    worker = aggregates.AggregateWorker(debounce_seconds=0.01)
+    first = worker.get_snapshot()
+    assert worker.status()['last_success'] == first['computed_at']
+
+    def fail():
+        raise RuntimeError('broken table')
+
+    monkeypatch.setattr(aggregates, 'compute_dashboard_snapshot', fail)
+    with caplog.at_level(logging.ERROR, logger='aggregates'):
+        worker.request_refresh()
+        assert wait_for(lambda: worker.status()['last_error'] is not None)
+    assert 'broken table' in worker.status()['last_error']
+    assert "Dashboard aggregates refresh failed" in caplog.text
+    assert worker.status()['last_success'] == first['computed_at']
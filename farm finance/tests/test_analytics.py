@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+import os
+import subprocess
+import sys
+
+import pandas as pd
+import pytest
+
+import analytics
+from data_manager import add_expense_record, add_expense_records, add_output_record, delete_record
+
+
+def seed():
+    add_expense_records([
+        {'date': '2025-01-10', 'category': 'Seeds', 'description': 'Seed', 'amount': 100.0},
+        {'date': '2025-03-10', 'category': 'Petrol', 'description': 'Petrol', 'amount': 50.0},
+        {'date': '2026-01-10', 'category': 'Seeds', 'description': 'Seed', 'amount': 150.0},
+        {'date': '2026-02-10', 'category': 'Petrol', 'description': 'Petrol', 'amount': 80.0}
+    ])
+
+
+def test_rollup_follows_writes(fresh_data):
+    seed()
+    wide = analytics.get_monthly_rollup('expenses')
+    assert len(wide) == 14
+    assert wide.loc['2025-02-01'].sum() == 0
+
+    add_expense_record('2026-02-20', 'Seeds', 'More seed', 20.0, 'Cash', '')
+    assert delete_record('expenses', 1)
+    wide = analytics.get_monthly_rollup('expenses')
+    assert wide.index.min() == pd.Timestamp('2025-03-01')
+    assert wide.loc['2026-02-01'].to_dict() == {'Petrol': 80.0, 'Seeds': 20.0}
+    pd.testing.assert_frame_equal(wide, analytics._build_rollup('expenses')['series']
+                                  .unstack('category', fill_value=0.0).sort_index()
+                                  .reindex(wide.index, fill_value=0.0).rename_axis('month'),
+                                  check_freq=False)
+
+
+def test_rollup_rebuilds_after_a_write_elsewhere(fresh_data):
+    seed()
+    analytics.get_monthly_rollup('expenses')
+    code_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, '-c', "from data_manager import add_expense_record\n"
+                    "add_expense_record('2026-02-11', 'Seeds', 'Seed', 5.0, 'Cash', '')"],
+                   cwd=code_dir, env=dict(os.environ, FARM_DATA_DIR=fresh_data), check=True, timeout=120)
+    add_expense_record('2026-02-12', 'Seeds', 'Seed', 7.0, 'Cash', '')
+    assert analytics.get_monthly_rollup('expenses').loc['2026-02-01', 'Seeds'] == 12.0
+
+
+def test_year_comparisons(fresh_data):
+    seed()
+    ytd = analytics.ytd_comparison('expenses', as_of='2026-02-15').set_index('category')
+    assert ytd.loc['Seeds', ['ytd', 'prior_ytd']].tolist() == [150.0, 100.0]
+    assert ytd.loc['Seeds', 'change_pct'] == pytest.approx(50.0)
+    assert ytd.loc['Petrol', 'prior_ytd'] == 0 and pd.isna(ytd.loc['Petrol', 'change_pct'])
+
+    same = analytics.same_month_last_year('expenses', '2026-01').set_index('category')
+    assert same.loc['Seeds', ['this_year', 'last_year']].tolist() == [150.0, 100.0]
+
+    by_month = analytics.year_over_year_by_month('expenses')
+    assert by_month['month'].min() == pd.Timestamp('2026-01-01')
+
+
+def test_rolling_profit(fresh_data):
+    seed()
+    add_output_record('2026-02-20', 'Maize', 10, 'bags', 500.0, 'Market', '')
+    profit = analytics.rolling_profit().set_index('month')
+    assert profit.loc['2026-02-01', 'profit_loss'] == 420.0
+    assert profit.loc['2026-02-01', 'profit_3m'] == 270.0
+    assert profit.loc['2026-02-01', 'margin_3m'] == pytest.approx(54.0)
+    totals = analytics.rolling_totals('expenses').set_index('month')
+    assert totals.loc['2026-02-01', 'rolling_12m'] == 280.0
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import json
+
+import pytest
+
+import api_server
+from api_server import DataService, RequestError, handle_connection, handle_request
+from data_manager import get_expense_data
+
+
+def expense(n):
+    return {'date': f'2026-01-{n:02d}', 'category': 'Seeds', 'description': f'Seed {n}', 'amount': 100.0 + n}
+
+
+async def with_service(test):
+    service = DataService()
+    service.start()
+    try:
+        return await test(service)
+    finally:
+        await service.stop()
+
+
+def test_concurrent_posts_are_group_committed(fresh_data):
+    async def post_many(service):
+        body = lambda n: json.dumps(expense(n)).encode()
+        return await asyncio.gather(*[handle_request(service, 'POST', '/expenses', body(n)) for n in range(1, 21)])
+
+    results = asyncio.run(with_service(post_many))
+    ids = [payload['expenses'][0] for status, payload in results]
+    assert all(status == 201 for status, _ in results)
+    assert sorted(ids) == list(range(1, 21))
+    assert len(get_expense_data()) == 20
+
+
+def test_invalid_records_are_rejected_with_row_errors(fresh_data):
+    async def post_invalid(service):
+        body = json.dumps([expense(1), dict(expense(2), amount=-5)]).encode()
+        return await handle_request(service, 'POST', '/expenses', body)
+
+    with pytest.raises(RequestError) as raised:
+        asyncio.run(with_service(post_invalid))
+    assert raised.value.status == 400
+    assert raised.value.errors == [{'record': 1, 'field': 'amount', 'value': '-5.0', 'error': 'must not be negative'}]
+    assert get_expense_data().empty
+
+
+def test_http_round_trip(fresh_data):
+    async def exchange(service):
+        server = await asyncio.start_server(lambda r, w: handle_connection(service, r, w), '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            body = json.dumps({'expenses': [expense(3)]}).encode()
+            writer.write(b"POST /batch HTTP/1.1\r\nContent-Length: %d\r\n\r\n" % len(body) + body)
+            writer.write(b"DELETE /expenses/1 HTTP/1.1\r\nConnection: close\r\n\r\n")
+            await writer.drain()
+            response = await reader.read()
+            writer.close()
+        return response.decode()
+
+    response = asyncio.run(with_service(exchange))
+    assert response.startswith('HTTP/1.1 201')
+    assert '{"expenses": [1]}' in response
+    assert '{"deleted": 1}' in response
+    assert get_expense_data().empty
+
+
+def test_failed_request_does_not_fail_its_group(fresh_data, monkeypatch):
+    add_expenses = api_server.ADD_FUNCTIONS['expenses']
+
+    def add(records):
+        if any(record['description'] == 'Bad' for record in records):
+            raise ValueError('bad record')
+        return add_expenses(records)
+
+    monkeypatch.setitem(api_server.ADD_FUNCTIONS, 'expenses', add)
+
+    async def add_three(service):
+        return await asyncio.gather(
+            service.add('expenses', [expense(1)]),
+            service.add('expenses', [dict(expense(2), description='Bad')]),
+            service.add('expenses', [expense(3)]),
+            return_exceptions=True
+        )
+
+    first, bad, third = asyncio.run(with_service(add_three))
+    assert isinstance(bad, ValueError)
+    assert first + third == [1, 2]
+    assert get_expense_data()['description'].tolist() == ['Seed 1', 'Seed 3']
+
+
+def test_negative_content_length_is_rejected(fresh_data):
+    async def exchange(service):
+        server = await asyncio.start_server(lambda r, w: handle_connection(service, r, w), '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(b"POST /expenses HTTP/1.1\r\nContent-Length: -5\r\n\r\n")
+            await writer.drain()
+            response = await reader.read()
+            writer.close()
+        return response.decode()
+
+    response = asyncio.run(with_service(exchange))
+    assert response.startswith('HTTP/1.1 400')
+    assert 'Connection: close' in response
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+import os
+import subprocess
+import sys
+
+import pandas as pd
+import pytest
+
+import budgets
+from data_manager import add_expense_records
+
+
+def test_seasons_span_the_new_year():
+    assert budgets.season_label('2026-02-10') == 'Dry Season 2025'
+    assert budgets.season_label('2026-04-01') == 'Rainy Season 2026'
+    months = budgets.period_months('Dry Season 2025')
+    assert months[0] == pd.Timestamp('2025-11-01') and months[-1] == pd.Timestamp('2026-03-01')
+    assert budgets.period_months('2026-02').tolist() == [pd.Timestamp('2026-02-01')]
+
+
+def test_season_budgets_are_spread_over_their_months(fresh_data):
+    budgets.set_budget('Seeds', 'Dry Season 2025', 400.0)
+    budgets.set_budget('Seeds', 'Dry Season 2025', 500.0)
+    budgets.set_budget('Petrol', '2025-12', 300.0)
+    table = budgets.get_monthly_budget_table()
+    assert table['Seeds'].tolist() == [100.0] * 5
+    assert table.loc['2025-12-01', 'Petrol'] == 300.0
+
+    budgets.delete_budget('Petrol', '2025-12')
+    assert list(budgets.get_monthly_budget_table().columns) == ['Seeds']
+
+
+def test_budget_vs_actual_projects_the_burn_rate(fresh_data):
+    budgets.set_budget('Seeds', 'Dry Season 2025', 500.0)
+    add_expense_records([
+        {'date': '2025-11-10', 'category': 'Seeds', 'description': 'Seed', 'amount': 150.0},
+        {'date': '2025-12-10', 'category': 'Seeds', 'description': 'Seed', 'amount': 100.0},
+        {'date': '2025-12-12', 'category': 'Petrol', 'description': 'Petrol', 'amount': 60.0},
+        {'date': '2026-04-12', 'category': 'Seeds', 'description': 'Seed', 'amount': 999.0}
+    ])
+    result = budgets.budget_vs_actual(budgets.period_months('Dry Season 2025'), today='2026-01-15')
+    seeds = result.set_index('category').loc['Seeds']
+    assert seeds['actual'] == 250.0 and seeds['variance'] == -250.0
+    assert seeds['budget_used_pct'] == pytest.approx(50.0)
+    # 76 of the season's 151 days have passed
+    assert seeds['projected'] == pytest.approx(250.0 * 151 / 76)
+    petrol = result.set_index('category').loc['Petrol']
+    assert petrol['budget'] == 0 and pd.isna(petrol['variance_pct'])
+
+
+def test_processes_setting_budgets_at_once_keep_every_budget(fresh_data):
+    script = ("import budgets\n"
+              "for month in range(1, 13):\n"
+              "    budgets.set_budget(category, f'2026-{month:02d}', 1000.0)\n")
+    code_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    writers = [subprocess.Popen([sys.executable, '-c', f"category = 'Category {w}'\n" + script], cwd=code_dir,
+                                env=dict(os.environ, FARM_DATA_DIR=fresh_data)) for w in range(3)]
+    assert all(writer.wait(timeout=120) == 0 for writer in writers)
+    assert len(budgets.get_budget_data()) == 36
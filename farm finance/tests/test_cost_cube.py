@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+import pandas as pd
+
+import cost_cube
+from data_manager import add_expense_record, add_expense_records, add_output_record, delete_record
+
+
+def seed():
+    add_expense_records([
+        {'date': '2026-01-05', 'category': 'Seeds', 'description': 'Seed', 'amount': 100.0,
+         'plot': 'North', 'crop_cycle': 'Dry Season 2025', 'crop_type': 'Maize'},
+        {'date': '2026-01-06', 'category': 'Petrol', 'description': 'Petrol', 'amount': 40.0,
+         'plot': 'North', 'crop_cycle': 'Dry Season 2025'},
+        {'date': '2026-02-06', 'category': 'Seeds', 'description': 'Seed', 'amount': 60.0, 'plot': ' South '}
+    ])
+    add_output_record('2026-02-20', 'Maize', 2, 'bags', 500.0, 'Market', '', plot='North',
+                      crop_cycle='Dry Season 2025')
+
+
+def test_slices_and_rollups(fresh_data):
+    seed()
+    by_plot = cost_cube.slice_cube(['plot']).set_index('plot')
+    assert by_plot.loc['North', ['cost', 'sales', 'profit', 'records']].tolist() == [140.0, 500.0, 360.0, 3]
+    assert by_plot.loc['South', 'cost'] == 60.0
+
+    north = cost_cube.slice_cube(['crop_type'], filters={'plot': 'North'}).set_index('crop_type')
+    assert north.loc['Unassigned', 'cost'] == 40.0
+    assert north.loc['Maize', ['cost', 'sales']].tolist() == [100.0, 500.0]
+
+    months = cost_cube.slice_cube(['month'], start_month='2026-02')
+    assert months[['month', 'cost', 'sales']].values.tolist() == [['2026-02', 60.0, 500.0]]
+    assert cost_cube.slice_cube([])['profit'].tolist() == [300.0]
+
+
+def test_writes_keep_the_cube_equal_to_a_rebuild(fresh_data):
+    seed()
+    cost_cube.get_cube()
+    add_expense_record('2026-02-07', 'Seeds', 'More seed', 15.0, 'Cash', '', plot='South')
+    assert delete_record('expenses', 2)
+    cube = cost_cube.get_cube()
+    cost_cube._cells.clear()
+    rebuilt = cost_cube.get_cube()
+    columns = cost_cube.DIMENSIONS + cost_cube.MEASURES
+    pd.testing.assert_frame_equal(cube.sort_values(cost_cube.DIMENSIONS)[columns].reset_index(drop=True),
+                                  rebuilt.sort_values(cost_cube.DIMENSIONS)[columns].reset_index(drop=True),
+                                  check_dtype=False)
+    assert 'Petrol' not in set(cube['category'])
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from crop_profitability import crop_margins, crop_summary
+from data_manager import add_expense_records, add_output_records
+
+
+@pytest.fixture
+def books(fresh_data):
+    add_expense_records([
+        {'date': '2026-01-05', 'category': 'Seeds', 'description': 'Maize seed', 'amount': 100.0,
+         'crop_type': 'Maize'},
+        {'date': '2026-01-06', 'category': 'Seeds', 'description': 'Rice seed', 'amount': 50.0,
+         'crop_type': 'Rice'},
+        {'date': '2026-01-07', 'category': 'Salaries', 'description': 'Wages', 'amount': 300.0},
+        {'date': '2026-02-07', 'category': 'Petrol', 'description': 'Petrol', 'amount': 60.0}
+    ])
+    add_output_records([
+        {'date': '2026-02-10', 'crop_type': 'Maize', 'quantity': 3, 'unit': 'bags', 'sales_amount': 3000.0},
+        {'date': '2026-02-11', 'crop_type': 'Rice', 'quantity': 2, 'unit': 'bags', 'sales_amount': 1000.0}
+    ])
+
+
+def test_shared_costs_follow_revenue(books):
+    summary = crop_summary().set_index('crop')
+    # A quarter of the sales, so a quarter of the 360 shared cost
+    assert summary.loc['Rice', 'allocated_cost'] == pytest.approx(90.0)
+    assert summary.loc['Maize', ['direct_cost', 'allocated_cost', 'margin']].tolist() == pytest.approx(
+        [100.0, 270.0, 2630.0])
+    assert summary.loc['Maize', 'cost_per_unit'] == pytest.approx(370.0 / 300)
+    assert summary['total_cost'].sum() == pytest.approx(510.0)
+
+    # January's shared cost is spread although January had no sales
+    margins = crop_margins().set_index(['month', 'crop'])
+    assert margins.loc[('2026-01-01', 'Maize'), 'allocated_cost'] == pytest.approx(225.0)
+    assert margins.loc[('2026-01-01', 'Maize'), 'margin'] == pytest.approx(-325.0)
+
+
+def test_area_and_direct_rules(books):
+    by_area = crop_summary(rule='area', areas={'Maize': 1.0, 'Rice': 3.0}).set_index('crop')
+    assert by_area.loc['Maize', 'allocated_cost'] == pytest.approx(90.0)
+
+    direct = crop_summary(rule='direct').set_index('crop')
+    assert direct.loc['Unallocated', 'total_cost'] == pytest.approx(360.0)
+    assert direct.loc['Maize', 'allocated_cost'] == 0.0
+
+    with pytest.raises(ValueError):
+        crop_margins(rule='weight')
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+import os
+import subprocess
+import sys
+
+import pandas as pd
+
+from data_manager import (
+    add_expense_record,
+    add_expense_records,
+    delete_record,
+    find_duplicates,
+    get_expense_data,
+    record_hashes
+)
+
+
+def expense(description='Maize seed', amount=1200.0, date='2026-01-05'):
+    return {'date': date, 'category': 'Seeds', 'description': description, 'amount': amount}
+
+
+def test_hashes_ignore_case_spacing_and_time():
+    rows = pd.DataFrame([expense(), expense(' MAIZE   seed', 1200.004, '2026-01-05 08:30:00'),
+                         expense(amount=1200.5)])
+    hashes = record_hashes('expenses', rows)
+    assert hashes[0] == hashes[1]
+    assert hashes[0] != hashes[2]
+
+
+def test_identical_records_are_skipped(fresh_data):
+    assert add_expense_record('2026-01-05', 'Seeds', 'Maize seed', 1200.0, 'Cash', '')
+    assert not add_expense_record('2026-01-05', 'Seeds', 'maize seed', 1200.0, 'Cash', '')
+    assert add_expense_record('2026-01-05', 'Seeds', 'Maize seed', 1200.0, 'Cash', '', allow_duplicate=True)
+    # Within one batch the first copy is kept
+    assert add_expense_records([expense('Fuel'), expense('Fuel')]) == [3, None]
+    assert len(get_expense_data()) == 3
+
+
+def test_deleted_record_can_be_entered_again(fresh_data):
+    add_expense_record('2026-01-05', 'Seeds', 'Maize seed', 1200.0, 'Cash', '')
+    assert delete_record('expenses', 1)
+    assert add_expense_record('2026-01-05', 'Seeds', 'Maize seed', 1200.0, 'Cash', '')
+
+
+def test_index_sees_writes_from_other_processes(fresh_data):
+    add_expense_record('2026-01-05', 'Seeds', 'Maize seed', 1200.0, 'Cash', '')
+    code_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, '-c', "from data_manager import add_expense_record\n"
+                    "add_expense_record('2026-01-06', 'Seeds', 'Fuel', 500.0, 'Cash', '')"],
+                   cwd=code_dir, env=dict(os.environ, FARM_DATA_DIR=fresh_data), check=True, timeout=120)
+    assert not add_expense_record('2026-01-06', 'Seeds', 'Fuel', 500.0, 'Cash', '')
+
+
+def test_find_duplicates_groups_identical_rows(fresh_data):
+    add_expense_records([expense(), expense('Fuel'), expense(' maize seed ')], skip_duplicates=False)
+    duplicates = find_duplicates('expenses')
+    assert duplicates[['id', 'duplicate_group']].values.tolist() == [[1, 1], [3, 1]]
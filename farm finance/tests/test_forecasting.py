@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+import pandas as pd
+import pytest
+
+from data_manager import add_expense_record, add_output_record
+from forecasting import get_cash_flow_forecast
+
+
+def month_start(months_ago):
+    return pd.Timestamp.now().to_period('M').to_timestamp() - pd.DateOffset(months=months_ago)
+
+
+def test_expenses_and_sales_forecast_the_same_months(fresh_data):
+    for months_ago in range(1, 13):
+        date = month_start(months_ago).strftime('%Y-%m-%d')
+        add_expense_record(date, 'Contract Labor', f'Wages {date}', 1000.0, 'Cash', '')
+        # Sales stopped half a year ago
+        if months_ago > 6:
+            add_output_record(date, 'Maize', 10, 'bags', 5000.0, 'Market', '')
+
+    totals = get_cash_flow_forecast(horizon=3)['totals']
+    assert totals['month'].tolist() == list(pd.date_range(month_start(0), periods=3, freq='MS'))
+    # The months without sales pull the level down instead of being skipped
+    assert totals['sales_forecast'].iloc[0] < 5000.0 * 0.5
+    assert totals['expenses_forecast'].iloc[0] == pytest.approx(1000.0)
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime
+
+import pytest
+
+import history
+import journal
+from data_manager import (
+    RecordQuery,
+    add_expense_record,
+    delete_record,
+    get_expense_data,
+    get_input_data,
+    get_output_data
+)
+
+
+@pytest.fixture
+def clock(fresh_data, monkeypatch):
+    """Set the time journal entries are stamped with; history starts on 1 January."""
+    history._write_snapshot(0, 0, '2026-01-01T00:00:00', {'inputs': get_input_data(),
+                                                           'expenses': get_expense_data(),
+                                                           'outputs': get_output_data()})
+    now = {}
+
+    class Clock(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return now['value']
+
+    monkeypatch.setattr(journal, 'datetime', Clock)
+    return lambda value: now.update(value=datetime.fromisoformat(value))
+
+
+def descriptions(as_of):
+    return sorted(history.get_state_as_of(as_of)['expenses']['description'])
+
+
+def test_books_as_they_stood_on_a_day(clock):
+    clock('2026-01-10T09:00:00')
+    add_expense_record('2026-01-10', 'Seeds', 'Seed', 100.0, 'Cash', '')
+    clock('2026-01-20T09:00:00')
+    add_expense_record('2026-01-20', 'Seeds', 'Fuel', 50.0, 'Cash', '')
+    clock('2026-01-25T09:00:00')
+    assert delete_record('expenses', 1)
+
+    assert descriptions('2026-01-09') == []
+    assert descriptions('2026-01-10') == ['Seed']
+    assert descriptions('2026-01-22') == ['Fuel', 'Seed']
+    assert descriptions('2026-01-31') == ['Fuel']
+
+    # A record backdated later does not change what the books said then
+    clock('2026-02-01T09:00:00')
+    add_expense_record('2026-01-15', 'Seeds', 'Late entry', 70.0, 'Cash', '')
+    assert descriptions('2026-01-22') == ['Fuel', 'Seed']
+    late = history.run_query_as_of(RecordQuery('expenses', start='2026-01-01', end='2026-01-31'), '2026-02-01')
+    assert late['description'].tolist() == ['Fuel', 'Late entry']
+
+
+def test_dates_before_history_are_refused(clock):
+    with pytest.raises(ValueError):
+        history.get_state_as_of('2025-12-31')
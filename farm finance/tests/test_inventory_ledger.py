@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+import pandas as pd
+import pytest
+
+import inventory_ledger
+from data_manager import add_input_record
+
+
+def movements(*rows):
+    """Sorted movements of one item from (movement, quantity, total_cost) tuples."""
+    return pd.DataFrame([{
+        'key': 'urea|bags',
+        'date': f'2026-01-{day + 1:02d}',
+        'item': 'Urea',
+        'unit': 'bags',
+        'movement': movement,
+        'ref_id': day + 1,
+        'quantity': quantity if movement == 'receipt' else -quantity,
+        'total_cost': cost
+    } for day, (movement, quantity, cost) in enumerate(rows)])
+
+
+def cost(*rows):
+    ledger = inventory_ledger._cost_movements(movements(*rows))
+    return ledger, inventory_ledger._balances(ledger).iloc[0]
+
+
+def test_fifo_issue_spans_receipts():
+    ledger, balance = cost(('receipt', 10, 1000), ('receipt', 10, 2000), ('issue', 15, 0))
+    assert ledger['fifo_cost'].iloc[2] == pytest.approx(2000)
+    assert balance['on_hand'] == 5
+    assert balance['fifo_value'] == pytest.approx(1000)
+
+
+def test_moving_average_after_stock_runs_out():
+    ledger, balance = cost(('receipt', 10, 10000), ('issue', 10, 0), ('receipt', 10, 30000), ('issue', 5, 0))
+    assert ledger['avg_cost'].iloc[1] == pytest.approx(10000)
+    assert ledger['avg_cost'].iloc[3] == pytest.approx(15000)
+    assert balance['avg_unit_cost'] == pytest.approx(3000)
+    assert balance['avg_value'] == pytest.approx(15000)
+    assert balance['fifo_value'] == pytest.approx(15000)
+
+
+def test_moving_average_reaverages_stock_on_hand():
+    ledger, balance = cost(('receipt', 10, 1000), ('issue', 5, 0), ('receipt', 5, 1000), ('issue', 4, 0))
+    # (5 x 100 + 1000) / 10 = 150 per unit
+    assert ledger['avg_unit_cost'].iloc[2] == pytest.approx(150)
+    assert ledger['avg_cost'].iloc[3] == pytest.approx(600)
+    assert balance['avg_value'] == pytest.approx(900)
+
+
+def test_issue_beyond_stock_is_flagged():
+    ledger, balance = cost(('receipt', 2, 200), ('issue', 3, 0))
+    assert ledger['shortfall'].tolist() == [False, True]
+    assert ledger['fifo_cost'].iloc[1] == pytest.approx(200)
+    assert balance['on_hand'] == -1
+
+
+def test_items_are_costed_independently():
+    first = movements(('receipt', 10, 1000), ('issue', 5, 0))
+    second = movements(('receipt', 4, 800), ('issue', 2, 0)).assign(key='seed|kg', item='Seed', unit='kg')
+    ledger = inventory_ledger._cost_movements(pd.concat([first, second], ignore_index=True))
+    assert ledger['fifo_cost'].tolist() == pytest.approx([1000, 500, 800, 400])
+    assert ledger['avg_cost'].tolist() == pytest.approx([1000, 500, 800, 400])
+
+
+def test_issues_update_cached_balances(fresh_data):
+    add_input_record('2026-01-01', 'Fertilizer', 'Urea', 10, 'bags', 1000.0, '')
+    inventory_ledger.get_stock_levels()
+    inventory_ledger.record_issue('2026-01-02', 'urea ', 'bags', 10)
+    add_input_record('2026-01-03', 'Fertilizer', 'UREA', 10, 'bags', 3000.0, '')
+    issue_id = inventory_ledger.record_issue('2026-01-04', 'Urea', 'bags', 5)
+
+    balance = inventory_ledger.get_stock_levels().set_index('key').loc['urea|bags']
+    assert balance['on_hand'] == 5
+    assert balance['avg_value'] == pytest.approx(15000)
+
+    assert inventory_ledger.delete_issue(issue_id)
+    balance = inventory_ledger.get_stock_levels().set_index('key').loc['urea|bags']
+    assert balance['on_hand'] == 10
+    assert balance['fifo_value'] == pytest.approx(30000)
+
+
+def test_moving_average_is_stable_over_long_histories():
+    # Keep 1 unit on hand, then receive and use 9 units at a time, always at 100 per unit
+    cycles = [('receipt', 10, 1000), ('issue', 9, 0)] + [('receipt', 9, 900), ('issue', 9, 0)] * 1000
+    ledger, balance = cost(*cycles)
+    assert ledger['avg_unit_cost'].to_numpy() == pytest.approx(100)
+    assert balance['avg_unit_cost'] == pytest.approx(100)
+    assert balance['avg_value'] == pytest.approx(100)
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+import os
+import subprocess
+import sys
+
+import pandas as pd
+
+import journal
+from data_manager import (
+    _replay_journal_entry,
+    add_expense_record,
+    apply_journal_entry,
+    delete_record,
+    get_expense_data,
+    get_tombstones
+)
+
+
+def expense(record_id, description):
+    return pd.DataFrame([{'id': record_id, 'date': '2026-01-05', 'category': 'Seeds', 'description': description,
+                          'amount': 100.0, 'payment_method': 'Cash', 'notes': '', 'plot': '', 'crop_cycle': '',
+                          'crop_type': '', 'gid': f'gid-{record_id}'}])
+
+
+def test_writes_are_journaled_and_checkpointed(fresh_data):
+    add_expense_record('2026-01-05', 'Seeds', 'Seed', 100.0, 'Cash', '')
+    assert delete_record('expenses', 1)
+
+    entries = [entry for entry, _ in journal.read_entries()]
+    assert [(entry['seq'], entry['action']) for entry in entries] == [(1, 'add'), (2, 'delete')]
+    assert journal.read_checkpoint()['seq'] == 2
+    assert journal.recover(_replay_journal_entry) == 0
+
+
+def test_recovery_applies_entries_after_the_checkpoint(fresh_data):
+    add_expense_record('2026-01-05', 'Seeds', 'Seed', 100.0, 'Cash', '')
+    # A crash after journaling, before the tables were written
+    journal.append('expenses', 'add', expense(2, 'Fuel'))
+    journal.append('expenses', 'delete', expense(1, 'Seed'))
+    with open(journal.JOURNAL_FILE, 'ab') as f:
+        f.write(b'{"seq": 4, "file": "expenses", "act')
+
+    assert journal.recover(_replay_journal_entry) == 2
+    assert get_expense_data()['description'].tolist() == ['Fuel']
+    assert get_tombstones('expenses') == {'gid-1'}
+    assert journal.read_checkpoint()['seq'] == 3
+    with open(journal.JOURNAL_FILE, 'rb') as f:
+        assert f.read().endswith(b'\n')
+
+    # The torn entry is gone and the next write continues the sequence
+    add_expense_record('2026-01-06', 'Seeds', 'More seed', 50.0, 'Cash', '')
+    assert [entry['seq'] for entry, _ in journal.read_entries()][-1] == 4
+
+
+def test_applying_an_entry_twice_is_harmless():
+    table = expense(1, 'Seed')
+    entry = {'action': 'add', 'records': expense(2, 'Fuel').to_dict('records')}
+    once = apply_journal_entry(table, entry)
+    assert apply_journal_entry(once, entry)['id'].tolist() == [1, 2]
+
+
+def test_processes_writing_at_once_get_distinct_ids(fresh_data):
+    script = ("from data_manager import add_expense_record\n"
+              "for n in range(20):\n"
+              "    add_expense_record('2026-01-05', 'Seeds', f'{name} {n}', 100.0, 'Cash', '')\n")
+    code_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    writers = [subprocess.Popen([sys.executable, '-c', f"name = 'writer {w}'\n" + script], cwd=code_dir,
+                                env=dict(os.environ, FARM_DATA_DIR=fresh_data)) for w in range(3)]
+    assert all(writer.wait(timeout=120) == 0 for writer in writers)
+
+    expenses = get_expense_data()
+    assert len(expenses) == 60
+    assert expenses['id'].is_unique and expenses['gid'].is_unique
+    seqs = [entry['seq'] for entry, _ in journal.read_entries()]
+    assert seqs == list(range(1, 61))
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+import pandas as pd
+import pytest
+
+import data_manager
+from data_manager import get_expense_data, get_output_data
+from load_test import generate_dataset, summarize
+
+
+def test_generated_dataset_loads(fresh_data):
+    generate_dataset(fresh_data, 50)
+    # The script generates before importing data_manager, whose migrations then run on import
+    data_manager._migrate_output_units()
+    data_manager._migrate_global_ids()
+    data_manager._migrate_dimensions()
+    expenses = get_expense_data()
+    outputs = get_output_data()
+    assert len(expenses) == 50
+    assert expenses['id'].tolist() == list(range(1, 51))
+    kg = outputs[(outputs['unit'] == 'kg') & (outputs['normalized_unit'] == 'kg')]
+    assert kg['normalized_quantity'].tolist() == kg['quantity'].tolist()
+
+
+def test_summarize_percentiles():
+    samples = pd.DataFrame({
+        'scenario': ['view'] * 4 + ['submit'] * 2,
+        'step': ['load'] * 4 + ['save'] * 2,
+        'seconds': [0.1, 0.2, 0.3, 0.4, 1.0, None],
+        'error': [False, False, False, False, False, True]
+    })
+    summary = summarize(samples, wall_seconds=2.0)
+    assert summary.loc[('view', 'load'), 'p50_ms'] == pytest.approx(250)
+    assert summary.loc[('view', 'load'), 'reruns_per_s'] == pytest.approx(2)
+    assert summary.loc[('submit', 'save'), 'errors'] == 1
+    assert summary.loc[('all', 'all'), 'reruns'] == 6
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+import data_manager
+from data_manager import _read_table, add_expense_records, load_table
+
+
+def seed_expenses():
+    add_expense_records([
+        {'date': f'2026-01-{day:02d}', 'category': category, 'description': f'{category} {day}',
+         'amount': 100.0 * day}
+        for day in range(1, 21) for category in ('Seeds', 'Petrol')
+    ])
+
+
+def test_filters_are_applied_while_reading(fresh_data, monkeypatch):
+    seed_expenses()
+    monkeypatch.setattr(data_manager, 'READ_CHUNK_ROWS', 7)
+    df = _read_table('expenses', columns=['id', 'amount'], start='2026-01-05', end='2026-01-09',
+                     categories=['Petrol'])
+    assert list(df.columns) == ['id', 'amount']
+    assert df['amount'].tolist() == [500.0, 600.0, 700.0, 800.0, 900.0]
+
+
+def test_store_and_file_reads_agree(fresh_data, monkeypatch):
+    seed_expenses()
+    options = dict(columns=['date', 'category', 'amount'], start='2026-01-18', categories=['Seeds'])
+    from_store = load_table('expenses', **options).reset_index(drop=True)
+    monkeypatch.setattr(data_manager, 'USE_SHARED_STORE', False)
+    from_file = load_table('expenses', **options).reset_index(drop=True)
+    assert from_store.equals(from_file)
+    assert from_file['date'].tolist() == ['2026-01-18', '2026-01-19', '2026-01-20']
+
+
+def test_empty_file_keeps_requested_columns(fresh_data):
+    assert list(_read_table('outputs', columns=['date', 'sales_amount'], start='2026-01-01').columns) == [
+        'date', 'sales_amount']
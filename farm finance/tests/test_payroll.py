@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+import payroll
+from data_manager import delete_record, get_expense_data
+
+
+@pytest.fixture
+def workers(fresh_data):
+    return {
+        'ada': payroll.add_worker('Ada', 'Supervisor', 'Monthly', 50000.0, feeding_allowance=500.0),
+        'bola': payroll.add_worker('Bola', '', 'Daily', 3000.0, feeding_allowance=500.0)
+    }
+
+
+def test_payroll_lines_per_worker_and_category(workers):
+    lines = payroll.payroll_lines('2026-01', {workers['bola']: 20}, default_days=22)
+    amounts = lines.set_index(['name', 'category'])['amount']
+    assert amounts[('Ada', 'Salaries')] == pytest.approx(50000)
+    assert amounts[('Ada', 'Worker Feeding')] == pytest.approx(11000)
+    assert amounts[('Bola', 'Contract Labor')] == pytest.approx(60000)
+    assert amounts[('Bola', 'Worker Feeding')] == pytest.approx(10000)
+
+
+def test_run_pays_each_worker_once_per_period(workers):
+    result = payroll.run_payroll('2026-01', '2026-02-01')
+    assert result['added'] == 4
+    assert result['total'] == pytest.approx(50000 + 11000 + 66000 + 11000)
+    assert payroll.payroll_lines('2026-01').empty
+    assert payroll.run_payroll('2026-01', '2026-02-01')['added'] == 0
+
+
+def test_deleted_wage_expense_is_paid_again(workers):
+    payroll.run_payroll('2026-01', '2026-02-01')
+    lines = payroll.get_payroll_data()
+    for expense_id in lines.loc[lines['worker_id'] == workers['ada'], 'expense_id']:
+        assert delete_record('expenses', int(expense_id))
+
+    lines = payroll.payroll_lines('2026-01')
+    assert lines['name'].unique().tolist() == ['Ada']
+    assert lines['amount'].sum() == pytest.approx(61000)
+
+
+def test_labor_cost_includes_workers_without_a_role(workers):
+    payroll.run_payroll('2026-01', '2026-02-01', {workers['bola']: 22})
+    by_worker = payroll.labor_cost_by_worker().set_index('worker')
+    assert by_worker.loc['Bola', 'total'] == pytest.approx(77000)
+    assert by_worker.loc['Ada', 'total'] == pytest.approx(61000)
+    assert payroll.labor_cost_by_period()['total'].tolist() == pytest.approx([138000])
+
+
+def test_rerun_records_expenses_of_an_unfinished_run(workers, monkeypatch):
+    def crash(df, path):
+        raise OSError('disk full')
+
+    # The run stops after writing its expenses, before recording its lines
+    with monkeypatch.context() as patch:
+        patch.setattr(payroll, 'atomic_write_csv', crash)
+        with pytest.raises(OSError):
+            payroll.run_payroll('2026-01', '2026-02-01')
+    assert payroll.payroll_lines('2026-01').empty
+
+    result = payroll.run_payroll('2026-01', '2026-02-05')
+    assert result['added'] == 0
+    assert result['recovered'] == 4
+    assert len(get_expense_data()) == 4
+    assert payroll.labor_cost_by_period()['total'].tolist() == pytest.approx([138000])
+
+
+def test_workers_with_the_same_name_are_both_paid(fresh_data):
+    first = payroll.add_worker('Musa', 'Labourer', 'Daily', 3000.0)
+    second = payroll.add_worker('Musa', 'Labourer', 'Daily', 3000.0)
+    result = payroll.run_payroll('2026-01', '2026-02-01', default_days=20)
+    assert result['added'] == 2
+    assert sorted(payroll.get_payroll_data()['worker_id']) == [first, second]
+    assert len(get_expense_data()) == 2
+    assert payroll.payroll_lines('2026-01').empty
@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import pdf_reports
+from data_manager import add_expense_record, add_output_record
+
+
+def test_concurrent_renders_keep_main(fresh_data):
+    add_expense_record('2026-01-05', 'Seeds', 'Seed', 1200.0, 'Cash', '')
+    add_output_record('2026-01-20', 'Maize', 10, 'bags', 5000.0, 'Market', '')
+    main = sys.modules['__main__']
+
+    windows = [(date(2026, 1, 1), date(2026, 1, day)) for day in range(25, 31)]
+    with ThreadPoolExecutor(max_workers=len(windows)) as threads:
+        futures = list(threads.map(lambda window: pdf_reports.request_report_pdf(*window), windows))
+    assert sys.modules['__main__'] is main
+
+    pdfs = [future.result(timeout=120) for future in futures]
+    assert all(pdf.startswith(b'%PDF') for pdf in pdfs)
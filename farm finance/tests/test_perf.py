@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+import tracemalloc
+
+import pytest
+
+import perf
+
+
+@pytest.fixture
+def perf_off():
+    perf.enable(False)
+    perf.reset()
+    yield
+    perf.enable(False)
+    perf.reset()
+
+
+def test_disabling_stops_the_tracing_it_started(perf_off):
+    assert not tracemalloc.is_tracing()
+    perf.enable(True)
+    assert tracemalloc.is_tracing()
+    perf.enable(False)
+    assert not tracemalloc.is_tracing()
+
+
+def test_disabling_leaves_other_tracing_running(perf_off):
+    tracemalloc.start()
+    try:
+        perf.enable(True)
+        perf.enable(False)
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+
+
+def test_timed_records_only_when_enabled(perf_off):
+    @perf.timed('sample')
+    def rows():
+        return [1, 2, 3]
+
+    rows()
+    assert perf.get_summary().empty
+    perf.enable(True)
+    rows()
+    totals = perf.get_summary().set_index('name').loc['sample']
+    assert totals['calls'] == 1
+    assert totals['rows'] == 3
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from data_manager import add_output_record, add_output_records
+from price_analytics import get_price_analytics
+
+
+def seed():
+    add_output_records([
+        {'date': '2026-01-05', 'crop_type': 'Maize', 'quantity': 1, 'unit': 'bags', 'sales_amount': 10000.0,
+         'buyer': 'Ade'},
+        {'date': '2026-01-06', 'crop_type': 'Maize', 'quantity': 1, 'unit': 'bags', 'sales_amount': 12000.0,
+         'buyer': 'Bisi'},
+        {'date': '2026-02-07', 'crop_type': 'Maize', 'quantity': 1, 'unit': 'bags', 'sales_amount': 14000.0,
+         'buyer': ' '},
+        {'date': '2026-02-08', 'crop_type': 'Maize', 'quantity': 4, 'unit': 'pieces', 'sales_amount': 900.0,
+         'buyer': 'Ade'}
+    ])
+
+
+def test_price_distribution_per_crop_and_buyer(fresh_data):
+    seed()
+    result = get_price_analytics()
+    maize = result['by_crop'].set_index('crop_type').loc['Maize']
+    assert maize['sales_count'] == 3
+    assert maize['median_price'] == pytest.approx(120.0)
+    assert maize['avg_price'] == pytest.approx(120.0)
+    assert maize['p10_price'] == pytest.approx(104.0)
+
+    buyers = result['by_crop_buyer'].set_index('buyer')
+    assert buyers.loc['Ade', 'price_vs_crop_median'] == pytest.approx(-100 / 6)
+    assert result['top_buyers']['buyer'].tolist() == ['Unknown', 'Bisi', 'Ade']
+    assert result['trend']['month'].dt.month.tolist() == [1, 2]
+
+
+def test_cached_until_outputs_change(fresh_data):
+    seed()
+    assert get_price_analytics() is get_price_analytics()
+    add_output_record('2026-02-09', 'Rice', 2, 'bags', 20000.0, 'Ade', '')
+    assert get_price_analytics()['by_crop']['crop_type'].tolist() == ['Maize', 'Rice']
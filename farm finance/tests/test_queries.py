@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+import pandas as pd
+import pytest
+
+from data_manager import RecordQuery, add_expense_record, add_expense_records, apply_query, run_query
+
+
+def seed_expenses():
+    add_expense_records([
+        {'date': '2026-01-05', 'category': 'Seeds', 'description': 'Maize seed', 'amount': 1200.0},
+        {'date': '2026-01-06', 'category': 'Petrol', 'description': 'Generator petrol', 'amount': 300.0},
+        {'date': '2026-01-07', 'category': 'Seeds', 'description': 'Bean seed', 'amount': 800.0},
+        {'date': '2026-02-01', 'category': 'Seeds', 'description': 'Maize SEED top-up', 'amount': 400.0}
+    ])
+
+
+def test_query_combines_every_filter(fresh_data):
+    seed_expenses()
+    query = RecordQuery('expenses', start='2026-01-01', end='2026-01-31', categories=('Seeds',),
+                        text='seed', min_amount=500.0)
+    assert run_query(query)['description'].tolist() == ['Bean seed', 'Maize seed']
+    assert run_query(RecordQuery('expenses', text='maize', sort='amount', ascending=True, limit=1))[
+        'amount'].tolist() == [400.0]
+
+
+def test_cached_result_follows_writes(fresh_data):
+    seed_expenses()
+    query = RecordQuery('expenses', categories=('Petrol',))
+    assert len(run_query(query)) == 1
+    add_expense_record('2026-01-08', 'Petrol', 'Tractor petrol', 250.0, 'Cash', '')
+    assert len(run_query(query)) == 2
+
+
+def test_apply_query_matches_run_query(fresh_data):
+    seed_expenses()
+    query = RecordQuery('expenses', end='2026-01-06', sort='id')
+    table = run_query(RecordQuery('expenses', sort=None))
+    pd.testing.assert_frame_equal(apply_query(query, table), run_query(query))
+
+
+def test_changing_a_result_leaves_the_cache_intact(fresh_data):
+    seed_expenses()
+    query = RecordQuery('expenses', categories=('Seeds',))
+    result = run_query(query)
+    result.loc[result.index[0], 'amount'] = 0.0
+    result.drop(columns='description', inplace=True)
+    assert run_query(query)['amount'].sum() == pytest.approx(2400)
+    assert 'description' in run_query(query)
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+import io
+
+import pandas as pd
+
+from data_manager import add_synced_records
+from reconciliation import load_statement, reconcile
+
+
+def add_expenses(*rows):
+    add_synced_records('expenses', [{
+        'date': date, 'category': 'Seeds', 'description': description, 'amount': amount,
+        'payment_method': 'Bank Transfer', 'notes': '', 'plot': '', 'crop_cycle': '', 'crop_type': '',
+        'gid': f'gid-{index}'
+    } for index, (date, description, amount) in enumerate(rows)], origin='test')
+
+
+def statement(*rows):
+    lines = "Date,Debit,Narration\n" + "".join(f"{date},{amount},{text}\n" for date, amount, text in rows)
+    return load_statement(io.StringIO(lines))
+
+
+def test_load_statement_parses_debits():
+    lines = statement(('05/01/2026', '"₦1,200.00"', 'Seed'), ('06/01/2026', '', 'Credit'))
+    assert lines['amount'].tolist() == [1200.0]
+    assert lines['date'].tolist() == [pd.Timestamp('2026-01-05')]
+
+
+def test_lines_match_on_amount_within_tolerance(fresh_data):
+    add_expenses(('2026-01-04', 'Seed', 1200.0), ('2026-01-20', 'Fuel', 500.0),
+                 ('2026-01-06', 'Diesel', 500.0), ('2026-01-07', 'Diesel', 500.0))
+    results = reconcile(statement(('05/01/2026', '1200', 'Seed'), ('06/01/2026', '500', 'Diesel'),
+                                  ('15/01/2026', '750', 'Unknown')))
+    assert results['matched'][['line', 'expense_id']].values.tolist() == [[1, 1]]
+    assert results['ambiguous']['suggested_expense_id'].tolist() == [3]
+    assert results['unmatched_statement']['line'].tolist() == [3]
+    assert results['summary']['unmatched_expenses'] == 0
+
+
+def test_blank_expense_amounts_are_left_unmatched(fresh_data):
+    add_expenses(('2026-01-05', 'Seed', 1200.0), ('2026-01-05', 'Blank', ''))
+    results = reconcile(statement(('05/01/2026', '1200', 'Seed')))
+    assert results['matched']['expense_id'].tolist() == [1]
+    assert results['unmatched_expenses']['description'].tolist() == ['Blank']
+
+
+def test_iso_statement_dates_are_not_read_day_first(fresh_data):
+    add_expenses(('2025-04-03', 'Seed', 1200.0), ('2025-04-13', 'Fuel', 500.0))
+    lines = statement(('2025-04-03', '1200', 'Seed'), ('2025-04-13', '500', 'Fuel'))
+    assert lines['date'].tolist() == [pd.Timestamp('2025-04-03'), pd.Timestamp('2025-04-13')]
+    assert reconcile(lines)['matched']['expense_id'].tolist() == [1, 2]
+
+
+def test_unreadable_dates_are_reported_as_unmatched(fresh_data):
+    add_expenses(('2026-01-05', 'Seed', 1200.0))
+    results = reconcile(statement(('05/01/2026', '1200', 'Seed'), ('soon', '500', 'Fuel')))
+    assert results['matched']['expense_id'].tolist() == [1]
+    assert results['unmatched_statement']['line'].tolist() == [2]
+    assert results['summary']['undated'] == 1
+
+    results = reconcile(statement(('soon', '500', 'Fuel')))
+    assert results['summary']['unmatched'] == 1
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+import os
+import subprocess
+import sys
+
+import pandas as pd
+
+from data_manager import _read_table, add_expense_record, delete_record, get_expense_data, get_record_store
+
+
+def assert_matches_file(df):
+    pd.testing.assert_frame_equal(df.reset_index(drop=True), _read_table('expenses'), check_dtype=False)
+
+
+def test_local_writes_patch_the_store_without_reloading(fresh_data, monkeypatch):
+    store = get_record_store()
+    add_expense_record('2026-01-05', 'Seeds', 'Seed', 100.0, 'Cash', '')
+    get_expense_data()
+    loads = []
+    monkeypatch.setattr(store, '_load', lambda file_type: loads.append(file_type) or _read_table(file_type))
+
+    changes = store.changes
+    add_expense_record('2026-01-06', 'Petrol', 'Petrol', 50.0, 'Cash', 'for the pump')
+    assert delete_record('expenses', 1)
+    assert store.changes == changes + 2
+    assert_matches_file(get_expense_data())
+    assert loads == []
+
+
+def test_readers_cannot_change_the_store(fresh_data):
+    add_expense_record('2026-01-05', 'Seeds', 'Seed', 100.0, 'Cash', '')
+    view = get_expense_data()
+    view.loc[0, 'amount'] = 0.0
+    assert get_expense_data()['amount'].tolist() == [100.0]
+
+
+def test_writes_by_another_process_are_picked_up(fresh_data):
+    store = get_record_store()
+    add_expense_record('2026-01-05', 'Seeds', 'Seed', 100.0, 'Cash', '')
+    get_expense_data()
+    changes = store.changes
+    code_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, '-c', "from data_manager import add_expense_record\n"
+                    "add_expense_record('2026-01-06', 'Seeds', 'Other seed', 70.0, 'Cash', '')"],
+                   cwd=code_dir, env=dict(os.environ, FARM_DATA_DIR=fresh_data), check=True, timeout=120)
+
+    assert store.refresh() > changes
+    # The next local write is applied on top of the reloaded table
+    add_expense_record('2026-01-07', 'Seeds', 'Third seed', 30.0, 'Cash', '')
+    assert get_expense_data()['description'].tolist() == ['Seed', 'Other seed', 'Third seed']
+    assert_matches_file(get_expense_data())
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+import time
+from datetime import date
+
+import pytest
+
+from data_manager import add_expense_record
+from report_scheduler import ReportScheduler, standard_windows
+
+
+def test_standard_windows():
+    windows = standard_windows(date(2026, 5, 14))
+    assert windows["Last week"] == (date(2026, 5, 4), date(2026, 5, 10))
+    assert windows["Last month"] == (date(2026, 4, 1), date(2026, 4, 30))
+    assert windows["Quarter to date"] == (date(2026, 4, 1), date(2026, 5, 14))
+    assert windows["Year to date"] == (date(2026, 1, 1), date(2026, 5, 14))
+
+
+def test_cached_report_is_served_until_data_changes(fresh_data):
+    scheduler = ReportScheduler()
+    start, end = date(2026, 1, 1), date(2026, 1, 31)
+    add_expense_record('2026-01-05', 'Seeds', 'Maize seed', 500.0, 'Cash', '')
+
+    report = scheduler.get_report(start, end)
+    assert report['expenses']['amount'].sum() == pytest.approx(500)
+    assert scheduler.is_ready(start, end)
+    assert scheduler.get_report(start, end) is report
+    assert (scheduler.hits, scheduler.misses) == (1, 1)
+
+    add_expense_record('2026-01-06', 'Petrol', 'Generator', 200.0, 'Cash', '')
+    assert not scheduler.is_ready(start, end)
+    assert scheduler.get_report(start, end)['expenses']['amount'].sum() == pytest.approx(700)
+    assert scheduler.misses == 2
+
+
+def test_cache_evicts_least_recently_used(fresh_data):
+    scheduler = ReportScheduler(cache_size=2)
+    january = (date(2026, 1, 1), date(2026, 1, 31))
+    february = (date(2026, 2, 1), date(2026, 2, 28))
+    march = (date(2026, 3, 1), date(2026, 3, 31))
+
+    scheduler.get_report(*january)
+    scheduler.get_report(*february)
+    scheduler.get_report(*january)
+    scheduler.get_report(*march)
+    assert scheduler.is_ready(*january)
+    assert not scheduler.is_ready(*february)
+    assert scheduler.is_ready(*march)
+
+
+def test_refresh_builds_only_stale_reports(fresh_data):
+    scheduler = ReportScheduler()
+    assert len(scheduler.refresh()) == 4
+    assert scheduler.refresh() == []
+
+    add_expense_record(date.today().isoformat(), 'Seeds', 'Maize seed', 500.0, 'Cash', '')
+    assert len(scheduler.refresh()) == 4
+
+
+def test_failed_refresh_is_logged_and_reported(fresh_data, caplog):
+    scheduler = ReportScheduler()
+
+    def fail():
+        raise OSError('disk full')
+
+    scheduler.refresh = fail
+    scheduler.start()
+    deadline = time.monotonic() + 5
+    while scheduler.status()['last_error'] is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert scheduler.status()['last_error'] == "OSError('disk full')"
+    assert scheduler.status()['last_success'] is None
+    assert "Standard report refresh failed" in caplog.text
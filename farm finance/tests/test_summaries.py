@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+import data_manager
+from data_manager import add_expense_record, find_duplicates, get_expense_summary_by_category
+
+
+def test_category_summary_is_cached_until_expenses_change(fresh_data, monkeypatch):
+    computed = []
+    compute = data_manager._expense_summary_by_category
+    monkeypatch.setattr(data_manager, '_expense_summary_by_category', lambda: computed.append(1) or compute())
+
+    add_expense_record('2026-01-05', 'Seeds', 'Maize seed', 500.0, 'Cash', '')
+    get_expense_summary_by_category()
+    get_expense_summary_by_category()
+    assert len(computed) == 1
+
+    add_expense_record('2026-01-06', 'Seeds', 'Maize seed', 500.0, 'Cash', '', allow_duplicate=True)
+    updated = get_expense_summary_by_category()
+    assert len(computed) == 2
+    assert updated['total_amount'].sum() == pytest.approx(1000)
+    assert find_duplicates('expenses').empty
+
+
+def test_changing_a_summary_leaves_the_cache_intact(fresh_data):
+    add_expense_record('2026-01-05', 'Seeds', 'Maize seed', 500.0, 'Cash', '')
+    summary = get_expense_summary_by_category()
+    summary.loc[0, 'total_amount'] = 0.0
+    summary.sort_values('category', inplace=True)
+    summary.drop(columns='transaction_count', inplace=True)
+
+    fresh = get_expense_summary_by_category()
+    assert fresh['total_amount'].tolist() == [500.0]
+    assert 'transaction_count' in fresh
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+import gzip
+import json
+
+import sync
+from data_manager import add_expense_record, get_expense_data
+
+PEER = 'central-device'
+
+
+def read_bundle(path):
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def write_bundle(path, events, to_seq=1, ack_seq=0):
+    bundle = {'format': sync.BUNDLE_FORMAT, 'device_id': PEER, 'peer': sync.get_device()['device_id'],
+              'from_seq': 0, 'to_seq': to_seq, 'ack_seq': ack_seq, 'created': '2026-01-01T00:00:00',
+              'events': events}
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        json.dump(bundle, f)
+    return path
+
+
+def added_descriptions(bundle):
+    return [record['description'] for event in bundle['events'] if event['action'] == 'add'
+            for record in event['records'] if 'description' in record]
+
+
+def test_changes_are_resent_until_acknowledged(fresh_data, tmp_path):
+    add_expense_record('2026-01-01', 'Seeds', 'First', 100.0, 'Cash', '')
+    sync.export_bundle(tmp_path / 'one.json.gz', PEER)
+    add_expense_record('2026-01-02', 'Seeds', 'Second', 200.0, 'Cash', '')
+    sync.export_bundle(tmp_path / 'two.json.gz', PEER)
+    two = read_bundle(tmp_path / 'two.json.gz')
+    # Nothing acknowledged yet, so the first bundle may have been lost
+    assert two['from_seq'] == 0
+    assert sorted(added_descriptions(two)) == ['First', 'Second']
+
+    summary = sync.import_bundle(write_bundle(tmp_path / 'ack.json.gz', [], ack_seq=two['to_seq']))
+    assert summary['acknowledged_seq'] == two['to_seq']
+
+    add_expense_record('2026-01-03', 'Seeds', 'Third', 300.0, 'Cash', '')
+    for name in ('three.json.gz', 'again.json.gz'):
+        sync.export_bundle(tmp_path / name, PEER)
+        bundle = read_bundle(tmp_path / name)
+        assert bundle['from_seq'] == two['to_seq']
+        assert added_descriptions(bundle) == ['Third']
+
+
+def test_import_applies_adds_and_deletes_once(fresh_data, tmp_path):
+    record = {'date': '2026-01-05', 'category': 'Seeds', 'description': 'Field seed', 'amount': 50.0,
+              'payment_method': 'Cash', 'notes': '', 'plot': '', 'crop_cycle': '', 'crop_type': '',
+              'gid': 'gid-field-seed'}
+    other = dict(record, description='Field fuel', gid='gid-field-fuel')
+    adds = {'file': 'expenses', 'action': 'add', 'origin': PEER, 'ts': '2026-01-05T00:00:00',
+            'records': [record, other]}
+    path = write_bundle(tmp_path / 'adds.json.gz', [adds])
+
+    assert sync.import_bundle(path)['added'] == 2
+    assert sync.import_bundle(path)['added'] == 0
+    assert sync.get_sync_state()[PEER]['received_seq'] == 1
+
+    delete = {'file': 'expenses', 'action': 'delete', 'origin': PEER, 'ts': '2026-01-06T00:00:00',
+              'records': [{'gid': 'gid-field-fuel'}]}
+    # The add arriving again after the delete does not bring the record back
+    sync.import_bundle(write_bundle(tmp_path / 'delete.json.gz', [delete, adds], to_seq=2))
+    assert get_expense_data()['gid'].tolist() == ['gid-field-seed']
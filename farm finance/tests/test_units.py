@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+import pandas as pd
+import pytest
+
+from data_manager import add_output_records, get_output_data, normalize_output_quantities, summarize_outputs_by_crop
+
+
+def test_quantities_are_normalized_per_crop():
+    rows = pd.DataFrame({
+        'crop_type': ['Maize', 'Maize', 'Tomatoes', 'Palm Oil', 'Palm Oil', 'Maize'],
+        'unit': ['bags', 'tons', 'crates', 'buckets', 'kg', 'pieces'],
+        'quantity': [2, 1, 4, 1, 91, 3]
+    })
+    normalized = normalize_output_quantities(rows)
+    assert normalized['normalized_quantity'].tolist()[:5] == pytest.approx([200, 1000, 100, 25, 100])
+    assert normalized['normalized_unit'].tolist()[:5] == ['kg', 'kg', 'kg', 'liters', 'liters']
+    assert pd.isna(normalized['normalized_quantity'].iloc[5])
+
+
+def test_saved_outputs_price_per_kg(fresh_data):
+    add_output_records([
+        {'date': '2026-01-05', 'crop_type': 'Maize', 'quantity': 1, 'unit': 'tons', 'sales_amount': 300000.0},
+        {'date': '2026-01-06', 'crop_type': 'Maize', 'quantity': 5, 'unit': 'bags', 'sales_amount': 150000.0},
+        {'date': '2026-01-07', 'crop_type': 'Maize', 'quantity': 3, 'unit': 'pieces', 'sales_amount': 9000.0}
+    ])
+    assert get_output_data()['normalized_quantity'].tolist()[:2] == [1000.0, 500.0]
+
+    summary = summarize_outputs_by_crop(get_output_data()).set_index('crop_type').loc['Maize']
+    assert summary['normalized_quantity'] == 1500.0
+    assert summary['sales_amount'] == 459000.0
+    # The sale in pieces has no weight, so it is left out of the price
+    assert summary['price_per_unit'] == pytest.approx(300.0)
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+import pandas as pd
+import pytest
+
+from data_manager import add_expense_records, add_input_record, add_input_records, get_expense_data, get_input_data
+from validation import RecordValidationError, format_errors, validate_frame
+
+
+def test_validate_frame_reports_each_problem():
+    frame = pd.DataFrame([
+        {'date': '2026-01-05', 'category': 'Seeds', 'description': 'Maize seed', 'quantity': 2,
+         'unit': 'bags', 'cost_per_unit': 500, 'total_cost': 1000},
+        {'date': 'yesterday', 'category': 'Snacks', 'description': '', 'quantity': -1,
+         'unit': 'bags', 'cost_per_unit': 500, 'total_cost': 900}
+    ])
+    errors = validate_frame('inputs', frame)
+    assert set(errors['row']) == {1}
+    assert set(errors['field']) == {'date', 'category', 'description', 'quantity', 'total_cost'}
+
+
+def test_format_errors_limits_lines():
+    errors = validate_frame('expenses', pd.DataFrame([{'date': '', 'category': '', 'description': '', 'amount': ''}]))
+    lines = format_errors(errors, limit=2)
+    assert lines[0] == "Row 0: date is required (got '')"
+    assert lines[-1] == "...and 2 more problems"
+
+
+def test_invalid_records_are_not_saved(fresh_data):
+    records = [
+        {'date': '2026-01-05', 'category': 'Seeds', 'description': 'Seed', 'amount': 100.0},
+        {'date': '2026-01-05', 'category': 'Snacks', 'description': 'Biscuits', 'amount': 50.0}
+    ]
+    with pytest.raises(RecordValidationError) as raised:
+        add_expense_records(records)
+    assert raised.value.errors[['row', 'field']].values.tolist() == [[1, 'category']]
+    assert get_expense_data().empty
+
+    with pytest.raises(RecordValidationError):
+        add_input_record('2026-01-05', 'Seeds', 'Seed', 2, 'sacks', 500.0, '')
+    assert get_input_data().empty and get_expense_data().empty
+
+
+def test_non_numeric_amounts_raise_field_errors(fresh_data):
+    with pytest.raises(RecordValidationError) as raised:
+        add_expense_records([{'date': '2026-01-05', 'category': 'Seeds', 'description': 'Seed', 'amount': 'abc'}])
+    assert raised.value.errors[['field', 'error']].values.tolist() == [['amount', 'must be a number']]
+
+    with pytest.raises(RecordValidationError) as raised:
+        add_input_records([{'date': '2026-01-05', 'category': 'Fertilizer', 'description': 'Urea',
+                            'quantity': '', 'unit': 'bags', 'cost_per_unit': '1,000'}])
+    assert raised.value.errors[['field', 'error']].values.tolist() == [
+        ['quantity', 'is required'], ['cost_per_unit', 'must be a number']]
@@ -6,24 +6,38 @@ Created on Sun Apr 13 16:14:48 2025
 """
 import pandas as pd
 import os
+import uuid
 from datetime import datetime
 
+def get_data_dir():
+    """Return the data directory, set with the FARM_DATA_DIR environment variable."""
+    return os.environ.get('FARM_DATA_DIR', 'data')
+
+def get_file_headers():
+    """Return the column headers of each data file."""
+    return {
+        'inputs.csv': ['id', 'date', 'category', 'description', 'quantity', 'unit', 'cost_per_unit', 'total_cost', 'notes',
+                       'plot', 'crop_cycle', 'crop_type', 'gid'],
+        'expenses.csv': ['id', 'date', 'category', 'description', 'amount', 'payment_method', 'notes',
+                         'plot', 'crop_cycle', 'crop_type', 'gid'],
+        'outputs.csv': ['id', 'date', 'crop_type', 'quantity', 'unit', 'sales_amount', 'buyer', 'notes',
+                        'plot', 'crop_cycle', 'normalized_quantity', 'normalized_unit', 'gid'],
+        'budgets.csv': ['category', 'period', 'amount'],
+        'inventory_issues.csv': ['id', 'date', 'item', 'unit', 'quantity', 'plot', 'crop_cycle', 'crop_type', 'notes'],
+        'tombstones.csv': ['file_type', 'gid', 'deleted_at'],
+        'workers.csv': ['id', 'name', 'role', 'pay_type', 'rate', 'feeding_allowance', 'payment_method', 'plot', 'active', 'notes'],
+        'payroll.csv': ['period', 'worker_id', 'category', 'days', 'amount', 'expense_id', 'run_date']
+    }
+
 def ensure_data_files_exist():
     """Ensure all necessary data files exist and have correct headers."""
-    data_dir = 'data'
+    data_dir = get_data_dir()
     
     if not os.path.exists(data_dir):
         os.makedirs(data_dir)
     
-    # Define files and their headers
-    files_and_headers = {
-        'inputs.csv': ['id', 'date', 'category', 'description', 'quantity', 'unit', 'cost_per_unit', 'total_cost', 'notes'],
-        'expenses.csv': ['id', 'date', 'category', 'description', 'amount', 'payment_method', 'notes'],
-        'outputs.csv': ['id', 'date', 'crop_type', 'quantity', 'unit', 'sales_amount', 'buyer', 'notes']
-    }
-    
     # Create files if they don't exist
-    for filename, headers in files_and_headers.items():
+    for filename, headers in get_file_headers().items():
         filepath = os.path.join(data_dir, filename)
         if not os.path.exists(filepath):
             df = pd.DataFrame(columns=headers)
@@ -36,6 +50,10 @@ def generate_id(df):
     else:
         return df['id'].max() + 1
 
+def generate_gid():
+    """Generate a global ID that stays the same on every device a record is synced to."""
+    return uuid.uuid4().hex
+
 def format_currency(amount):
     """Format a number as currency in Naira."""
     return f"₦{amount:,.2f}"
@@ -135,3 +153,68 @@ def get_payment_methods():
         "Credit",
         "Other"
     ]
+
+def get_seasons():
+    """Return the farming seasons and the months (1-12) each one covers.
+    
+    A season is named by the year it starts in, so "Dry Season 2025" runs
+    from November 2025 to March 2026.
+    """
+    return {
+        "Rainy Season": [4, 5, 6, 7, 8, 9, 10],
+        "Dry Season": [11, 12, 1, 2, 3]
+    }
+
+def get_unit_conversions():
+    """Return the size of each unit in kg (mass) or liters (volume).
+    
+    Container units (bags, buckets, crates) depend on the crop and are
+    defined in get_crop_unit_conversions.
+    """
+    return {
+        'kg': ('kg', 1.0),
+        'tons': ('kg', 1000.0),
+        'liters': ('liters', 1.0),
+        'gallons': ('liters', 3.785)
+    }
+
+def get_crop_unit_conversions():
+    """Return each crop's base unit and the size of its containers in that unit.
+    
+    Oils are measured in liters, everything else in kg. Units missing for a
+    crop (and units like pieces or hours) cannot be normalized.
+    """
+    return {
+        "Palm Oil": {'base': 'liters', 'kg': 1 / 0.91, 'tons': 1000 / 0.91, 'buckets': 25.0},
+        "Palm Kernel Oil": {'base': 'liters', 'kg': 1 / 0.92, 'tons': 1000 / 0.92, 'buckets': 25.0},
+        "Palm Kernel": {'base': 'kg', 'bags': 50.0},
+        "Palm Cake": {'base': 'kg', 'bags': 50.0},
+        "Cashew Nut": {'base': 'kg', 'bags': 80.0},
+        "Soybeans": {'base': 'kg', 'bags': 100.0},
+        "Tomatoes": {'base': 'kg', 'crates': 25.0, 'buckets': 10.0},
+        "Potatoes": {'base': 'kg', 'bags': 50.0},
+        "Maize": {'base': 'kg', 'bags': 100.0},
+        "Rice": {'base': 'kg', 'bags': 50.0},
+        "Wheat": {'base': 'kg', 'bags': 50.0},
+        "Beans": {'base': 'kg', 'bags': 100.0},
+        "Cassava": {'base': 'kg', 'bags': 50.0},
+        "Vegetables": {'base': 'kg', 'crates': 20.0, 'bags': 25.0},
+        "Fruits": {'base': 'kg', 'crates': 20.0, 'bags': 25.0},
+        "Other": {'base': 'kg'}
+    }
+
+def get_unit_conversion_table():
+    """Return a (crop_type, unit) -> (normalized_unit, factor) table as a DataFrame."""
+    rows = []
+    generic = get_unit_conversions()
+    for crop_type, conversions in get_crop_unit_conversions().items():
+        base = conversions['base']
+        for unit, (unit_base, factor) in generic.items():
+            if unit_base == base:
+                rows.append((crop_type, unit, base, factor))
+        for unit, factor in conversions.items():
+            if unit != 'base':
+                rows.append((crop_type, unit, base, factor))
+    table = pd.DataFrame(rows, columns=['crop_type', 'unit', 'normalized_unit', 'factor'])
+    # Crop-specific entries override the generic ones
+    return table.drop_duplicates(['crop_type', 'unit'], keep='last').set_index(['crop_type', 'unit'])
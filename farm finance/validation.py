@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+Schema-driven validation of whole record frames.
+
+Every rule is a vectorised check over a column, so a frame of any size is
+validated in a handful of passes: required fields, parsable dates,
+non-negative numbers, values from the lists in utils, and the input total
+matching quantity times cost per unit. The result is one row per problem
+(row, field, value, error), empty when the frame is valid. Used by the API
+for submitted records, by sync for imported bundles and by data_manager,
+which refuses to add records that fail (check_records).
+"""
+import pandas as pd
+
+from utils import get_crop_types, get_expense_categories, get_input_categories, get_payment_methods, get_units
+
+# Allowed difference between total_cost and quantity * cost_per_unit
+TOTAL_TOLERANCE = 0.01
+
+
+def _expense_categories():
+    # Expenses added automatically for inputs are filed as "Input: <category>"
+    return get_expense_categories() + [f"Input: {category}" for category in get_input_categories()]
+
+
+SCHEMAS = {
+    'inputs': {
+        'required': ['date', 'category', 'description', 'quantity', 'unit', 'cost_per_unit'],
+        'non_negative': ['quantity', 'cost_per_unit', 'total_cost'],
+        'choices': {'category': get_input_categories, 'unit': get_units, 'crop_type': get_crop_types},
+        'product': ('total_cost', 'quantity', 'cost_per_unit')
+    },
+    'expenses': {
+        'required': ['date', 'category', 'description', 'amount'],
+        'non_negative': ['amount'],
+        'choices': {'category': _expense_categories, 'payment_method': get_payment_methods,
+                    'crop_type': get_crop_types}
+    },
+    'outputs': {
+        'required': ['date', 'crop_type', 'quantity', 'unit', 'sales_amount'],
+        'non_negative': ['quantity', 'sales_amount'],
+        'choices': {'crop_type': get_crop_types, 'unit': get_units}
+    }
+}
+
+
+def parse_dates(values, dayfirst=False):
+    """Parse a Series of dates, NaT where unparsable.
+
+    ISO dates are parsed in one vectorised pass; only the rest fall back to
+    per-value format inference, reading 03/04/2025 as 3 April with dayfirst.
+    """
+    text = values.astype(str).str.strip()
+    dates = pd.to_datetime(text, errors='coerce', format='ISO8601')
+    retry = dates.isna() & values.notna() & text.ne('')
+    if retry.any():
+        dates[retry] = pd.to_datetime(text[retry], errors='coerce', format='mixed', dayfirst=dayfirst)
+    return dates
+
+
+def _blank(values):
+    return values.isna() | values.astype(str).str.strip().eq('')
+
+
+def validate_frame(file_type, df):
+    """Return the problems in a frame of file_type records.
+
+    A DataFrame with columns row (the frame's index label), field, value and
+    error, sorted by row. Blank optional fields are not checked.
+    """
+    schema = SCHEMAS[file_type]
+    problems = []
+
+    def report(mask, field, error):
+        if mask.any():
+            values = df[field] if field in df else pd.Series('', index=df.index)
+            problems.append(pd.DataFrame({
+                'row': df.index[mask],
+                'field': field,
+                'value': values[mask].astype(str).to_numpy(),
+                'error': error
+            }))
+
+    blanks = {field: _blank(df[field]) if field in df else pd.Series(True, index=df.index)
+              for field in set(schema['required']) | set(schema['non_negative']) | set(schema['choices'])}
+
+    for field in schema['required']:
+        report(blanks[field], field, "is required")
+
+    if 'date' in df:
+        report(parse_dates(df['date']).isna() & ~blanks['date'], 'date', "is not a valid date")
+
+    numbers = {}
+    for field in schema['non_negative']:
+        if field not in df:
+            continue
+        numbers[field] = pd.to_numeric(df[field], errors='coerce')
+        report(numbers[field].isna() & ~blanks[field], field, "must be a number")
+        report(numbers[field] < 0, field, "must not be negative")
+
+    for field, choices in schema['choices'].items():
+        if field in df:
+            allowed = choices()
+            report(~blanks[field] & ~df[field].astype(str).str.strip().isin(allowed), field,
+                   f"must be one of: {', '.join(allowed)}")
+
+    if 'product' in schema:
+        total, *factors = schema['product']
+        if all(field in numbers for field in schema['product']):
+            expected = numbers[factors[0]] * numbers[factors[1]]
+            report((numbers[total] - expected).abs() > TOTAL_TOLERANCE, total,
+                   f"must equal {factors[0]} x {factors[1]}")
+
+    if not problems:
+        return pd.DataFrame(columns=['row', 'field', 'value', 'error'])
+    return pd.concat(problems, ignore_index=True).sort_values('row', kind='stable').reset_index(drop=True)
+
+
+def validate_records(file_type, records):
+    """validate_frame for a list of record dicts; rows are the list positions."""
+    return validate_frame(file_type, pd.DataFrame(list(records)))
+
+
+class RecordValidationError(ValueError):
+    """Records that failed validation; errors is the validate_frame result."""
+
+    def __init__(self, file_type, errors):
+        self.file_type = file_type
+        self.errors = errors
+        super().__init__(f"{file_type}: {errors['row'].nunique()} invalid records\n"
+                         + "\n".join(format_errors(errors)))
+
+
+def check_records(file_type, records):
+    """Raise RecordValidationError if any of the record dicts is invalid."""
+    errors = validate_records(file_type, records)
+    if not errors.empty:
+        raise RecordValidationError(file_type, errors)
+
+
+def format_errors(errors, limit=10):
+    """Human-readable lines for the first limit problems, e.g. for a warning message."""
+    lines = [f"Row {row}: {field} {error} (got '{value}')"
+             for row, field, value, error in errors.head(limit).itertuples(index=False)]
+    if len(errors) > limit:
+        lines.append(f"...and {len(errors) - limit} more problems")
+    return lines